@@ -14,11 +14,14 @@ config = context.config
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
+# Use the application's database rather than the placeholder in alembic.ini
+from config import SQLALCHEMY_DATABASE_URI
+config.set_main_option("sqlalchemy.url", SQLALCHEMY_DATABASE_URI.replace("%", "%%"))
+
 # add your model's MetaData object here
 # for 'autogenerate' support
-# from myapp import mymodel
-# target_metadata = mymodel.Base.metadata
-target_metadata = None
+from models import db
+target_metadata = db.metadata
 
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
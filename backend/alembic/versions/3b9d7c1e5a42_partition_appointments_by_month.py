@@ -0,0 +1,173 @@
+"""Partition appointments and adherence events by month
+
+Rebuilds ``appointments`` (on date_time) and ``adherence_events`` (on
+scheduled_for) as PostgreSQL range-partitioned tables with one partition per
+month plus a default partition, and copies the existing rows across. The
+primary keys gain the partition column because Postgres requires it;
+the id columns keep their sequences. Later months are created by
+``services.partitioning.ensure_partitions``.
+
+Other databases (SQLite in development) are left unpartitioned.
+
+``medication_reminders`` holds one row per schedule rather than per dose
+and is referenced by ``adherence_events``, so it stays as it is; the
+per-dose history it generates lives in ``adherence_events``.
+
+Revision ID: 3b9d7c1e5a42
+Revises:
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b9d7c1e5a42'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+
+TABLES = [
+    {
+        'name': 'appointments',
+        'column': 'date_time',
+        'key': 'appointment_id',
+        'columns': [
+            "appointment_id INTEGER NOT NULL DEFAULT nextval('appointments_appointment_id_seq')",
+            "patient_id INTEGER NOT NULL REFERENCES users (user_id)",
+            "doctor_id INTEGER NOT NULL REFERENCES doctors (doctor_id)",
+            "date_time TIMESTAMP WITHOUT TIME ZONE NOT NULL",
+            "status VARCHAR(20)",
+            "created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT now()",
+            "updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT now()",
+        ],
+        'unique': [],
+        'indexes': {
+            'ix_appointments_patient_updated': 'patient_id, updated_at',
+            'ix_appointments_doctor_updated': 'doctor_id, updated_at',
+            'ix_appointments_patient_date': 'patient_id, date_time',
+            'ix_appointments_doctor_date': 'doctor_id, date_time',
+        },
+    },
+    {
+        'name': 'adherence_events',
+        'column': 'scheduled_for',
+        'key': 'event_id',
+        'columns': [
+            "event_id INTEGER NOT NULL DEFAULT nextval('adherence_events_event_id_seq')",
+            "reminder_id INTEGER NOT NULL REFERENCES medication_reminders (reminder_id)",
+            "patient_id INTEGER NOT NULL REFERENCES users (user_id)",
+            "medicine_entry_id INTEGER NOT NULL REFERENCES medicine_entries (id)",
+            "scheduled_for TIMESTAMP WITHOUT TIME ZONE NOT NULL",
+            "status VARCHAR(10) NOT NULL",
+            "source VARCHAR(10) NOT NULL",
+            "recorded_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT now()",
+        ],
+        # Already includes the partition column, so it survives partitioning unchanged
+        'unique': [('uq_adherence_events_dose', 'reminder_id, scheduled_for')],
+        'indexes': {
+            'ix_adherence_events_patient_scheduled': 'patient_id, scheduled_for',
+        },
+    },
+]
+
+
+def _add_months(month, count):
+    years, month_index = divmod(month.month - 1 + count, 12)
+    return date(month.year + years, month_index + 1, 1)
+
+
+def _column_names(table):
+    return ', '.join(column.split()[0] for column in table['columns'])
+
+
+def _create_indexes(table):
+    for name, columns in table['unique']:
+        op.execute(f"ALTER TABLE {table['name']} ADD CONSTRAINT {name} UNIQUE ({columns})")
+    for name, columns in table['indexes'].items():
+        op.execute(f"CREATE INDEX {name} ON {table['name']} ({columns})")
+
+
+def _rename_old_indexes(bind, table_name, suffix):
+    # Index names are schema-wide, so the old table's must move out of the way first
+    index_names = bind.execute(sa.text(
+        "SELECT indexname FROM pg_indexes WHERE tablename = :name"
+    ), name=table_name).scalars().all()
+    for index_name in index_names:
+        op.execute(f"ALTER INDEX {index_name} RENAME TO {index_name[:63 - len(suffix)]}{suffix}")
+
+
+def _partition(bind, table):
+    name, column = table['name'], table['column']
+    old = f"{name}_unpartitioned"
+    sequence = f"{name}_{table['key']}_seq"
+
+    op.execute(f"ALTER TABLE {name} RENAME TO {old}")
+    _rename_old_indexes(bind, old, '_unpartitioned')
+
+    op.execute(
+        f"CREATE TABLE {name} ({', '.join(table['columns'])}, "
+        f"PRIMARY KEY ({table['key']}, {column})) PARTITION BY RANGE ({column})"
+    )
+    # Hand the sequence over before the old table (its owner) is dropped
+    op.execute(f"ALTER SEQUENCE {sequence} OWNED BY {name}.{table['key']}")
+    _create_indexes(table)
+
+    first, last = bind.execute(sa.text(f"SELECT min({column}), max({column}) FROM {old}")).one()
+    today = date.today()
+    month = date((first or today).year, (first or today).month, 1)
+    through = _add_months(date(today.year, today.month, 1), MONTHS_AHEAD)
+    if last is not None and last.date() > through:
+        through = date(last.year, last.month, 1)
+    while month <= through:
+        upper = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE {name}_p{month.year:04d}_{month.month:02d} PARTITION OF {name} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+        )
+        month = upper
+    op.execute(f"CREATE TABLE {name}_default PARTITION OF {name} DEFAULT")
+
+    columns = _column_names(table)
+    op.execute(f"INSERT INTO {name} ({columns}) SELECT {columns} FROM {old}")
+    op.execute(f"DROP TABLE {old}")
+
+
+def _unpartition(table):
+    name = table['name']
+    plain = f"{name}_plain"
+    sequence = f"{name}_{table['key']}_seq"
+
+    op.execute(f"CREATE TABLE {plain} ({', '.join(table['columns'])}, PRIMARY KEY ({table['key']}))")
+    columns = _column_names(table)
+    op.execute(f"INSERT INTO {plain} ({columns}) SELECT {columns} FROM {name}")
+    op.execute(f"ALTER SEQUENCE {sequence} OWNED BY {plain}.{table['key']}")
+    op.execute(f"DROP TABLE {name} CASCADE")
+    op.execute(f"ALTER TABLE {plain} RENAME TO {name}")
+    op.execute(f"ALTER INDEX {plain}_pkey RENAME TO {name}_pkey")
+    _create_indexes(table)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+    for table in TABLES:
+        _partition(bind, table)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+    # Archived partitions that were detached are left as standalone tables
+    for table in reversed(TABLES):
+        _unpartition(table)
@@ -0,0 +1,56 @@
+"""Patient search indexes
+
+Trigram GIN indexes (pg_trgm) on the lower-cased searched columns serve
+word-prefix LIKE and fuzzy ``<%`` matches; full-text GIN indexes serve
+prefix queries over diagnoses and diseases. The expressions must match
+the ones built in ``services.patient_search.PostgresSearchBackend``.
+
+Revision ID: c4e8a2f61b97
+Revises: 3b9d7c1e5a42
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e8a2f61b97'
+down_revision: Union[str, None] = '3b9d7c1e5a42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRIGRAM_INDEXES = {
+    'ix_users_name_trgm': ('users', 'name'),
+    'ix_users_email_trgm': ('users', 'email'),
+    'ix_prescriptions_diagnosis_trgm': ('prescriptions', 'diagnosis'),
+    'ix_medicine_entries_name_trgm': ('medicine_entries', 'name'),
+    'ix_medical_history_disease_trgm': ('medical_history', 'disease'),
+}
+
+DOCUMENT_INDEXES = {
+    'ix_prescriptions_diagnosis_tsv': ('prescriptions', 'diagnosis'),
+    'ix_medical_history_disease_tsv': ('medical_history', 'disease'),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Joins medicines to their prescription's patient; create_all makes it on new databases
+    op.execute("CREATE INDEX IF NOT EXISTS ix_medicine_entries_prescription ON medicine_entries (prescription_id)")
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, (table, column) in TRIGRAM_INDEXES.items():
+        op.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin (lower({column}) gin_trgm_ops)")
+    for name, (table, column) in DOCUMENT_INDEXES.items():
+        op.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin (to_tsvector('simple', coalesce({column}, '')))")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        for name in list(DOCUMENT_INDEXES) + list(TRIGRAM_INDEXES):
+            op.execute(f"DROP INDEX IF EXISTS {name}")
+    op.execute("DROP INDEX IF EXISTS ix_medicine_entries_prescription")
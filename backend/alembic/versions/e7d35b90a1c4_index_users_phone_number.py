@@ -0,0 +1,30 @@
+"""Index users.phone_number
+
+Inbound SMS replies find the patient by phone number; without an index
+each reply scans ``users``. ``create_all`` makes it on new databases.
+
+Revision ID: e7d35b90a1c4
+Revises: c4e8a2f61b97
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7d35b90a1c4'
+down_revision: Union[str, None] = 'c4e8a2f61b97'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE INDEX IF NOT EXISTS ix_users_phone_number ON users (phone_number)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS ix_users_phone_number")
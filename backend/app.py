@@ -1,7 +1,10 @@
 from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
 from flask_session import Session
+from flask_jwt_extended import JWTManager
 from config import Config
+from models import db
+from utils.compression import init_compression
+from services.token_revocation import token_revocation
 import logging
 
 # Initialize Flask app
@@ -9,8 +12,11 @@ app = Flask(__name__)
 app.config.from_object(Config)
 
 # Initialize extensions
-db = SQLAlchemy(app)
+db.init_app(app)
 Session(app)
+jwt = JWTManager(app)
+token_revocation.init_app(app, jwt)
+init_compression(app)
 
 # Configure logging
 logging.basicConfig(
@@ -23,15 +29,51 @@ logger = logging.getLogger(__name__)
 from routes.auth import auth_bp
 from routes.patient import patient_bp
 from routes.doctor import doctor_bp
+from routes.events import events_bp
+from routes.batch import batch_bp
+from routes.sms import sms_bp
+from routes.health import health_bp
+from services.event_bus import register_change_events
+from services.sync import register_sync_tracking
+from services.analytics import register_analytics_tracking
+from services.adherence import adherence_ingestor
+from services.partitioning import ensure_partitions
+from services.patient_search import register_search_tracking
+from utils.serving import pool_metrics
 
 app.register_blueprint(auth_bp, url_prefix='/api/auth')
 app.register_blueprint(patient_bp, url_prefix='/api/patient')
 app.register_blueprint(doctor_bp, url_prefix='/api/doctor')
+app.register_blueprint(events_bp, url_prefix='/api/events')
+app.register_blueprint(batch_bp, url_prefix='/api/batch')
+app.register_blueprint(sms_bp, url_prefix='/api/sms')
+app.register_blueprint(health_bp, url_prefix='/api/health')
+
+# Push change events to open event streams after each commit
+register_change_events()
+
+# Track updates and deletes for delta sync clients
+register_sync_tracking()
+
+# Maintain doctor analytics rollups alongside every write
+register_analytics_tracking()
+
+# Keep the in-process patient search index current (the Postgres backend queries the tables)
+register_search_tracking()
+
+# Batch dose acknowledgements and infer missed doses in the background
+adherence_ingestor.init_app(app)
 
 # Create database tables
 with app.app_context():
     db.create_all()
     logger.info("Database tables created")
+    # Keep monthly partitions a few months ahead (no-op until the Alembic migrations have partitioned the tables)
+    ensure_partitions(app.config['PARTITION_MONTHS_AHEAD'])
+    # Count checkouts on the primary and replica pools for /api/health/pool
+    pool_metrics.watch('primary', db.engine)
+    for index, engine in enumerate(db.replicas.engines):
+        pool_metrics.watch(f'replica{index}', engine)
 
 if __name__ == '__main__':
     logger.info("Starting Medivault server...")
@@ -0,0 +1,16 @@
+import argparse
+from app import app
+from services.analytics import backfill_rollups
+
+def backfill_analytics(doctor_id=None):
+    with app.app_context():
+        backfill_rollups(doctor_id)
+        target = f"doctor {doctor_id}" if doctor_id is not None else "all doctors"
+        print(f"Analytics rollups rebuilt for {target}.")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Rebuild doctor analytics rollups from appointments, prescriptions and reminders")
+    parser.add_argument('--doctor-id', type=int, help="Only rebuild this doctor's rollups")
+    args = parser.parse_args()
+
+    backfill_analytics(args.doctor_id)
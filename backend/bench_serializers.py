@@ -0,0 +1,139 @@
+"""Micro-benchmark: dashboard serialization before and after the schema serializers.
+
+Builds a dashboard-sized payload from in-memory objects (no database) and
+compares the old hand-written dict comprehensions + ``strftime`` + stdlib
+JSON against the compiled serializers + fast encoder, then reports the
+bytes on the wire with and without compression.
+
+    python bench_serializers.py [--prescriptions 300] [--repeat 50]
+"""
+import argparse
+import gzip
+import json
+import time
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+from utils.serializers import Serializer, Field, format_date, format_time, dumps, orjson
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DOCTOR_NAMES = {doctor_id: f"Dr. Doctor {doctor_id}" for doctor_id in range(1, 21)}
+
+def doctor_name(obj):
+    return DOCTOR_NAMES.get(obj.doctor_id, 'Unknown Doctor')
+
+def build_dashboard(prescription_count):
+    start = datetime(2020, 1, 1, 8, 0)
+    prescriptions = [SimpleNamespace(
+        prescription_id=i,
+        doctor_id=i % 20 + 1,
+        diagnosis=f"Diagnosis {i % 37}",
+        date_issued=(start + timedelta(days=i)).date(),
+        medicine_entries=[SimpleNamespace(
+            name=f"Medicine {j}",
+            dosage=f"{(j + 1) * 250}mg",
+            frequency='Twice daily',
+            timing='After meals'
+        ) for j in range(3)]
+    ) for i in range(prescription_count)]
+    appointments = [SimpleNamespace(
+        appointment_id=i,
+        doctor_id=i % 20 + 1,
+        date_time=start + timedelta(days=i // 2, minutes=30 * (i % 16)),
+        status=('completed', 'cancelled', 'Pending')[i % 3]
+    ) for i in range(prescription_count * 2)]
+    lab_reports = [SimpleNamespace(
+        report_id=i,
+        report_type='Blood panel',
+        file_url=f"https://files.example.com/reports/{i}.pdf",
+        uploaded_on=start + timedelta(days=i, hours=3)
+    ) for i in range(prescription_count // 2)]
+    return prescriptions, appointments, lab_reports
+
+# ------------------- BEFORE -------------------
+def legacy_payload(prescriptions, appointments, lab_reports):
+    return json.dumps({
+        'prescriptions': [{
+            'prescription_id': prescription.prescription_id,
+            'doctor_name': doctor_name(prescription),
+            'diagnosis': prescription.diagnosis,
+            'date_issued': prescription.date_issued.strftime('%Y-%m-%d'),
+            'medicines': [{
+                'name': medicine.name,
+                'dosage': medicine.dosage,
+                'frequency': medicine.frequency,
+                'timing': medicine.timing
+            } for medicine in prescription.medicine_entries]
+        } for prescription in prescriptions],
+        'appointments': [{
+            'appointment_id': appointment.appointment_id,
+            'doctor_name': doctor_name(appointment),
+            'date': appointment.date_time.strftime('%Y-%m-%d'),
+            'time': appointment.date_time.strftime('%H:%M'),
+            'status': appointment.status
+        } for appointment in appointments],
+        'lab_reports': [{
+            'report_id': report.report_id,
+            'report_type': report.report_type,
+            'file_url': report.file_url,
+            'uploaded_on': report.uploaded_on.strftime('%Y-%m-%d')
+        } for report in lab_reports]
+    }, separators=(',', ':'), sort_keys=True).encode()  # as Flask's jsonify does by default
+
+# ------------------- AFTER -------------------
+MEDICINE = Serializer('name', 'dosage', 'frequency', 'timing')
+PRESCRIPTION = Serializer(
+    'prescription_id',
+    Field('doctor_name', source=doctor_name),
+    'diagnosis',
+    Field('date_issued', format=format_date),
+    Field('medicines', source='medicine_entries', nested=MEDICINE)
+)
+APPOINTMENT = Serializer(
+    'appointment_id',
+    Field('doctor_name', source=doctor_name),
+    Field('date', source='date_time', format=format_date),
+    Field('time', source='date_time', format=format_time),
+    'status'
+)
+LAB_REPORT = Serializer('report_id', 'report_type', 'file_url', Field('uploaded_on', format=format_date))
+
+def serializer_payload(prescriptions, appointments, lab_reports):
+    return dumps({
+        'prescriptions': PRESCRIPTION.dump_many(prescriptions),
+        'appointments': APPOINTMENT.dump_many(appointments),
+        'lab_reports': LAB_REPORT.dump_many(lab_reports)
+    })
+
+def best_of(function, args, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--prescriptions', type=int, default=300)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    dashboard = build_dashboard(args.prescriptions)
+    legacy_time, legacy_body = best_of(legacy_payload, dashboard, args.repeat)
+    fast_time, fast_body = best_of(serializer_payload, dashboard, args.repeat)
+    assert json.loads(legacy_body) == json.loads(fast_body), "serializers changed the payload"
+
+    print(f"encoder: {'orjson' if orjson is not None else 'stdlib json'}")
+    print(f"dict comprehensions + strftime + json: {legacy_time * 1000:8.2f} ms")
+    print(f"compiled serializers + fast encoder:   {fast_time * 1000:8.2f} ms  ({legacy_time / fast_time:.1f}x)")
+
+    print(f"\nidentity: {len(fast_body):>9,} bytes")
+    gzip_time, gzipped = best_of(gzip.compress, (fast_body, 6), 5)
+    print(f"gzip -6:  {len(gzipped):>9,} bytes  ({len(gzipped) / len(fast_body):.0%}, {gzip_time * 1000:.2f} ms)")
+    if brotli is not None:
+        brotli_time, compressed = best_of(lambda body: brotli.compress(body, quality=4), (fast_body,), 5)
+        print(f"br q4:    {len(compressed):>9,} bytes  ({len(compressed) / len(fast_body):.0%}, {brotli_time * 1000:.2f} ms)")
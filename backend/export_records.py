@@ -0,0 +1,30 @@
+import argparse
+import sys
+from app import app
+from services.record_export import record_exporter, EXPORT_FORMATS
+
+def export_records(patient_id=None, doctor_id=None, export_format='ndjson', output=None):
+    with app.app_context():
+        if doctor_id is not None:
+            patient_ids = record_exporter.iter_panel_patient_ids(doctor_id)
+        else:
+            patient_ids = [patient_id]
+
+        out = open(output, 'w', encoding='utf-8') if output else sys.stdout
+        try:
+            for chunk in record_exporter.stream(patient_ids, export_format):
+                out.write(chunk)
+        finally:
+            if output:
+                out.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Stream a full patient record export as NDJSON or a FHIR bundle")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--patient-id', type=int, help="Export a single patient's record")
+    target.add_argument('--doctor-id', type=int, help="Bulk export every patient who granted this doctor access")
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default='ndjson')
+    parser.add_argument('--output', help="Write to this file instead of stdout")
+    args = parser.parse_args()
+
+    export_records(args.patient_id, args.doctor_id, args.format, args.output)
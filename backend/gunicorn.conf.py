@@ -0,0 +1,88 @@
+"""Gunicorn settings for production: ``python run.py --prod`` or ``gunicorn -c gunicorn.conf.py app:app``.
+
+The app is imported once in the master (preload) and forked into
+``WEB_WORKERS`` processes of ``WEB_THREADS`` threads each. Every worker
+gets its own connection pool, sized so all of them together stay within
+the database's ``max_connections``. On SIGTERM each worker fails its
+health check for ``DRAIN_SECONDS``, then stops accepting connections and
+lets in-flight requests finish within ``GRACEFUL_TIMEOUT``.
+
+The event stream is not served here: each open stream would hold one of
+a worker's few request threads for as long as the tab stays open. Run
+``run_events.py`` next to gunicorn and point the frontend's
+``VITE_EVENTS_URL`` at it; workers publish to it through the Postgres
+event bus.
+"""
+import multiprocessing
+import os
+import signal
+import threading
+
+import config as settings
+from utils.serving import server_max_connections, pool_budget, start_draining, is_draining
+
+bind = settings.SERVER_BIND
+workers = settings.WEB_WORKERS or multiprocessing.cpu_count() * 2 + 1
+threads = settings.WEB_THREADS
+worker_class = 'gthread'
+preload_app = True
+timeout = 60
+keepalive = 5
+graceful_timeout = settings.DRAIN_SECONDS + settings.GRACEFUL_TIMEOUT
+accesslog = '-'
+
+if settings.EVENT_BUS_BACKEND == 'local':
+    # A local bus only reaches streams in the process that wrote, and no worker serves streams
+    raise RuntimeError(
+        "EVENT_BUS_BACKEND=local cannot deliver events under gunicorn; use 'postgres' with run_events.py, "
+        "or 'none' to turn live updates off"
+    )
+settings.Config.SERVE_EVENT_STREAM = False
+
+# Size the pools before the app (and its engines) is imported
+max_connections = settings.DB_MAX_CONNECTIONS or server_max_connections(settings.SQLALCHEMY_DATABASE_URI)
+if max_connections:
+    pool_size, max_overflow = pool_budget(max_connections, settings.DB_RESERVED_CONNECTIONS, workers, threads)
+else:
+    pool_size, max_overflow = settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW
+settings.Config.SQLALCHEMY_ENGINE_OPTIONS = settings.engine_options(
+    pool_size,
+    max_overflow,
+    # Web requests should not hold a connection for minutes; CLIs and cron jobs keep no limit
+    settings.DB_STATEMENT_TIMEOUT_MS or 15000
+)
+
+def on_starting(server):
+    server.log.info(
+        f"{workers} workers x {threads} threads, pool {pool_size}+{max_overflow} per worker"
+        + (f" (max_connections {max_connections}, {settings.DB_RESERVED_CONNECTIONS} reserved)" if max_connections else "")
+    )
+
+def pre_fork(server, worker):
+    # Connections opened while preloading must not be shared with the children
+    from app import app, db
+    with app.app_context():
+        db.engine.dispose()
+        for engine in db.replicas.engines:
+            engine.dispose()
+
+def post_worker_init(worker):
+    stop = signal.getsignal(signal.SIGTERM)
+
+    def drain(signum, frame):
+        if is_draining():
+            return
+        # Keep serving while health checks fail so the load balancer moves traffic away first
+        start_draining()
+        worker.log.info(f"Worker {os.getpid()} draining for {settings.DRAIN_SECONDS}s")
+        threading.Timer(settings.DRAIN_SECONDS, stop, (signum, frame)).start()
+
+    signal.signal(signal.SIGTERM, drain)
+
+def worker_exit(server, worker):
+    # Write out buffered dose acknowledgements before the process goes away
+    from services.adherence import adherence_ingestor
+    try:
+        adherence_ingestor.flush()
+    except Exception as e:
+        server.log.error(f"Could not flush adherence events: {str(e)}")
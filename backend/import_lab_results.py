@@ -0,0 +1,28 @@
+import argparse
+import sys
+from app import app
+from services.lab_results import parse_csv, parse_hl7, ingest
+
+def import_lab_results(path, file_format=None, patient_id=None):
+    file_format = file_format or ('hl7' if path.lower().endswith(('.hl7', '.txt')) else 'csv')
+    with app.app_context():
+        with open(path, newline='', encoding='utf-8') as source:
+            if file_format == 'hl7':
+                observations = parse_hl7(source.read(), patient_id)
+            else:
+                observations = parse_csv(source, patient_id)
+            return ingest(observations, app.config['LAB_IMPORT_BATCH_SIZE'])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Bulk import numeric lab results from CSV or HL7 v2 (ORU/OBX) files")
+    parser.add_argument('paths', nargs='+', help="Files to import; re-importing a file skips rows already stored")
+    parser.add_argument('--format', choices=('csv', 'hl7'), help="Defaults from the extension (.hl7/.txt are HL7)")
+    parser.add_argument('--patient-id', type=int, help="Patient for files that do not name one")
+    args = parser.parse_args()
+
+    try:
+        for path in args.paths:
+            read, inserted = import_lab_results(path, args.format, args.patient_id)
+            print(f"{path}: {read} observations read, {inserted} new")
+    except ValueError as e:
+        sys.exit(f"Import failed: {e}")
@@ -0,0 +1,159 @@
+"""Load test: API throughput and latency under the Flask dev server and under gunicorn.
+
+Starts each server in turn against a scratch SQLite database (or
+``--database-url``) seeded with one doctor and ``--patients`` patients,
+then sends dashboard and list requests from ``--concurrency`` client
+threads for ``--seconds``. Run it from the backend directory:
+
+    python load_test.py [--mode both] [--concurrency 32] [--seconds 20]
+
+SQLite serializes writers and the clients share the machine with the
+server, so compare the two modes with each other rather than reading the
+numbers as production capacity.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRATCH_DB = os.path.join(tempfile.mkdtemp(prefix='medivault-load-'), 'load.db')
+
+def seed(patients):
+    """One doctor with appointments and access for every patient; returns (doctor token, patient tokens)."""
+    from flask_jwt_extended import create_access_token
+    from app import app
+    from models import db, User, Doctor, Appointment, PatientAccess, MedicalHistory
+
+    with app.app_context():
+        doctor = User(name='Load Test Doctor', email='doctor@load.test', password_hash='x', role='Doctor')
+        db.session.add(doctor)
+        db.session.flush()
+        db.session.add(Doctor(doctor_id=doctor.user_id, specialization='General'))
+        patient_ids = []
+        for index in range(patients):
+            patient = User(name=f'Load Test Patient {index}', email=f'patient{index}@load.test', password_hash='x', role='Patient')
+            db.session.add(patient)
+            db.session.flush()
+            patient_ids.append(patient.user_id)
+            db.session.add(Appointment(patient_id=patient.user_id, doctor_id=doctor.user_id, date_time=datetime.utcnow() + timedelta(days=index % 30)))
+            db.session.add(PatientAccess(patient_id=patient.user_id, doctor_id=doctor.user_id, access_granted=True))
+            db.session.add(MedicalHistory(patient_id=patient.user_id, disease='hypertension', allergies='none'))
+        db.session.commit()
+
+        # Long enough that no token expires mid-run
+        expires = timedelta(hours=2)
+        doctor_token = create_access_token(identity={'user_id': doctor.user_id, 'role': 'Doctor'}, expires_delta=expires)
+        patient_tokens = [
+            create_access_token(identity={'user_id': patient_id, 'role': 'Patient'}, expires_delta=expires)
+            for patient_id in patient_ids
+        ]
+    return doctor_token, patient_tokens
+
+def server_command(mode, port):
+    if mode == 'dev':
+        # What run.py starts, minus the debugger and reloader
+        return [sys.executable, '-c', f"from app import app; app.run(host='127.0.0.1', port={port})"]
+    return [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}', 'app:app']
+
+def wait_until_up(base_url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"{base_url}/api/health", timeout=2) as response:
+                if response.status == 200:
+                    return
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Server at {base_url} did not come up")
+
+def run_clients(base_url, doctor_token, patient_tokens, concurrency, seconds):
+    requests = [
+        ('/api/doctor/dashboard', lambda: doctor_token),
+        ('/api/doctor/eligible-patients', lambda: doctor_token),
+        ('/api/patient/dashboard', lambda: random.choice(patient_tokens)),
+        ('/api/patient/appointments', lambda: random.choice(patient_tokens))
+    ]
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def client():
+        own_latencies, own_errors = [], []
+        while time.monotonic() < deadline:
+            path, token = random.choice(requests)
+            request = urllib.request.Request(f"{base_url}{path}", headers={'Authorization': f'Bearer {token()}'})
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    response.read()
+                own_latencies.append(time.perf_counter() - started)
+            except Exception as e:
+                own_errors.append(type(e).__name__)
+        with lock:
+            latencies.extend(own_latencies)
+            errors.extend(own_errors)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.monotonic() - started
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))] * 1000 if values else float('nan')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mode', choices=('dev', 'prod', 'both'), default='both')
+    parser.add_argument('--concurrency', type=int, default=32, help="Client threads")
+    parser.add_argument('--seconds', type=float, default=20)
+    parser.add_argument('--patients', type=int, default=200)
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--database-url', help="Defaults to a scratch SQLite database")
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = args.database_url or f"sqlite:///{SCRATCH_DB}"
+    os.environ.setdefault('JWT_SECRET_KEY', 'load-test-secret')
+    os.environ['SEARCH_BACKEND'] = os.environ.get('SEARCH_BACKEND', 'auto')
+    # No event streams are opened, and gunicorn refuses the single-process bus
+    os.environ.setdefault('EVENT_BUS_BACKEND', 'none')
+    doctor_token, patient_tokens = seed(args.patients)
+
+    results = {}
+    for mode in (('dev', 'prod') if args.mode == 'both' else (args.mode,)):
+        base_url = f"http://127.0.0.1:{args.port}"
+        server = subprocess.Popen(server_command(mode, args.port), cwd=BACKEND_DIR, env=os.environ.copy(),
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_until_up(base_url)
+            run_clients(base_url, doctor_token, patient_tokens, args.concurrency, 2)  # warm up
+            latencies, errors, elapsed = run_clients(base_url, doctor_token, patient_tokens, args.concurrency, args.seconds)
+            with urllib.request.urlopen(f"{base_url}/api/health/pool") as response:
+                pool = json.loads(response.read())
+        finally:
+            server.terminate()
+            server.wait(timeout=60)
+
+        latencies.sort()
+        results[mode] = len(latencies) / elapsed
+        print(f"{mode:<5} {len(latencies) / elapsed:8.1f} req/s  p50 {percentile(latencies, 0.5):7.1f} ms  "
+              f"p95 {percentile(latencies, 0.95):7.1f} ms  p99 {percentile(latencies, 0.99):7.1f} ms  "
+              f"errors {len(errors)}{' (' + ', '.join(sorted(set(errors))) + ')' if errors else ''}")
+        print(f"      pool (one worker): {json.dumps(pool['engines'].get('primary', {}))}")
+        time.sleep(1)  # let the port free up
+
+    if len(results) == 2:
+        print(f"gunicorn vs dev server: {results['prod'] / results['dev']:.2f}x throughput")
@@ -0,0 +1,35 @@
+import argparse
+import sys
+from app import app
+from services.partitioning import PARTITIONED_TABLES, ensure_partitions, archive_partitions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Maintain the monthly partitions of appointments and adherence events (PostgreSQL)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    ensure = commands.add_parser('ensure', help="Create missing partitions for this month and the months ahead")
+    ensure.add_argument('--months-ahead', type=int, help="Defaults to PARTITION_MONTHS_AHEAD")
+
+    archive = commands.add_parser('archive', help="Export old partitions to gzipped NDJSON and detach them")
+    archive.add_argument('--table', choices=sorted(PARTITIONED_TABLES), default='appointments')
+    archive.add_argument('--older-than-months', type=int, help="Defaults to ARCHIVE_AFTER_MONTHS")
+    archive.add_argument('--dir', help="Defaults to ARCHIVE_DIR")
+    archive.add_argument('--drop', action='store_true', help="Drop detached tables once exported; reads then come from the files")
+    args = parser.parse_args()
+
+    with app.app_context():
+        try:
+            if args.command == 'ensure':
+                months_ahead = app.config['PARTITION_MONTHS_AHEAD'] if args.months_ahead is None else args.months_ahead
+                created = ensure_partitions(months_ahead)
+                print(f"Created {', '.join(created)}" if created else "All partitions present")
+            else:
+                archived = archive_partitions(
+                    args.table,
+                    app.config['ARCHIVE_AFTER_MONTHS'] if args.older_than_months is None else args.older_than_months,
+                    args.dir or app.config['ARCHIVE_DIR'],
+                    drop=args.drop
+                )
+                print(f"Archived {', '.join(archived)}" if archived else "Nothing to archive")
+        except (ValueError, RuntimeError) as e:
+            sys.exit(f"Partition maintenance failed: {e}")
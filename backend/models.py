@@ -1,7 +1,13 @@
-from flask_sqlalchemy import SQLAlchemy
+from utils.db_routing import RoutingSQLAlchemy
 from datetime import datetime, date, time
 
-db = SQLAlchemy()
+db = RoutingSQLAlchemy()
+
+# ------------------- SYNC TRACKING -------------------
+class SyncTracked:
+    # Delta sync scans (owner_id, updated_at) ranges; created_at splits inserts from updates
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
 # ------------------- USERS -------------------
 class User(db.Model):
@@ -11,7 +17,7 @@ class User(db.Model):
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(512), nullable=False)
     role = db.Column(db.String(10), nullable=False)  # 'Patient' or 'Doctor'
-    phone_number = db.Column(db.String(20))  # New field for phone number
+    phone_number = db.Column(db.String(20), index=True)  # SMS replies look patients up by it
 
 # ------------------- DOCTORS -------------------
 class Doctor(db.Model):
@@ -21,16 +27,23 @@ class Doctor(db.Model):
     availability_slots = db.Column(db.Text)
 
 # ------------------- PATIENT ACCESS CONTROL -------------------
-class PatientAccess(db.Model):
+class PatientAccess(SyncTracked, db.Model):
     __tablename__ = 'patient_access'
+    __table_args__ = (
+        db.Index('ix_patient_access_patient_updated', 'patient_id', 'updated_at'),
+        db.Index('ix_patient_access_doctor_updated', 'doctor_id', 'updated_at'),
+    )
     patient_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), primary_key=True)
     doctor_id = db.Column(db.Integer, db.ForeignKey('doctors.doctor_id'), primary_key=True)
     access_granted = db.Column(db.Boolean, default=False)
     granted_on = db.Column(db.DateTime, default=datetime.utcnow)
 
 # ------------------- MEDICAL HISTORY -------------------
-class MedicalHistory(db.Model):
+class MedicalHistory(SyncTracked, db.Model):
     __tablename__ = 'medical_history'
+    __table_args__ = (
+        db.Index('ix_medical_history_patient_updated', 'patient_id', 'updated_at'),
+    )
     record_id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
     disease = db.Column(db.String(200))
@@ -38,8 +51,12 @@ class MedicalHistory(db.Model):
     surgery_history = db.Column(db.Text)
 
 # ------------------- PRESCRIPTIONS -------------------
-class Prescription(db.Model):
+class Prescription(SyncTracked, db.Model):
     __tablename__ = 'prescriptions'
+    __table_args__ = (
+        db.Index('ix_prescriptions_patient_updated', 'patient_id', 'updated_at'),
+        db.Index('ix_prescriptions_doctor_updated', 'doctor_id', 'updated_at'),
+    )
     prescription_id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
     doctor_id = db.Column(db.Integer, db.ForeignKey('doctors.doctor_id'), nullable=False)
@@ -52,6 +69,9 @@ class Prescription(db.Model):
 # ------------------- MEDICINE ENTRIES -------------------
 class MedicineEntry(db.Model):
     __tablename__ = 'medicine_entries'
+    __table_args__ = (
+        db.Index('ix_medicine_entries_prescription', 'prescription_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     prescription_id = db.Column(db.Integer, db.ForeignKey('prescriptions.prescription_id'), nullable=False)
     name = db.Column(db.String(100), nullable=False)
@@ -63,8 +83,11 @@ class MedicineEntry(db.Model):
     reminders = db.relationship('MedicationReminder', backref='medicine', lazy=True)
 
 # ------------------- MEDICATION REMINDERS -------------------
-class MedicationReminder(db.Model):
+class MedicationReminder(SyncTracked, db.Model):
     __tablename__ = 'medication_reminders'
+    __table_args__ = (
+        db.Index('ix_medication_reminders_patient_updated', 'patient_id', 'updated_at'),
+    )
     reminder_id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
     medicine_entry_id = db.Column(db.Integer, db.ForeignKey('medicine_entries.id'), nullable=False)
@@ -74,8 +97,15 @@ class MedicationReminder(db.Model):
     is_active = db.Column(db.Boolean, default=True)
 
 # ------------------- APPOINTMENTS -------------------
-class Appointment(db.Model):
+class Appointment(SyncTracked, db.Model):
     __tablename__ = 'appointments'
+    __table_args__ = (
+        db.Index('ix_appointments_patient_updated', 'patient_id', 'updated_at'),
+        db.Index('ix_appointments_doctor_updated', 'doctor_id', 'updated_at'),
+        db.Index('ix_appointments_patient_date', 'patient_id', 'date_time'),
+        db.Index('ix_appointments_doctor_date', 'doctor_id', 'date_time'),
+    )
+    # On PostgreSQL the table is range-partitioned by month on date_time (see alembic/versions)
     appointment_id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
     doctor_id = db.Column(db.Integer, db.ForeignKey('doctors.doctor_id'), nullable=False)
@@ -83,18 +113,133 @@ class Appointment(db.Model):
     status = db.Column(db.String(20), default="Pending")  # Pending/Approved/Cancelled
 
 # ------------------- LAB REPORTS -------------------
-class LabReport(db.Model):
+class LabReport(SyncTracked, db.Model):
     __tablename__ = 'lab_reports'
+    __table_args__ = (
+        db.Index('ix_lab_reports_patient_updated', 'patient_id', 'updated_at'),
+    )
     report_id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
     report_type = db.Column(db.String(100))
     file_url = db.Column(db.String(300))
     uploaded_on = db.Column(db.DateTime, default=datetime.utcnow)
 
+# ------------------- LAB OBSERVATIONS -------------------
+class LabObservation(db.Model):
+    __tablename__ = 'lab_observations'
+    __table_args__ = (
+        # Trend queries are range scans over one patient's analyte; the unique key also makes re-imports idempotent
+        db.UniqueConstraint('patient_id', 'analyte', 'observed_at', name='uq_lab_observations_series'),
+    )
+    observation_id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    patient_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
+    report_id = db.Column(db.Integer, db.ForeignKey('lab_reports.report_id'))
+    analyte = db.Column(db.String(40), nullable=False)  # e.g. 'glucose', 'hba1c'
+    observed_at = db.Column(db.DateTime, nullable=False)
+    value = db.Column(db.Float, nullable=False)
+    unit = db.Column(db.String(20))
+
 # ------------------- DOCTOR ACCESS REQUESTS -------------------
-class DoctorRequest(db.Model):
+class DoctorRequest(SyncTracked, db.Model):
     __tablename__ = 'doctor_requests'
+    __table_args__ = (
+        db.Index('ix_doctor_requests_patient_updated', 'patient_id', 'updated_at'),
+        db.Index('ix_doctor_requests_doctor_updated', 'doctor_id', 'updated_at'),
+    )
     request_id = db.Column(db.Integer, primary_key=True)
     doctor_id = db.Column(db.Integer, db.ForeignKey('doctors.doctor_id'), nullable=False)
     patient_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
     status = db.Column(db.String(20), default='Pending')  # Pending/Approved/Denied
+
+# ------------------- SYNC TOMBSTONES -------------------
+class SyncTombstone(db.Model):
+    __tablename__ = 'sync_tombstones'
+    __table_args__ = (
+        db.Index('ix_sync_tombstones_patient_deleted', 'patient_id', 'deleted_at'),
+        db.Index('ix_sync_tombstones_doctor_deleted', 'doctor_id', 'deleted_at'),
+    )
+    tombstone_id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(50), nullable=False)  # sync entity name, e.g. 'appointments'
+    row_id = db.Column(db.String(50), nullable=False)  # composite keys are joined with ':'
+    patient_id = db.Column(db.Integer)
+    doctor_id = db.Column(db.Integer)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+# ------------------- DOCTOR ANALYTICS ROLLUPS -------------------
+class DoctorAppointmentRollup(db.Model):
+    __tablename__ = 'doctor_appointment_rollups'
+    doctor_id = db.Column(db.Integer, db.ForeignKey('doctors.doctor_id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)  # lower-cased appointment status
+    appointment_count = db.Column(db.Integer, nullable=False, default=0)
+
+class DoctorMedicineRollup(db.Model):
+    __tablename__ = 'doctor_medicine_rollups'
+    doctor_id = db.Column(db.Integer, db.ForeignKey('doctors.doctor_id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    medicine_name = db.Column(db.String(100), primary_key=True)  # trimmed, lower-cased
+    prescription_count = db.Column(db.Integer, nullable=False, default=0)
+
+class DoctorReminderRollup(db.Model):
+    __tablename__ = 'doctor_reminder_rollups'
+    doctor_id = db.Column(db.Integer, db.ForeignKey('doctors.doctor_id'), primary_key=True)
+    patient_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), primary_key=True)
+    active_reminders = db.Column(db.Integer, nullable=False, default=0)
+
+# ------------------- MEDICATION ADHERENCE -------------------
+class AdherenceEvent(db.Model):
+    __tablename__ = 'adherence_events'
+    __table_args__ = (
+        db.UniqueConstraint('reminder_id', 'scheduled_for', name='uq_adherence_events_dose'),
+        db.Index('ix_adherence_events_patient_scheduled', 'patient_id', 'scheduled_for'),
+    )
+    # On PostgreSQL the table is range-partitioned by month on scheduled_for (see alembic/versions)
+    event_id = db.Column(db.Integer, primary_key=True)
+    reminder_id = db.Column(db.Integer, db.ForeignKey('medication_reminders.reminder_id'), nullable=False)
+    patient_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
+    medicine_entry_id = db.Column(db.Integer, db.ForeignKey('medicine_entries.id'), nullable=False)
+    scheduled_for = db.Column(db.DateTime, nullable=False)  # the dose's reminder time
+    status = db.Column(db.String(10), nullable=False)  # taken/skipped/missed
+    source = db.Column(db.String(10), nullable=False)  # app/sms/sweep
+    recorded_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+class PatientAdherence(db.Model):
+    __tablename__ = 'patient_adherence'
+    patient_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), primary_key=True)
+    taken_count = db.Column(db.Integer, nullable=False, default=0)
+    skipped_count = db.Column(db.Integer, nullable=False, default=0)
+    missed_count = db.Column(db.Integer, nullable=False, default=0)
+
+class MedicineAdherence(db.Model):
+    __tablename__ = 'medicine_adherence'
+    patient_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), primary_key=True)
+    medicine_entry_id = db.Column(db.Integer, db.ForeignKey('medicine_entries.id'), primary_key=True)
+    taken_count = db.Column(db.Integer, nullable=False, default=0)
+    skipped_count = db.Column(db.Integer, nullable=False, default=0)
+    missed_count = db.Column(db.Integer, nullable=False, default=0)
+
+# ------------------- REVOKED TOKENS -------------------
+class TokenDenylist(db.Model):
+    __tablename__ = 'token_denylist'
+    __table_args__ = (
+        db.Index('ix_token_denylist_revoked_at', 'revoked_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), unique=True, nullable=False)
+    token_type = db.Column(db.String(10), nullable=False)  # access/refresh
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'))
+    expires_at = db.Column(db.DateTime, nullable=False)  # rows can be pruned once the token would have expired anyway
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+# ------------------- ARCHIVED PARTITIONS -------------------
+class ArchivedPartition(db.Model):
+    __tablename__ = 'archived_partitions'
+    archive_id = db.Column(db.Integer, primary_key=True)
+    table_name = db.Column(db.String(50), nullable=False)  # parent table, e.g. 'appointments'
+    partition_name = db.Column(db.String(63), unique=True, nullable=False)
+    range_start = db.Column(db.Date, nullable=False)
+    range_end = db.Column(db.Date, nullable=False)  # exclusive
+    row_count = db.Column(db.Integer, nullable=False)
+    file_path = db.Column(db.String(500), nullable=False)  # gzipped NDJSON export
+    dropped = db.Column(db.Boolean, default=False, nullable=False)  # False: the detached table is still there
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
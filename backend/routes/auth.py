@@ -1,12 +1,23 @@
 from flask import Blueprint, request, jsonify, session
+from flask_jwt_extended import create_access_token, create_refresh_token, decode_token, get_jwt, get_jwt_identity, jwt_required
 from werkzeug.security import generate_password_hash, check_password_hash
 from models import db, User
+from services.token_revocation import token_revocation
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
 auth_bp = Blueprint('auth', __name__)
 
+def issue_tokens(user):
+    # The identity carries everything routes check, so requests never look the user up
+    identity = {'user_id': user.user_id, 'role': user.role}
+    return {
+        'access_token': create_access_token(identity=identity),
+        'refresh_token': create_refresh_token(identity=identity)
+    }
+
 # Temporary debug route - remove in production
 @auth_bp.route('/users', methods=['GET'])
 def list_users():
@@ -39,7 +50,7 @@ def register():
         # Create new user
         new_user = User(
             email=data['email'],
-            password=generate_password_hash(data['password']),
+            password_hash=generate_password_hash(data['password']),
             name=data['name'],
             role=data['role'],
             phone_number=data.get('phone_number')
@@ -53,6 +64,7 @@ def register():
         
         return jsonify({
             'message': 'Registration successful',
+            **issue_tokens(new_user),
             'user': {
                 'id': new_user.user_id,
                 'name': new_user.name,
@@ -76,7 +88,7 @@ def login():
         
         # Find user
         user = User.query.filter_by(email=data['email']).first()
-        if not user or not check_password_hash(user.password, data['password']):
+        if not user or not check_password_hash(user.password_hash, data['password']):
             return jsonify({'error': 'Invalid email or password'}), 401
         
         # Set session data
@@ -89,6 +101,7 @@ def login():
         
         return jsonify({
             'message': 'Login successful',
+            **issue_tokens(user),
             'user': {
                 'id': user.user_id,
                 'name': user.name,
@@ -101,9 +114,51 @@ def login():
         logger.error(f"Login error: {str(e)}")
         return jsonify({'error': 'Login failed'}), 500
 
+@auth_bp.route('/refresh', methods=['POST'])
+@jwt_required(refresh=True)
+def refresh():
+    try:
+        # Rotate: each refresh token is good for one refresh, so a copied one stops working once used
+        token_revocation.revoke(get_jwt())
+        identity = get_jwt_identity()
+        return jsonify({
+            'access_token': create_access_token(identity=identity),
+            'refresh_token': create_refresh_token(identity=identity)
+        }), 200
+    except Exception as e:
+        logger.error(f"Refresh error: {str(e)}")
+        return jsonify({'error': 'Refresh failed'}), 500
+
+def _token_claims(encoded_token, token_type):
+    """Claims of one of our tokens of ``token_type``, even if it has expired; None for anything else."""
+    if not encoded_token:
+        return None
+    try:
+        claims = decode_token(encoded_token, allow_expired=True)
+    except Exception:
+        return None  # malformed or not signed by us
+    return claims if claims.get('type') == token_type else None
+
+def _user_id(claims):
+    identity = claims.get('sub')
+    return identity.get('user_id') if isinstance(identity, dict) else None
+
 @auth_bp.route('/logout', methods=['POST'])
 def logout():
     try:
+        # Not behind jwt_required: an access token that expired while the user was idle
+        # must not stop the refresh token, which lives for days, from being revoked
+        header = request.headers.get('Authorization', '')
+        access_claims = _token_claims(header[len('Bearer '):] if header.startswith('Bearer ') else None, 'access')
+        refresh_claims = _token_claims((request.get_json(silent=True) or {}).get('refresh_token'), 'refresh')
+        if access_claims and refresh_claims and _user_id(access_claims) != _user_id(refresh_claims):
+            return jsonify({'error': 'Refresh token belongs to another user'}), 403
+
+        for claims in (access_claims, refresh_claims):
+            # Expired tokens are refused anyway; there is nothing left to deny
+            if claims and claims['exp'] > time.time():
+                token_revocation.revoke(claims)
+
         # Clear session
         session.clear()
         return jsonify({'message': 'Logged out successfully'}), 200
@@ -0,0 +1,134 @@
+from flask import Blueprint, Response, current_app, g, jsonify, request
+from flask_jwt_extended import jwt_required
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.test import EnvironBuilder
+from models import db
+from utils.auth_helpers import BATCH_JWT_ENVIRON, verified_jwt
+from utils.serializers import dumps
+from config import BATCH_MAX_WORKERS
+import logging
+
+logger = logging.getLogger(__name__)
+
+batch_bp = Blueprint('batch', __name__)
+
+BATCH_METHODS = ('GET', 'POST', 'PUT', 'DELETE')
+UNBATCHABLE_PREFIXES = ('/api/batch', '/api/events')
+
+# Shared by every batch so concurrency stays bounded per worker process
+_executor = ThreadPoolExecutor(max_workers=BATCH_MAX_WORKERS, thread_name_prefix='batch')
+
+def _validate(subrequests, limit):
+    if not isinstance(subrequests, list) or not subrequests:
+        return "'requests' must be a non-empty list"
+    if len(subrequests) > limit:
+        return f"At most {limit} requests can be batched"
+    for index, sub in enumerate(subrequests):
+        if not isinstance(sub, dict) or not isinstance(sub.get('path'), str):
+            return f"Request {index} needs a 'path'"
+        if not sub['path'].startswith('/api/') or sub['path'].startswith(UNBATCHABLE_PREFIXES):
+            return f"Request {index} targets a path that cannot be batched: {sub['path']}"
+        if sub.get('method', 'GET').upper() not in BATCH_METHODS:
+            return f"Request {index} uses an unsupported method"
+    return None
+
+def _dispatch(app, sub, headers, verified):
+    """Run one sub-request through the normal blueprint stack and return (status, body bytes, set-cookies).
+
+    Called inside an app context, which the sub-request shares: its ``g``
+    and database session are the caller's. The batch's verified JWT rides
+    along in the environ, so views do not decode it again.
+    """
+    path, _, query_string = sub['path'].partition('?')
+    builder = EnvironBuilder(
+        path=path,
+        query_string=query_string,
+        method=sub.get('method', 'GET').upper(),
+        headers=headers,
+        json=sub.get('body')
+    )
+    environ = builder.get_environ()
+    environ[BATCH_JWT_ENVIRON] = verified
+    # Each view picks its own database route; a write stays pinned to the primary
+    g.pop('db_route', None)
+    g.pop('db_replica', None)
+    try:
+        with app.request_context(environ):
+            try:
+                response = app.full_dispatch_request()
+            except Exception as e:
+                logger.error(f"Error in batched request {sub['path']}: {str(e)}", exc_info=True)
+                db.session.rollback()
+                return 500, dumps({"error": str(e)}), []
+            # Error pages are safe to buffer; a streamed success (an export) is not
+            if response.is_streamed and response.status_code < 400:
+                response.close()
+                return 400, dumps({"error": "Streaming endpoints cannot be batched"}), []
+            body = response.get_data()
+            if response.mimetype != 'application/json':
+                body = dumps(body.decode('utf-8', 'replace'))
+            if response.status_code >= 500:
+                # Views answer errors without rolling back; the next sub-request needs a usable session
+                db.session.rollback()
+            return response.status_code, body or b'null', response.headers.getlist('Set-Cookie')
+    finally:
+        builder.close()
+        # Rows read from a replica must not stand in for the primary's in a later sub-request
+        db.session.expire_all()
+
+def _dispatch_isolated(app, sub, headers, verified):
+    # Reads running side by side each need a session of their own, so a worker thread gets its own app context
+    with app.app_context():
+        return _dispatch(app, sub, headers, verified)
+
+@batch_bp.route('', methods=['POST'])
+@jwt_required()
+def batch():
+    try:
+        data = request.get_json(silent=True) or {}
+        subrequests = data.get('requests')
+        error = _validate(subrequests, current_app.config['BATCH_MAX_REQUESTS'])
+        if error:
+            return jsonify({"error": error}), 400
+
+        app = current_app._get_current_object()
+        # Verified once here (signature, expiry, denylist); sub-requests reuse the identity
+        verified = verified_jwt()
+        headers = {name: request.headers[name] for name in ('Authorization', 'Cookie') if name in request.headers}
+
+        results = [None] * len(subrequests)
+        pending_reads = []
+
+        def wait_for_reads():
+            for index, future in pending_reads:
+                results[index] = future.result()
+            pending_reads.clear()
+
+        # Sub-requests run in this request's app context and database session. Consecutive
+        # GETs before the first write run concurrently instead, each with a session of its
+        # own; once the batch has written, everything runs here, so reads see the write.
+        for index, sub in enumerate(subrequests):
+            if sub.get('method', 'GET').upper() == 'GET' and not g.get('db_wrote'):
+                pending_reads.append((index, _executor.submit(_dispatch_isolated, app, sub, headers, verified)))
+            else:
+                wait_for_reads()
+                results[index] = _dispatch(app, sub, headers, verified)
+        wait_for_reads()
+
+        # Sub-responses are already JSON, so splice them in rather than decode and re-encode
+        parts = []
+        cookies = {}
+        for index, (sub, (status, body, set_cookies)) in enumerate(zip(subrequests, results)):
+            request_id = dumps(sub.get('id', index))
+            parts.append(b'{"id":' + request_id + b',"status":' + str(status).encode() + b',"body":' + body + b'}')
+            for cookie in set_cookies:
+                cookies[cookie.split('=', 1)[0]] = cookie  # last sub-request wins
+
+        response = Response(b'{"responses":[' + b','.join(parts) + b']}', mimetype='application/json')
+        for cookie in cookies.values():
+            response.headers.add('Set-Cookie', cookie)
+        return response
+
+    except Exception as e:
+        logger.error(f"Error in batch: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
@@ -1,12 +1,23 @@
-from flask import Blueprint, jsonify, request
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, User, Doctor, Appointment, DoctorRequest, PatientAccess, Prescription, MedicineEntry
+from flask import Blueprint, current_app, jsonify, request
+from flask_jwt_extended import get_jwt_identity
+from utils.auth_helpers import jwt_required
+from models import db, User, Doctor, Appointment, DoctorRequest, PatientAccess, Prescription, MedicineEntry, PatientAdherence
+from utils.db_routing import replica_read
+from utils.serializers import json_response
+from schemas import PANEL_PATIENT, DASHBOARD_PATIENT, DOCTOR_APPOINTMENT
+from services.record_export import record_exporter, EXPORT_FORMATS
+from services.sync import collect_changes, decode_cursor
+from services.analytics import doctor_analytics
+from services.adherence import patient_adherence
+from services.lab_results import lab_series, lab_trend, parse_trend_args
+from services.patient_search import patient_search, tokenize, SEARCH_FIELDS, MIN_INDEXED_TERM
 from datetime import datetime
 
 doctor_bp = Blueprint('doctor', __name__)
 
 @doctor_bp.route('/eligible-patients', methods=['GET'])
 @jwt_required()
+@replica_read
 def get_eligible_patients():
     current_user = get_jwt_identity()
     if current_user['role'] != 'Doctor':
@@ -14,19 +25,47 @@ def get_eligible_patients():
 
     try:
         # Fetch patients who have had appointments with the logged-in doctor
-        patients = db.session.query(User.user_id, User.name, User.username).join(
+        patients = db.session.query(User.user_id, User.name, User.email).join(
             Appointment, User.user_id == Appointment.patient_id
         ).filter(
             Appointment.doctor_id == current_user['user_id']
         ).distinct().all()
 
-        patients_data = [{
-            'id': patient.user_id,
-            'name': patient.name,
-            'username': patient.username
-        } for patient in patients]
+        return json_response(PANEL_PATIENT.dump_many(patients))
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        return jsonify(patients_data)
+
+@doctor_bp.route('/search', methods=['GET'])
+@jwt_required()
+@replica_read
+def search_patients():
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'Doctor':
+        return jsonify({"error": "Unauthorized"}), 403
+
+    try:
+        query = request.args.get('q', '').strip()
+        # The indexes need a whole trigram; shorter words only narrow what a longer one found
+        if not any(len(term) >= MIN_INDEXED_TERM for term in tokenize(query)):
+            return jsonify({"error": f"Search for a word of at least {MIN_INDEXED_TERM} characters"}), 400
+
+        fields = tuple(request.args.get('fields', ','.join(SEARCH_FIELDS)).split(','))
+        unknown = set(fields) - set(SEARCH_FIELDS)
+        if unknown:
+            return jsonify({"error": f"Unknown search fields: {', '.join(sorted(unknown))}"}), 400
+
+        try:
+            limit = int(request.args.get('limit', current_app.config['SEARCH_DEFAULT_LIMIT']))
+        except ValueError:
+            return jsonify({"error": "limit must be a number"}), 400
+        limit = max(1, min(limit, current_app.config['SEARCH_MAX_LIMIT']))
+        fuzzy = request.args.get('fuzzy', '').lower() == 'true'
+
+        # Clinical fields only match patients who granted access; names and emails also match patients seen
+        results = patient_search.search(current_user['user_id'], query, fields, limit, fuzzy)
+        return json_response({'query': query, 'fuzzy': fuzzy, 'results': results})
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -34,57 +73,69 @@ def get_eligible_patients():
 
 @doctor_bp.route('/dashboard', methods=['GET'])
 @jwt_required()
+@replica_read
 def doctor_dashboard():
     current_user = get_jwt_identity()
     if current_user['role'] != 'Doctor':
         return jsonify({"error": "Unauthorized"}), 403
 
     try:
-        # Fetch doctor's patients with names in the same query
-        patients = db.session.query(User.user_id, User.name, User.username).join(
+        # Fetch doctor's patients with names and adherence counters in the same query
+        patients = db.session.query(
+            User.user_id,
+            User.name,
+            User.email,
+            PatientAdherence.taken_count,
+            PatientAdherence.skipped_count,
+            PatientAdherence.missed_count
+        ).join(
             Appointment, User.user_id == Appointment.patient_id
+        ).outerjoin(
+            PatientAdherence, PatientAdherence.patient_id == User.user_id
         ).filter(
             Appointment.doctor_id == current_user['user_id']
         ).distinct().all()
 
-        patients_data = [{
-            'id': patient.user_id,
-            'name': patient.name,
-            'username': patient.username
-        } for patient in patients]
-
         # Fetch doctor's appointments with patient names in the same query
         appointments = db.session.query(
-            Appointment.appointment_id, 
-            Appointment.patient_id, 
-            Appointment.date, 
-            Appointment.time, 
-            Appointment.purpose, 
+            Appointment.appointment_id,
+            Appointment.patient_id,
+            Appointment.date_time,
             Appointment.status,
             User.name.label('patient_name')  # Fetch patient name in the same query
         ).join(User, User.user_id == Appointment.patient_id).filter(
             Appointment.doctor_id == current_user['user_id']
         ).all()
 
-        appointments_data = [{
-            'id': appointment.appointment_id,
-            'patient_id': appointment.patient_id,
-            'patient_name': appointment.patient_name,
-            'date': appointment.date.strftime('%Y-%m-%d'),
-            'time': appointment.time.strftime('%H:%M'),
-            'purpose': appointment.purpose,
-            'status': appointment.status
-        } for appointment in appointments]
-
-        return jsonify({
-            'patients': patients_data,
-            'appointments': appointments_data
+        return json_response({
+            'patients': DASHBOARD_PATIENT.dump_many(patients),
+            'appointments': DOCTOR_APPOINTMENT.dump_many(appointments)
         })
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@doctor_bp.route('/sync', methods=['GET'])
+@jwt_required()
+def sync_dashboard():
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'Doctor':
+        return jsonify({"error": "Unauthorized"}), 403
+
+    try:
+        cursor = request.args.get('since')
+        try:
+            since = decode_cursor(cursor) if cursor else None
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        return json_response(collect_changes('doctor_id', current_user['user_id'], since))
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @doctor_bp.route('/prescriptions', methods=['POST'])
 @jwt_required()
 def create_prescription():
@@ -187,6 +238,123 @@ def cancel_appointment(appointment_id):
         return jsonify({"error": str(e)}), 500
 
 
+@doctor_bp.route('/appointments/<int:appointment_id>/no-show', methods=['PUT'])
+@jwt_required()
+def no_show_appointment(appointment_id):
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'Doctor':
+        return jsonify({"error": "Unauthorized"}), 403
+
+    try:
+        appointment = Appointment.query.get(appointment_id)
+        if not appointment or appointment.doctor_id != current_user['user_id']:
+            return jsonify({"error": "Appointment not found"}), 404
+
+        appointment.status = 'no_show'
+        db.session.commit()
+
+        return jsonify({"message": "Appointment marked as no-show"})
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+
+@doctor_bp.route('/analytics', methods=['GET'])
+@jwt_required()
+@replica_read
+def get_analytics():
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'Doctor':
+        return jsonify({"error": "Unauthorized"}), 403
+
+    try:
+        weeks = request.args.get('weeks', 12, type=int)
+        if weeks < 1 or weeks > 104:
+            return jsonify({"error": "weeks must be between 1 and 104"}), 400
+
+        return json_response(doctor_analytics(current_user['user_id'], weeks))
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@doctor_bp.route('/patients/<int:patient_id>/adherence', methods=['GET'])
+@jwt_required()
+@replica_read
+def get_patient_adherence(patient_id):
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'Doctor':
+        return jsonify({"error": "Unauthorized"}), 403
+
+    try:
+        access = PatientAccess.query.filter_by(
+            doctor_id=current_user['user_id'],
+            patient_id=patient_id,
+            access_granted=True
+        ).first()
+        if not access:
+            return jsonify({"error": "Access to this patient's records has not been granted"}), 403
+
+        return json_response(patient_adherence(patient_id))
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@doctor_bp.route('/patients/<int:patient_id>/lab-results', methods=['GET'])
+@jwt_required()
+@replica_read
+def get_patient_lab_results(patient_id):
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'Doctor':
+        return jsonify({"error": "Unauthorized"}), 403
+
+    try:
+        access = PatientAccess.query.filter_by(
+            doctor_id=current_user['user_id'],
+            patient_id=patient_id,
+            access_granted=True
+        ).first()
+        if not access:
+            return jsonify({"error": "Access to this patient's records has not been granted"}), 403
+
+        return json_response(lab_series(patient_id))
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@doctor_bp.route('/patients/<int:patient_id>/lab-results/<analyte>/trend', methods=['GET'])
+@jwt_required()
+@replica_read
+def get_patient_lab_trend(patient_id, analyte):
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'Doctor':
+        return jsonify({"error": "Unauthorized"}), 403
+
+    try:
+        try:
+            start, end, points = parse_trend_args(
+                request.args, current_app.config['LAB_TREND_DEFAULT_POINTS'], current_app.config['LAB_TREND_MAX_POINTS']
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        access = PatientAccess.query.filter_by(
+            doctor_id=current_user['user_id'],
+            patient_id=patient_id,
+            access_granted=True
+        ).first()
+        if not access:
+            return jsonify({"error": "Access to this patient's records has not been granted"}), 403
+
+        return json_response(lab_trend(patient_id, analyte, start, end, points))
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @doctor_bp.route('/request-access', methods=['POST'])
 @jwt_required()
 def request_access():
@@ -229,3 +397,51 @@ def request_access():
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
+
+
+@doctor_bp.route('/patients/<int:patient_id>/export', methods=['GET'])
+@jwt_required()
+@replica_read
+def export_patient_records(patient_id):
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'Doctor':
+        return jsonify({"error": "Unauthorized"}), 403
+
+    try:
+        export_format = request.args.get('format', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({"error": f"Unsupported export format: {export_format}"}), 400
+
+        access = PatientAccess.query.filter_by(
+            doctor_id=current_user['user_id'],
+            patient_id=patient_id,
+            access_granted=True
+        ).first()
+        if not access:
+            return jsonify({"error": "Access to this patient's records has not been granted"}), 403
+
+        return record_exporter.response([patient_id], export_format, f"medivault-patient-{patient_id}")
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@doctor_bp.route('/export', methods=['GET'])
+@jwt_required()
+@replica_read
+def export_panel_records():
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'Doctor':
+        return jsonify({"error": "Unauthorized"}), 403
+
+    try:
+        export_format = request.args.get('format', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({"error": f"Unsupported export format: {export_format}"}), 400
+
+        # Bulk mode: every patient who has granted this doctor access
+        patient_ids = record_exporter.iter_panel_patient_ids(current_user['user_id'])
+        return record_exporter.response(patient_ids, export_format, f"medivault-doctor-{current_user['user_id']}-panel")
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,53 @@
+from flask import Blueprint, Response, current_app, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from services.event_bus import event_bus
+import json
+import logging
+import queue
+
+logger = logging.getLogger(__name__)
+
+events_bp = Blueprint('events', __name__)
+
+def format_sse(payload):
+    return f"id: {payload['id']}\nevent: {payload['type']}\ndata: {json.dumps(payload['data'])}\n\n"
+
+# EventSource cannot set an Authorization header, so the token may also arrive as ?jwt=
+@events_bp.route('/stream', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def event_stream():
+    if not current_app.config['SERVE_EVENT_STREAM']:
+        # Under gunicorn each stream would pin a request thread; run_events.py serves it instead
+        return jsonify({"error": "The event stream is served by the events server (VITE_EVENTS_URL)"}), 404
+    try:
+        current_user = get_jwt_identity()
+        user_id = current_user['user_id']
+        heartbeat = current_app.config['SSE_HEARTBEAT_SECONDS']
+        subscriber = event_bus.subscribe(user_id)
+    except Exception as e:
+        logger.error(f"Error in event_stream: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+    def generate():
+        try:
+            # Clients refetch once on 'ready' and apply deltas from then on; nothing is replayed
+            # from Last-Event-ID, so a reconnect always starts with a fresh 'ready'
+            yield f"retry: 3000\nevent: ready\ndata: {json.dumps({'user_id': user_id})}\n\n"
+            while True:
+                try:
+                    payload = subscriber.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(payload)
+        finally:
+            event_bus.unsubscribe(user_id, subscriber)
+
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
@@ -0,0 +1,33 @@
+from flask import Blueprint, current_app, jsonify, request
+from hmac import compare_digest
+from sqlalchemy import text
+from models import db
+from utils.serving import pool_metrics, is_draining
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+health_bp = Blueprint('health', __name__)
+
+@health_bp.route('', methods=['GET'])
+def health():
+    """Load balancer check: 503 once this worker is draining, or when ``?db=true`` cannot reach the database."""
+    if is_draining():
+        return jsonify({"status": "draining", "pid": os.getpid()}), 503
+    if request.args.get('db', '').lower() == 'true':
+        try:
+            with db.engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+        except Exception as e:
+            logger.error(f"Health check could not reach the database: {str(e)}")
+            return jsonify({"status": "database unavailable", "pid": os.getpid()}), 503
+    return jsonify({"status": "ok", "pid": os.getpid()}), 200
+
+@health_bp.route('/pool', methods=['GET'])
+def pool():
+    """Connection pool counters for the worker that answers (each worker has its own pool)."""
+    token = current_app.config['METRICS_TOKEN']
+    if token and not compare_digest(request.headers.get('X-Metrics-Token', ''), token):
+        return jsonify({"error": "Unauthorized"}), 403
+    return jsonify(pool_metrics.snapshot()), 200
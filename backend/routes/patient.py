@@ -1,22 +1,29 @@
-from flask import Blueprint, jsonify, request
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import Blueprint, current_app, jsonify, request
+from flask_jwt_extended import get_jwt_identity
+from utils.auth_helpers import jwt_required
 from models import db, User, Prescription, MedicationReminder, Appointment, PatientAccess, MedicalHistory, LabReport, DoctorRequest, MedicineEntry
+from utils.db_routing import replica_read
+from utils.serializers import json_response
+from schemas import MEDICAL_HISTORY, PRESCRIPTION, PATIENT_APPOINTMENT, LAB_REPORT, ACCESS_REQUEST, CURRENT_ACCESS, REMINDER
+from services.record_export import record_exporter, EXPORT_FORMATS
+from services.sync import collect_changes, decode_cursor
+from services.adherence import adherence_ingestor, patient_adherence
+from services.lab_results import lab_series, lab_trend, parse_trend_args
+from services.partitioning import iter_archived
+from types import SimpleNamespace
 import logging
 
 logger = logging.getLogger(__name__)
 
 patient_bp = Blueprint('patient', __name__)
 
-def get_doctor_name(doctor_id):
-    doctor = User.query.get(doctor_id)
-    return doctor.name if doctor else "Unknown Doctor"
-
 def extract_user_identity():
     current_user = get_jwt_identity()
     return current_user['user_id'], current_user['role']
 
 @patient_bp.route('/dashboard', methods=['GET'])
 @jwt_required()
+@replica_read
 def patient_dashboard():
     try:
         current_user = get_jwt_identity()
@@ -37,85 +44,49 @@ def patient_dashboard():
         current_access = PatientAccess.query.filter_by(patient_id=user_id, access_granted=True).all()
         reminders = MedicationReminder.query.filter_by(patient_id=user_id).all()
 
-        medical_history_data = {
-            'disease': medical_history.disease if medical_history else '',
-            'allergies': medical_history.allergies if medical_history else '',
-            'surgery_history': medical_history.surgery_history if medical_history else ''
+        medical_history_data = MEDICAL_HISTORY.dump(medical_history) if medical_history else {
+            'disease': '',
+            'allergies': '',
+            'surgery_history': ''
         }
 
-        # Prepare prescriptions data with doctor names
-        prescriptions_data = [{
-            'prescription_id': prescription.prescription_id,
-            'doctor_name': get_doctor_name(prescription.doctor_id),
-            'diagnosis': prescription.diagnosis,
-            'date_issued': prescription.date_issued.strftime('%Y-%m-%d'),
-            'medicines': [{
-                'name': medicine.name,
-                'dosage': medicine.dosage,
-                'frequency': medicine.frequency,
-                'timing': medicine.timing
-            } for medicine in prescription.medicine_entries]
-        } for prescription in prescriptions]
-
-        # Prepare appointments data with doctor names
-        appointments_data = [{
-            'appointment_id': appointment.appointment_id,
-            'doctor_name': get_doctor_name(appointment.doctor_id),
-            'date': appointment.date_time.strftime('%Y-%m-%d'),
-            'time': appointment.date_time.strftime('%H:%M'),
-            'status': appointment.status
-        } for appointment in appointments]
-
-        # Prepare lab reports data
-        lab_reports_data = [{
-            'report_id': report.report_id,
-            'report_type': report.report_type,
-            'file_url': report.file_url,
-            'uploaded_on': report.uploaded_on.strftime('%Y-%m-%d')
-        } for report in lab_reports]
-
-        # Prepare access requests data
-        access_requests_data = [{
-            'request_id': request.request_id,
-            'doctor_name': get_doctor_name(request.doctor_id),
-            'status': request.status,
-            'purpose': request.purpose,
-            'request_date': request.request_date.strftime('%Y-%m-%d') if request.request_date else None
-        } for request in access_requests]
-
-        # Prepare current access data
-        current_access_data = [{
-            'access_id': access.access_id,
-            'doctor_name': get_doctor_name(access.doctor_id),
-            'granted_date': access.granted_on.strftime('%Y-%m-%d') if access.granted_on else None,
-            'expiry_date': access.expiry_date.strftime('%Y-%m-%d') if access.expiry_date else None
-        } for access in current_access]
-
-        # Prepare reminders data
-        reminders_data = [{
-            'reminder_id': reminder.reminder_id,
-            'medicine_name': MedicineEntry.query.get(reminder.medicine_entry_id).name if reminder.medicine_entry_id else 'Unknown Medicine',
-            'dosage': MedicineEntry.query.get(reminder.medicine_entry_id).dosage if reminder.medicine_entry_id else 'Unknown Dosage',
-            'time': reminder.remind_at.strftime('%H:%M'),
-            'is_active': reminder.is_active
-        } for reminder in reminders]
-
-        return jsonify({
+        return json_response({
             'medical_history': medical_history_data,
-            'prescriptions': prescriptions_data,
-            'appointments': appointments_data,
-            'lab_reports': lab_reports_data,
-            'access_requests': access_requests_data,
-            'current_access': current_access_data,
-            'reminders': reminders_data
+            'prescriptions': PRESCRIPTION.dump_many(prescriptions),
+            'appointments': PATIENT_APPOINTMENT.dump_many(appointments),
+            'lab_reports': LAB_REPORT.dump_many(lab_reports),
+            'access_requests': ACCESS_REQUEST.dump_many(access_requests),
+            'current_access': CURRENT_ACCESS.dump_many(current_access),
+            'reminders': REMINDER.dump_many(reminders)
         })
 
     except Exception as e:
         logger.error(f"Error in patient_dashboard: {str(e)}", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
+@patient_bp.route('/sync', methods=['GET'])
+@jwt_required()
+def sync_dashboard():
+    try:
+        current_user = get_jwt_identity()
+        if current_user['role'] != 'Patient':
+            return jsonify({"error": "Unauthorized"}), 403
+
+        cursor = request.args.get('since')
+        try:
+            since = decode_cursor(cursor) if cursor else None
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        return json_response(collect_changes('patient_id', current_user['user_id'], since), 200)
+
+    except Exception as e:
+        logger.error(f"Error in sync_dashboard: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
 @patient_bp.route('/prescriptions', methods=['GET'])
 @jwt_required()
+@replica_read
 def get_prescriptions():
     try:
         current_user = get_jwt_identity()
@@ -123,20 +94,7 @@ def get_prescriptions():
             return jsonify({"error": "Unauthorized"}), 403
 
         prescriptions = Prescription.query.filter_by(patient_id=current_user['user_id']).all()
-        prescriptions_data = [{
-            'prescription_id': prescription.prescription_id,
-            'doctor_name': get_doctor_name(prescription.doctor_id),
-            'diagnosis': prescription.diagnosis,
-            'date_issued': prescription.date_issued.strftime('%Y-%m-%d'),
-            'medicines': [{
-                'name': medicine.name,
-                'dosage': medicine.dosage,
-                'frequency': medicine.frequency,
-                'timing': medicine.timing
-            } for medicine in prescription.medicine_entries]
-        } for prescription in prescriptions]
-
-        return jsonify(prescriptions_data), 200
+        return json_response(PRESCRIPTION.dump_many(prescriptions), 200)
 
     except Exception as e:
         logger.error(f"Error in get_prescriptions: {str(e)}", exc_info=True)
@@ -144,6 +102,7 @@ def get_prescriptions():
 
 @patient_bp.route('/reminders', methods=['GET'])
 @jwt_required()
+@replica_read
 def get_reminders():
     try:
         current_user = get_jwt_identity()
@@ -151,22 +110,93 @@ def get_reminders():
             return jsonify({"error": "Unauthorized"}), 403
 
         reminders = MedicationReminder.query.filter_by(patient_id=current_user['user_id']).all()
-        reminders_data = [{
-            'reminder_id': reminder.reminder_id,
-            'medicine_name': MedicineEntry.query.get(reminder.medicine_entry_id).name if reminder.medicine_entry_id else 'Unknown Medicine',
-            'dosage': MedicineEntry.query.get(reminder.medicine_entry_id).dosage if reminder.medicine_entry_id else 'Unknown Dosage',
-            'time': reminder.remind_at.strftime('%H:%M'),
-            'is_active': reminder.is_active
-        } for reminder in reminders]
-
-        return jsonify(reminders_data), 200
+        return json_response(REMINDER.dump_many(reminders), 200)
 
     except Exception as e:
         logger.error(f"Error in get_reminders: {str(e)}", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
+@patient_bp.route('/adherence', methods=['POST'])
+@jwt_required()
+def acknowledge_doses():
+    try:
+        current_user = get_jwt_identity()
+        if current_user['role'] != 'Patient':
+            return jsonify({"error": "Unauthorized"}), 403
+
+        # A single acknowledgement or {"events": [...]} for several doses at once
+        data = request.get_json() or {}
+        items = data['events'] if isinstance(data.get('events'), list) else [data]
+        if not items:
+            return jsonify({"error": "No acknowledgements given"}), 400
+
+        try:
+            accepted = adherence_ingestor.acknowledge(current_user['user_id'], items)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        # Written with the next batch
+        return jsonify({"accepted": accepted}), 202
+
+    except Exception as e:
+        logger.error(f"Error in acknowledge_doses: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+@patient_bp.route('/adherence', methods=['GET'])
+@jwt_required()
+@replica_read
+def get_adherence():
+    try:
+        current_user = get_jwt_identity()
+        if current_user['role'] != 'Patient':
+            return jsonify({"error": "Unauthorized"}), 403
+
+        return json_response(patient_adherence(current_user['user_id']))
+
+    except Exception as e:
+        logger.error(f"Error in get_adherence: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+@patient_bp.route('/lab-results', methods=['GET'])
+@jwt_required()
+@replica_read
+def get_lab_results():
+    try:
+        current_user = get_jwt_identity()
+        if current_user['role'] != 'Patient':
+            return jsonify({"error": "Unauthorized"}), 403
+
+        return json_response(lab_series(current_user['user_id']))
+
+    except Exception as e:
+        logger.error(f"Error in get_lab_results: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+@patient_bp.route('/lab-results/<analyte>/trend', methods=['GET'])
+@jwt_required()
+@replica_read
+def get_lab_trend(analyte):
+    try:
+        current_user = get_jwt_identity()
+        if current_user['role'] != 'Patient':
+            return jsonify({"error": "Unauthorized"}), 403
+
+        try:
+            start, end, points = parse_trend_args(
+                request.args, current_app.config['LAB_TREND_DEFAULT_POINTS'], current_app.config['LAB_TREND_MAX_POINTS']
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        return json_response(lab_trend(current_user['user_id'], analyte, start, end, points))
+
+    except Exception as e:
+        logger.error(f"Error in get_lab_trend: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
 @patient_bp.route('/appointments', methods=['GET'])
 @jwt_required()
+@replica_read
 def get_appointments():
     try:
         current_user = get_jwt_identity()
@@ -174,20 +204,36 @@ def get_appointments():
             return jsonify({"error": "Unauthorized"}), 403
 
         appointments = Appointment.query.filter_by(patient_id=current_user['user_id']).all()
-        appointments_data = [{
-            'appointment_id': appointment.appointment_id,
-            'doctor_name': get_doctor_name(appointment.doctor_id),
-            'date': appointment.date_time.strftime('%Y-%m-%d'),
-            'time': appointment.date_time.strftime('%H:%M'),
-            'status': appointment.status
-        } for appointment in appointments]
-
-        return jsonify(appointments_data), 200
+        if request.args.get('include_archived', '').lower() == 'true':
+            # Months moved out of the live table by the archival job
+            archived = [SimpleNamespace(**row) for row in iter_archived('appointments', patient_id=current_user['user_id'])]
+            appointments = archived + appointments
+        return json_response(PATIENT_APPOINTMENT.dump_many(appointments), 200)
 
     except Exception as e:
         logger.error(f"Error in get_appointments: {str(e)}", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
+@patient_bp.route('/export', methods=['GET'])
+@jwt_required()
+@replica_read
+def export_records():
+    try:
+        current_user = get_jwt_identity()
+        if current_user['role'] != 'Patient':
+            return jsonify({"error": "Unauthorized"}), 403
+
+        export_format = request.args.get('format', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({"error": f"Unsupported export format: {export_format}"}), 400
+
+        user_id = current_user['user_id']
+        return record_exporter.response([user_id], export_format, f"medivault-patient-{user_id}")
+
+    except Exception as e:
+        logger.error(f"Error in export_records: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
 @patient_bp.route('/grant-access', methods=['POST'])
 @jwt_required()
 def grant_access():
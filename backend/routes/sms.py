@@ -0,0 +1,46 @@
+from flask import Blueprint, Response, current_app, request
+from xml.sax.saxutils import escape
+from services.adherence import adherence_ingestor
+import logging
+
+logger = logging.getLogger(__name__)
+
+sms_bp = Blueprint('sms', __name__)
+
+def _twiml(message=None):
+    body = f"<Message>{escape(message)}</Message>" if message else ""
+    return Response(f'<?xml version="1.0" encoding="UTF-8"?><Response>{body}</Response>', mimetype='text/xml')
+
+def _valid_signature():
+    """Whether the request is signed by Twilio; fails closed when it cannot be checked."""
+    if not current_app.config['SMS_WEBHOOK_VALIDATE']:
+        return True
+    auth_token = current_app.config['TWILIO_AUTH_TOKEN']
+    if not auth_token:
+        logger.error("SMS webhook rejected: TWILIO_AUTH_TOKEN is not set (or set SMS_WEBHOOK_VALIDATE=false in development)")
+        return False
+    try:
+        from twilio.request_validator import RequestValidator
+        validator = RequestValidator(auth_token)
+        return validator.validate(request.url, request.form, request.headers.get('X-Twilio-Signature', ''))
+    except Exception as e:
+        logger.error(f"Could not validate SMS webhook signature: {str(e)}")
+        return False
+
+@sms_bp.route('/replies', methods=['POST'])
+def sms_reply():
+    """Twilio incoming-message webhook: a reply of TAKEN or SKIP answers the latest reminder."""
+    if not _valid_signature():
+        return Response("Invalid signature", status=403)
+
+    try:
+        acknowledged = adherence_ingestor.acknowledge_sms(request.form.get('From', ''), request.form.get('Body'))
+        if acknowledged is None:
+            return _twiml("Sorry, we didn't understand that. Reply TAKEN or SKIP after a MediVault reminder.")
+        if acknowledged == 0:
+            return _twiml("There is no recent MediVault reminder to answer.")
+        return _twiml()
+
+    except Exception as e:
+        logger.error(f"Error in sms_reply: {str(e)}", exc_info=True)
+        return _twiml()
@@ -1,5 +1,6 @@
-from app import app, db
+import argparse
 import logging
+import os
 import sys
 
 # Configure logging
@@ -10,25 +11,48 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def run_production():
+    # Hand the process over to gunicorn so SIGTERM reaches its master directly
+    logger.info("Starting gunicorn (see gunicorn.conf.py)...")
+    os.execvp(sys.executable, [
+        sys.executable, '-m', 'gunicorn',
+        '--chdir', BACKEND_DIR,
+        '-c', os.path.join(BACKEND_DIR, 'gunicorn.conf.py'),
+        'app:app'
+    ])
+
+def run_development():
+    from app import app, db
+    with app.app_context():
+        # Test database connection
+        logger.info("Attempting to connect to PostgreSQL database...")
+        connection = db.engine.connect()
+        logger.info("Successfully connected to PostgreSQL database")
+
+        # Create tables if they don't exist
+        logger.info("Creating database tables...")
+        db.create_all()
+        logger.info("Database tables created successfully")
+
+        # Closing the connection explicitly (optional, but good practice)
+        connection.close()
+
+        # Start the Flask development server
+        logger.info("Starting Flask development server...")
+        app.run(host='0.0.0.0', port=5000, debug=True)
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the Medivault API server")
+    parser.add_argument('--prod', action='store_true', help="Serve with gunicorn (pre-forked workers, sized pools, graceful drain)")
+    args = parser.parse_args()
+
     try:
-        with app.app_context():
-            # Test database connection
-            logger.info("Attempting to connect to PostgreSQL database...")
-            connection = db.engine.connect()
-            logger.info("Successfully connected to PostgreSQL database")
-            
-            # Create tables if they don't exist
-            logger.info("Creating database tables...")
-            db.create_all()
-            logger.info("Database tables created successfully")
-            
-            # Closing the connection explicitly (optional, but good practice)
-            connection.close()
-            
-            # Start the Flask development server
-            logger.info("Starting Flask development server...")
-            app.run(host='0.0.0.0', port=5000, debug=True)
+        if args.prod:
+            run_production()
+        else:
+            run_development()
     except Exception as e:
         logger.error(f"Failed to start server: {str(e)}")
         sys.exit(1)
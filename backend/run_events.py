@@ -0,0 +1,39 @@
+from gevent import monkey
+monkey.patch_all()
+# psycopg2 is a C extension the monkey patch cannot reach; without this its queries block every greenlet
+from psycogreen.gevent import patch_psycopg
+patch_psycopg()
+
+from gevent.pywsgi import WSGIServer
+from werkzeug.wrappers import Response
+from app import app
+import logging
+import sys
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    stream=sys.stdout
+)
+logger = logging.getLogger(__name__)
+
+EVENTS_PREFIX = '/api/events'
+
+def events_only(wsgi_app):
+    # This process only serves the event stream; everything else stays on the main server
+    def application(environ, start_response):
+        if not environ.get('PATH_INFO', '').startswith(EVENTS_PREFIX):
+            return Response('Not Found', status=404)(environ, start_response)
+        return wsgi_app(environ, start_response)
+    return application
+
+if __name__ == '__main__':
+    if app.config['EVENT_BUS_BACKEND'] != 'postgres':
+        # This process serves no writes, so without LISTEN/NOTIFY its streams would never receive an event
+        logger.error("run_events.py needs EVENT_BUS_BACKEND=postgres to receive events from the API server")
+        sys.exit(1)
+
+    # One greenlet per open stream keeps thousands of idle connections cheap
+    port = app.config['EVENTS_PORT']
+    logger.info(f"Starting Medivault event stream server on port {port}...")
+    WSGIServer(('0.0.0.0', port), events_only(app)).serve_forever()
@@ -0,0 +1,98 @@
+from models import User
+from utils.serializers import Serializer, Field, format_date, format_time
+from services.adherence import adherence_percent
+
+def user_name(user_id, default=None):
+    # Query.get() answers from the session identity map while the user is still loaded
+    user = User.query.get(user_id) if user_id is not None else None
+    return user.name if user else default
+
+def doctor_name(obj):
+    return user_name(obj.doctor_id, 'Unknown Doctor')
+
+def preload_doctors(objs):
+    """Load the doctors of ``objs`` in one query, so ``doctor_name`` does not query per row."""
+    doctor_ids = {obj.doctor_id for obj in objs if obj.doctor_id is not None}
+    return User.query.filter(User.user_id.in_(doctor_ids)).all() if doctor_ids else []
+
+def _not_stored(obj):
+    # Kept in the response shape for the frontend; the model has no column for it yet
+    return None
+
+# ------------------- PATIENT DASHBOARD -------------------
+MEDICINE = Serializer('name', 'dosage', 'frequency', 'timing')
+
+PRESCRIPTION = Serializer(
+    'prescription_id',
+    Field('doctor_name', source=doctor_name),
+    'diagnosis',
+    Field('date_issued', format=format_date),
+    Field('medicines', source='medicine_entries', nested=MEDICINE),
+    preload=preload_doctors
+)
+
+PATIENT_APPOINTMENT = Serializer(
+    'appointment_id',
+    Field('doctor_name', source=doctor_name),
+    Field('date', source='date_time', format=format_date),
+    Field('time', source='date_time', format=format_time),
+    'status',
+    preload=preload_doctors
+)
+
+LAB_REPORT = Serializer(
+    'report_id',
+    'report_type',
+    'file_url',
+    Field('uploaded_on', format=format_date)
+)
+
+ACCESS_REQUEST = Serializer(
+    'request_id',
+    Field('doctor_name', source=doctor_name),
+    'status',
+    Field('purpose', source=_not_stored),
+    Field('request_date', source=_not_stored),
+    preload=preload_doctors
+)
+
+CURRENT_ACCESS = Serializer(
+    Field('access_id', source=_not_stored),
+    Field('doctor_name', source=doctor_name),
+    Field('granted_date', source='granted_on', format=format_date),
+    Field('expiry_date', source=_not_stored),
+    preload=preload_doctors
+)
+
+REMINDER = Serializer(
+    'reminder_id',
+    Field('medicine_name', source=lambda reminder: reminder.medicine.name if reminder.medicine else 'Unknown Medicine'),
+    Field('dosage', source=lambda reminder: reminder.medicine.dosage if reminder.medicine else 'Unknown Dosage'),
+    Field('time', source='remind_at', format=format_time),
+    'is_active'
+)
+
+MEDICAL_HISTORY = Serializer('disease', 'allergies', 'surgery_history')
+
+# ------------------- DOCTOR DASHBOARD -------------------
+PANEL_PATIENT = Serializer(
+    Field('id', source='user_id'),
+    'name',
+    Field('username', source='email')
+)
+
+DASHBOARD_PATIENT = Serializer(
+    Field('id', source='user_id'),
+    'name',
+    Field('username', source='email'),
+    Field('adherence', source=lambda row: adherence_percent(row.taken_count, row.skipped_count, row.missed_count))
+)
+
+DOCTOR_APPOINTMENT = Serializer(
+    Field('id', source='appointment_id'),
+    'patient_id',
+    'patient_name',
+    Field('date', source='date_time', format=format_date),
+    Field('time', source='date_time', format=format_time),
+    'status'
+)
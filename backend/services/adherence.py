@@ -0,0 +1,408 @@
+from datetime import datetime, timedelta, timezone
+from threading import Event, Lock, Thread
+from sqlalchemy import text
+from models import db, User, MedicationReminder, MedicineEntry, AdherenceEvent, PatientAdherence, MedicineAdherence
+from utils.counters import increment_counters, insert_new_rows
+import atexit
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+ADHERENCE_STATUSES = ('taken', 'skipped', 'missed')
+ACKNOWLEDGED_STATUSES = ('taken', 'skipped')  # 'missed' is only ever inferred
+
+EVENTS = AdherenceEvent.__table__
+PATIENT_ROLLUPS = PatientAdherence.__table__
+MEDICINE_ROLLUPS = MedicineAdherence.__table__
+
+EVENT_KEYS = ('reminder_id', 'scheduled_for')
+
+# Advisory lock held by the one process that sweeps for missed doses
+SWEEP_LOCK = 'medivault.adherence_sweep'
+
+# First word of an SMS reply
+SMS_REPLIES = {
+    'taken': 'taken', 'take': 'taken', 'yes': 'taken', 'y': 'taken', '1': 'taken',
+    'skip': 'skipped', 'skipped': 'skipped', 'no': 'skipped', 'n': 'skipped', '2': 'skipped'
+}
+
+def adherence_percent(taken, skipped, missed):
+    """Share of scheduled doses taken, or None before any dose is recorded."""
+    total = (taken or 0) + (skipped or 0) + (missed or 0)
+    return round(100.0 * (taken or 0) / total, 1) if total else None
+
+def dose_time(remind_at, at, early_minutes):
+    """The dose an acknowledgement at ``at`` refers to: today's, unless that is still more than ``early_minutes`` away."""
+    scheduled = datetime.combine(at.date(), remind_at)
+    if scheduled > at + timedelta(minutes=early_minutes):
+        scheduled -= timedelta(days=1)
+    return scheduled
+
+def parse_scheduled_for(value):
+    """A client-supplied dose time as the naive server-local datetime reminders are scheduled in."""
+    if not isinstance(value, str):
+        raise ValueError("scheduled_for must be an ISO 8601 datetime string")
+    try:
+        scheduled_for = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"scheduled_for is not an ISO 8601 datetime: {value}")
+    if scheduled_for.tzinfo is not None:
+        scheduled_for = scheduled_for.astimezone().replace(tzinfo=None)
+    return scheduled_for
+
+def _local_time(utc):
+    # Rows are stamped with utcnow(); dose times are server-local
+    return utc.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+
+def _phone_candidates(phone_number):
+    # Reminders go out with +91 prepended when the stored number has no country code
+    candidates = {phone_number}
+    if phone_number.startswith('+91'):
+        candidates.add(phone_number[3:])
+    return candidates
+
+def _counter_row(event, replaced=None, **keys):
+    """Counter deltas for one recorded event, moving the dose out of ``replaced`` when it overwrote one."""
+    row = dict(keys)
+    for status in ADHERENCE_STATUSES:
+        row[f'{status}_count'] = (1 if event['status'] == status else 0) - (1 if replaced == status else 0)
+    return row
+
+class AdherenceIngestor:
+    """Buffers dose acknowledgements and writes them in multi-row batches.
+
+    Acknowledgements land in the buffer as they arrive and a background
+    thread writes them every ``flush_seconds``, or as soon as ``batch_size``
+    are waiting. Each dose is recorded once (first answer wins, though a
+    late answer replaces a 'missed' the sweep inferred) and only newly
+    recorded answers are folded into the per-patient and per-medicine
+    adherence counters. The same thread infers missed doses every
+    ``sweep_minutes``, in one process only: on PostgreSQL the first worker
+    to take an advisory lock sweeps and keeps the lock while it lives.
+    """
+
+    def __init__(self, batch_size=500, flush_seconds=2.0, grace_minutes=120, early_minutes=60, sweep_minutes=15):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.grace_minutes = grace_minutes
+        self.early_minutes = early_minutes
+        self.sweep_minutes = sweep_minutes
+        self._app = None
+        self._pending = []
+        self._lock = Lock()
+        self._wake = Event()
+        self._thread = None
+        self._pid = None
+        self._start_lock = Lock()
+        self._sweep_lock = None
+
+    def init_app(self, app):
+        self._app = app
+        self.batch_size = app.config['ADHERENCE_BATCH_SIZE']
+        self.flush_seconds = app.config['ADHERENCE_FLUSH_SECONDS']
+        self.grace_minutes = app.config['ADHERENCE_GRACE_MINUTES']
+        self.early_minutes = app.config['ADHERENCE_EARLY_MINUTES']
+        self.sweep_minutes = app.config['ADHERENCE_SWEEP_MINUTES']
+        # Started by the first request a process serves, so a preloading gunicorn master never runs one
+        app.before_request(self.start)
+
+    def start(self):
+        """Start this process's flush thread if it is not running yet; threads do not survive ``fork``."""
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            if self._pid is None:
+                atexit.register(self.flush)
+            self._lock = Lock()
+            self._wake = Event()
+            self._pending = []
+            self._sweep_lock = None
+            self._pid = os.getpid()
+            self._thread = Thread(target=self._run, name='adherence-ingestor', daemon=True)
+            self._thread.start()
+
+    # ------------------- ACKNOWLEDGEMENTS -------------------
+    def acknowledge(self, patient_id, items, source='app', now=None):
+        """Queue a patient's acknowledgements from the app.
+
+        ``items`` are dicts with ``reminder_id``, ``status`` ('taken' or
+        'skipped') and optionally ``scheduled_for`` (ISO datetime; defaults
+        to the dose the reminder most recently went out for). Raises
+        ValueError for bad input or reminders the patient does not own.
+        """
+        now = now or datetime.now()
+        reminder_ids = set()
+        parsed = []
+        for item in items:
+            if not isinstance(item, dict) or not isinstance(item.get('reminder_id'), int):
+                raise ValueError("Each acknowledgement needs an integer reminder_id")
+            if item.get('status') not in ACKNOWLEDGED_STATUSES:
+                raise ValueError(f"status must be one of: {', '.join(ACKNOWLEDGED_STATUSES)}")
+            if item.get('scheduled_for') is not None:
+                item = dict(item, scheduled_for=parse_scheduled_for(item['scheduled_for']))
+            reminder_ids.add(item['reminder_id'])
+            parsed.append(item)
+        items = parsed
+
+        reminders = {reminder.reminder_id: reminder for reminder in db.session.query(
+            MedicationReminder.reminder_id,
+            MedicationReminder.patient_id,
+            MedicationReminder.medicine_entry_id,
+            MedicationReminder.remind_at
+        ).filter(
+            MedicationReminder.reminder_id.in_(reminder_ids),
+            MedicationReminder.patient_id == patient_id
+        )}
+        unknown = reminder_ids - set(reminders)
+        if unknown:
+            raise ValueError(f"Unknown reminders: {', '.join(str(reminder_id) for reminder_id in sorted(unknown))}")
+
+        events = []
+        for item in items:
+            reminder = reminders[item['reminder_id']]
+            if item.get('scheduled_for'):
+                scheduled_for = item['scheduled_for']
+                if scheduled_for.time().replace(second=0, microsecond=0) != reminder.remind_at.replace(second=0, microsecond=0):
+                    raise ValueError(f"Reminder {reminder.reminder_id} is not scheduled at {scheduled_for.isoformat()}")
+            else:
+                scheduled_for = dose_time(reminder.remind_at, now, self.early_minutes)
+            if scheduled_for > now + timedelta(minutes=self.early_minutes):
+                raise ValueError("Doses cannot be acknowledged this far ahead")
+            events.append(self._event(reminder, scheduled_for, item['status'], source))
+        return self.submit(events)
+
+    def acknowledge_sms(self, phone_number, body, now=None):
+        """Queue an SMS reply, which answers every dose of the patient's latest reminder wave.
+
+        Returns the number of doses acknowledged, or None if the reply
+        could not be understood.
+        """
+        words = (body or '').strip().lower().split()
+        status = SMS_REPLIES.get(words[0]) if words else None
+        if status is None:
+            return None
+
+        now = now or datetime.now()
+        reminders = db.session.query(
+            MedicationReminder.reminder_id,
+            MedicationReminder.patient_id,
+            MedicationReminder.medicine_entry_id,
+            MedicationReminder.remind_at
+        ).join(User, User.user_id == MedicationReminder.patient_id).filter(
+            User.phone_number.in_(_phone_candidates(phone_number)),
+            MedicationReminder.is_active == True
+        ).all()
+
+        doses = [(dose_time(reminder.remind_at, now, self.early_minutes), reminder) for reminder in reminders]
+        window_start = now - timedelta(minutes=self.grace_minutes)
+        doses = [(scheduled_for, reminder) for scheduled_for, reminder in doses if scheduled_for >= window_start]
+        if not doses:
+            return 0
+        latest = max(scheduled_for for scheduled_for, _ in doses)
+        return self.submit([
+            self._event(reminder, scheduled_for, status, 'sms')
+            for scheduled_for, reminder in doses if scheduled_for == latest
+        ])
+
+    def _event(self, reminder, scheduled_for, status, source):
+        return {
+            'reminder_id': reminder.reminder_id,
+            'patient_id': reminder.patient_id,
+            'medicine_entry_id': reminder.medicine_entry_id,
+            'scheduled_for': scheduled_for.replace(second=0, microsecond=0),
+            'status': status,
+            'source': source,
+            'recorded_at': datetime.utcnow()
+        }
+
+    # ------------------- BATCHED WRITES -------------------
+    def submit(self, events):
+        """Queue resolved events for the next batch; written inline when no flush thread is running."""
+        if self._thread is None or self._pid != os.getpid():
+            return self.write(events) if events else 0
+        with self._lock:
+            self._pending.extend(events)
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wake.set()
+        return len(events)
+
+    def flush(self):
+        with self._lock:
+            events, self._pending = self._pending, []
+        if not events:
+            return 0
+        try:
+            with self._app.app_context():
+                written = 0
+                for start in range(0, len(events), self.batch_size):
+                    written += self.write(events[start:start + self.batch_size])
+                return written
+        except Exception:
+            # Put the batch back so a transient database error does not lose acknowledgements
+            with self._lock:
+                self._pending[:0] = events
+            raise
+
+    def write(self, events):
+        """Insert one batch and add the newly recorded doses to the rollups. Returns how many were new."""
+        connection = db.session.connection()
+        inserted = insert_new_rows(connection, EVENTS, EVENT_KEYS, events)
+        counted = [(event, None) for event in inserted] + [
+            (event, 'missed') for event in self._answer_missed(connection, events, inserted)
+        ]
+        increment_counters(connection, PATIENT_ROLLUPS, ('patient_id',), [
+            _counter_row(event, replaced, patient_id=event['patient_id']) for event, replaced in counted
+        ])
+        increment_counters(connection, MEDICINE_ROLLUPS, ('patient_id', 'medicine_entry_id'), [
+            _counter_row(event, replaced, patient_id=event['patient_id'], medicine_entry_id=event['medicine_entry_id'])
+            for event, replaced in counted
+        ])
+        db.session.commit()
+        return len(counted)
+
+    def _answer_missed(self, connection, events, inserted):
+        """Turn doses the sweep marked missed into the late answers in ``events``; returns the answers applied."""
+        recorded = {tuple(event[key] for key in EVENT_KEYS) for event in inserted}
+        late = {}
+        for event in events:
+            key = tuple(event[key] for key in EVENT_KEYS)
+            if key not in recorded and event['status'] in ACKNOWLEDGED_STATUSES:
+                late.setdefault(key, event)  # first answer wins, as for inserts
+        # Rare (an answer after the grace window), so one update per dose is fine
+        answered = []
+        for event in late.values():
+            result = connection.execute(EVENTS.update().where(
+                EVENTS.c.reminder_id == event['reminder_id'],
+                EVENTS.c.scheduled_for == event['scheduled_for'],
+                EVENTS.c.status == 'missed'
+            ).values(status=event['status'], source=event['source'], recorded_at=event['recorded_at']))
+            if result.rowcount:
+                answered.append(event)
+        return answered
+
+    def _run(self):
+        next_sweep = time.monotonic() + self.sweep_minutes * 60
+        while True:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            try:
+                self.flush()
+                if time.monotonic() >= next_sweep:
+                    next_sweep = time.monotonic() + self.sweep_minutes * 60
+                    with self._app.app_context():
+                        if self._owns_sweep():
+                            self.sweep_missed()
+            except Exception as e:
+                logger.error(f"Error in adherence ingestion: {str(e)}", exc_info=True)
+
+    def _owns_sweep(self):
+        """Whether this process sweeps: the first to take the advisory lock keeps it on a connection of its own."""
+        if db.engine.dialect.name != 'postgresql':
+            return True
+        if self._sweep_lock is not None:
+            try:
+                self._sweep_lock.execute(text("SELECT 1"))
+                return True
+            except Exception:
+                # The connection, and the lock with it, is gone; compete for it again
+                self._sweep_lock.invalidate()
+                self._sweep_lock = None
+        # Autocommit, so holding the lock never leaves a transaction open
+        connection = db.engine.connect().execution_options(isolation_level='AUTOCOMMIT')
+        if connection.execute(text("SELECT pg_try_advisory_lock(hashtext(:name))"), {'name': SWEEP_LOCK}).scalar():
+            self._sweep_lock = connection
+            return True
+        connection.close()
+        return False
+
+    # ------------------- MISSED DOSES -------------------
+    def sweep_missed(self, now=None, lookback_hours=24):
+        """Record 'missed' for active reminders' doses left unanswered past the grace window.
+
+        Only doses from the last ``lookback_hours`` before the grace cutoff
+        are considered, so each sweep touches about a day of reminders.
+        Doses due before the reminder was created were never sent and are
+        skipped.
+        """
+        now = now or datetime.now()
+        cutoff = now - timedelta(minutes=self.grace_minutes)
+        since = cutoff - timedelta(hours=lookback_hours)
+
+        answered = set(db.session.query(AdherenceEvent.reminder_id, AdherenceEvent.scheduled_for).filter(
+            AdherenceEvent.scheduled_for > since,
+            AdherenceEvent.scheduled_for <= cutoff
+        ))
+        reminders = db.session.query(
+            MedicationReminder.reminder_id,
+            MedicationReminder.patient_id,
+            MedicationReminder.medicine_entry_id,
+            MedicationReminder.remind_at,
+            MedicationReminder.start_date,
+            MedicationReminder.end_date,
+            MedicationReminder.created_at
+        ).filter(MedicationReminder.is_active == True).yield_per(1000)
+
+        missed = []
+        for reminder in reminders:
+            # No reminder went out before the schedule existed, so there is nothing to miss
+            first = max(since, _local_time(reminder.created_at)) if reminder.created_at else since
+            day = since.date()
+            while day <= cutoff.date():
+                scheduled_for = datetime.combine(day, reminder.remind_at).replace(second=0, microsecond=0)
+                if (first < scheduled_for <= cutoff
+                        and (reminder.start_date is None or reminder.start_date <= day)
+                        and (reminder.end_date is None or reminder.end_date >= day)
+                        and (reminder.reminder_id, scheduled_for) not in answered):
+                    missed.append(self._event(reminder, scheduled_for, 'missed', 'sweep'))
+                day += timedelta(days=1)
+
+        # Written after the scan: committing mid-iteration would close the yield_per cursor
+        written = 0
+        for start in range(0, len(missed), self.batch_size):
+            written += self.write(missed[start:start + self.batch_size])
+        if written:
+            logger.info(f"Recorded {written} missed doses")
+        return written
+
+# ------------------- READS -------------------
+def patient_adherence(patient_id):
+    """Overall and per-medicine adherence for one patient, straight from the rollups."""
+    overall = PatientAdherence.query.get(patient_id)
+    medicines = db.session.query(
+        MedicineAdherence.medicine_entry_id,
+        MedicineEntry.name,
+        MedicineEntry.dosage,
+        MedicineAdherence.taken_count,
+        MedicineAdherence.skipped_count,
+        MedicineAdherence.missed_count
+    ).join(MedicineEntry, MedicineEntry.id == MedicineAdherence.medicine_entry_id).filter(
+        MedicineAdherence.patient_id == patient_id
+    ).order_by(MedicineEntry.name).all()
+
+    def summary(row):
+        counts = (row.taken_count, row.skipped_count, row.missed_count) if row else (0, 0, 0)
+        return {
+            'taken': counts[0],
+            'skipped': counts[1],
+            'missed': counts[2],
+            'adherence': adherence_percent(*counts)
+        }
+
+    return {
+        'patient_id': patient_id,
+        **summary(overall),
+        'medicines': [{
+            'medicine_entry_id': row.medicine_entry_id,
+            'name': row.name,
+            'dosage': row.dosage,
+            **summary(row)
+        } for row in medicines]
+    }
+
+# Create a singleton instance
+adherence_ingestor = AdherenceIngestor()
@@ -0,0 +1,274 @@
+from datetime import date, datetime, timedelta
+from sqlalchemy import event, func, inspect, literal_column, select
+from models import db, User, Prescription, MedicineEntry, MedicationReminder, Appointment, DoctorAppointmentRollup, DoctorMedicineRollup, DoctorReminderRollup
+from utils.counters import increment_counters
+import logging
+
+logger = logging.getLogger(__name__)
+
+APPOINTMENT_ROLLUPS = DoctorAppointmentRollup.__table__
+MEDICINE_ROLLUPS = DoctorMedicineRollup.__table__
+REMINDER_ROLLUPS = DoctorReminderRollup.__table__
+
+APPOINTMENT_KEYS = ('doctor_id', 'day', 'status')
+MEDICINE_KEYS = ('doctor_id', 'day', 'medicine_name')
+REMINDER_KEYS = ('doctor_id', 'patient_id')
+
+def normalize_status(status):
+    return (status or 'pending').strip().lower()
+
+def normalize_medicine(name):
+    return (name or '').strip().lower()[:100]
+
+def _day(value):
+    return value.date() if isinstance(value, datetime) else value
+
+def _previous_values(connection, target, attrs):
+    """Column values as they were before this flush, read back from the row if not loaded."""
+    state = inspect(target)
+    values, missing = {}, []
+    for attr in attrs:
+        history = state.attrs[attr].history
+        if history.deleted:
+            values[attr] = history.deleted[0]
+        elif not history.has_changes() and attr in state.dict:
+            values[attr] = state.dict[attr]
+        else:
+            missing.append(attr)
+    if missing:
+        table = state.mapper.local_table
+        primary_key = state.mapper.primary_key[0]
+        row = connection.execute(
+            select([table.c[attr] for attr in missing]).where(primary_key == state.identity[0])
+        ).first()
+        values.update(dict(zip(missing, row)))
+    return values
+
+def _current_values(target, attrs, previous):
+    # Unchanged attributes keep their previous value, which avoids reloading expired ones mid-flush
+    state = inspect(target)
+    values = {}
+    for attr in attrs:
+        history = state.attrs[attr].history
+        values[attr] = history.added[0] if history.added else previous[attr]
+    return values
+
+def _changed(target, attrs):
+    state = inspect(target)
+    return any(state.attrs[attr].history.has_changes() for attr in attrs)
+
+# ------------------- APPOINTMENTS -------------------
+APPOINTMENT_ATTRS = ('doctor_id', 'date_time', 'status')
+
+def _appointment_delta(values, delta):
+    return {
+        'doctor_id': values['doctor_id'],
+        'day': _day(values['date_time']),
+        'status': normalize_status(values['status']),
+        'appointment_count': delta
+    }
+
+def _appointment_values(target):
+    return {attr: getattr(target, attr) for attr in APPOINTMENT_ATTRS}
+
+def _on_appointment_insert(mapper, connection, target):
+    increment_counters(connection, APPOINTMENT_ROLLUPS, APPOINTMENT_KEYS, [_appointment_delta(_appointment_values(target), 1)])
+
+def _on_appointment_update(mapper, connection, target):
+    if not _changed(target, APPOINTMENT_ATTRS):
+        return
+    previous = _previous_values(connection, target, APPOINTMENT_ATTRS)
+    increment_counters(connection, APPOINTMENT_ROLLUPS, APPOINTMENT_KEYS, [
+        _appointment_delta(previous, -1),
+        _appointment_delta(_current_values(target, APPOINTMENT_ATTRS, previous), 1)
+    ])
+
+def _on_appointment_delete(mapper, connection, target):
+    increment_counters(connection, APPOINTMENT_ROLLUPS, APPOINTMENT_KEYS, [
+        _appointment_delta(_previous_values(connection, target, APPOINTMENT_ATTRS), -1)
+    ])
+
+# ------------------- PRESCRIBED MEDICINES -------------------
+def _medicine_delta(connection, prescription_id, name, delta):
+    prescription = connection.execute(
+        select([Prescription.doctor_id, Prescription.date_issued]).where(Prescription.prescription_id == prescription_id)
+    ).first()
+    if prescription is None:
+        return []
+    return [{
+        'doctor_id': prescription.doctor_id,
+        'day': _day(prescription.date_issued),
+        'medicine_name': normalize_medicine(name),
+        'prescription_count': delta
+    }]
+
+def _on_medicine_insert(mapper, connection, target):
+    increment_counters(connection, MEDICINE_ROLLUPS, MEDICINE_KEYS, _medicine_delta(connection, target.prescription_id, target.name, 1))
+
+def _on_medicine_update(mapper, connection, target):
+    if not _changed(target, ('prescription_id', 'name')):
+        return
+    previous = _previous_values(connection, target, ('prescription_id', 'name'))
+    current = _current_values(target, ('prescription_id', 'name'), previous)
+    increment_counters(connection, MEDICINE_ROLLUPS, MEDICINE_KEYS,
+        _medicine_delta(connection, previous['prescription_id'], previous['name'], -1) +
+        _medicine_delta(connection, current['prescription_id'], current['name'], 1))
+
+def _on_medicine_delete(mapper, connection, target):
+    previous = _previous_values(connection, target, ('prescription_id', 'name'))
+    increment_counters(connection, MEDICINE_ROLLUPS, MEDICINE_KEYS, _medicine_delta(connection, previous['prescription_id'], previous['name'], -1))
+
+# ------------------- ACTIVE REMINDERS -------------------
+REMINDER_ATTRS = ('patient_id', 'medicine_entry_id', 'is_active')
+
+def _reminder_delta(connection, values, delta):
+    # A reminder counts towards the doctor who prescribed its medicine
+    if not values['is_active'] or values['medicine_entry_id'] is None:
+        return []
+    doctor_id = connection.execute(
+        select([Prescription.doctor_id]).select_from(
+            MedicineEntry.__table__.join(Prescription.__table__, MedicineEntry.prescription_id == Prescription.prescription_id)
+        ).where(MedicineEntry.id == values['medicine_entry_id'])
+    ).scalar()
+    if doctor_id is None:
+        return []
+    return [{'doctor_id': doctor_id, 'patient_id': values['patient_id'], 'active_reminders': delta}]
+
+def _reminder_values(target):
+    values = {attr: getattr(target, attr) for attr in REMINDER_ATTRS}
+    # Column default: a new reminder is active unless told otherwise
+    values['is_active'] = values['is_active'] is not False
+    return values
+
+def _on_reminder_insert(mapper, connection, target):
+    increment_counters(connection, REMINDER_ROLLUPS, REMINDER_KEYS, _reminder_delta(connection, _reminder_values(target), 1))
+
+def _on_reminder_update(mapper, connection, target):
+    if not _changed(target, REMINDER_ATTRS):
+        return
+    previous = _previous_values(connection, target, REMINDER_ATTRS)
+    increment_counters(connection, REMINDER_ROLLUPS, REMINDER_KEYS,
+        _reminder_delta(connection, previous, -1) +
+        _reminder_delta(connection, _current_values(target, REMINDER_ATTRS, previous), 1))
+
+def _on_reminder_delete(mapper, connection, target):
+    previous = _previous_values(connection, target, REMINDER_ATTRS)
+    increment_counters(connection, REMINDER_ROLLUPS, REMINDER_KEYS, _reminder_delta(connection, previous, -1))
+
+def register_analytics_tracking():
+    """Keep the doctor rollup tables current inside the same transaction as each write.
+
+    Updates and deletes hook the ``before_*`` events so the previous values
+    can still be read back from the row when they were not loaded.
+    """
+    if event.contains(Appointment, 'after_insert', _on_appointment_insert):
+        return
+    event.listen(Appointment, 'after_insert', _on_appointment_insert)
+    event.listen(Appointment, 'before_update', _on_appointment_update)
+    event.listen(Appointment, 'before_delete', _on_appointment_delete)
+    event.listen(MedicineEntry, 'after_insert', _on_medicine_insert)
+    event.listen(MedicineEntry, 'before_update', _on_medicine_update)
+    event.listen(MedicineEntry, 'before_delete', _on_medicine_delete)
+    event.listen(MedicationReminder, 'after_insert', _on_reminder_insert)
+    event.listen(MedicationReminder, 'before_update', _on_reminder_update)
+    event.listen(MedicationReminder, 'before_delete', _on_reminder_delete)
+
+# ------------------- BACKFILL -------------------
+def backfill_rollups(doctor_id=None):
+    """Rebuild the rollup tables from the source rows, for one doctor or everyone.
+
+    Run it once after deploying, or whenever rollups are suspected to have
+    drifted. Writes that land while it runs may be counted twice or not at
+    all, so schedule it outside busy hours.
+    """
+    # Literal rather than bound 'pending', so PostgreSQL matches the SELECT and GROUP BY expressions
+    status = func.lower(func.trim(func.coalesce(Appointment.status, literal_column("'pending'"))))
+    appointment_day = func.date(Appointment.date_time)
+    appointments = select([
+        Appointment.doctor_id, appointment_day, status, func.count()
+    ]).group_by(Appointment.doctor_id, appointment_day, status)
+
+    medicine_name = func.lower(func.trim(MedicineEntry.name))
+    medicines = select([
+        Prescription.doctor_id, Prescription.date_issued, medicine_name, func.count()
+    ]).select_from(
+        MedicineEntry.__table__.join(Prescription.__table__, MedicineEntry.prescription_id == Prescription.prescription_id)
+    ).group_by(Prescription.doctor_id, Prescription.date_issued, medicine_name)
+
+    reminders = select([
+        Prescription.doctor_id, MedicationReminder.patient_id, func.count()
+    ]).select_from(
+        MedicationReminder.__table__.join(
+            MedicineEntry.__table__, MedicationReminder.medicine_entry_id == MedicineEntry.id
+        ).join(Prescription.__table__, MedicineEntry.prescription_id == Prescription.prescription_id)
+    ).where(MedicationReminder.is_active.is_(True)).group_by(Prescription.doctor_id, MedicationReminder.patient_id)
+
+    if doctor_id is not None:
+        appointments = appointments.where(Appointment.doctor_id == doctor_id)
+        medicines = medicines.where(Prescription.doctor_id == doctor_id)
+        reminders = reminders.where(Prescription.doctor_id == doctor_id)
+
+    try:
+        for table, columns, source in (
+            (APPOINTMENT_ROLLUPS, ['doctor_id', 'day', 'status', 'appointment_count'], appointments),
+            (MEDICINE_ROLLUPS, ['doctor_id', 'day', 'medicine_name', 'prescription_count'], medicines),
+            (REMINDER_ROLLUPS, ['doctor_id', 'patient_id', 'active_reminders'], reminders)
+        ):
+            delete = table.delete()
+            if doctor_id is not None:
+                delete = delete.where(table.c.doctor_id == doctor_id)
+            db.session.execute(delete)
+            db.session.execute(table.insert().from_select(columns, source))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+# ------------------- READ PATH -------------------
+def doctor_analytics(doctor_id, weeks=12, top_medicines=10):
+    """Panel statistics for the last ``weeks`` weeks, read from the rollup tables only."""
+    today = date.today()
+    start = today - timedelta(days=today.weekday(), weeks=weeks - 1)
+
+    appointment_rows = db.session.query(
+        DoctorAppointmentRollup.day, DoctorAppointmentRollup.status, DoctorAppointmentRollup.appointment_count
+    ).filter(
+        DoctorAppointmentRollup.doctor_id == doctor_id,
+        DoctorAppointmentRollup.day >= start,
+        DoctorAppointmentRollup.appointment_count != 0
+    ).all()
+
+    weekly, totals = {}, {}
+    for row in appointment_rows:
+        week_start = (row.day - timedelta(days=row.day.weekday())).strftime('%Y-%m-%d')
+        week = weekly.setdefault(week_start, {})
+        week[row.status] = week.get(row.status, 0) + row.appointment_count
+        totals[row.status] = totals.get(row.status, 0) + row.appointment_count
+
+    total = sum(totals.values())
+    medicine_total = func.sum(DoctorMedicineRollup.prescription_count)
+    medicines = db.session.query(DoctorMedicineRollup.medicine_name, medicine_total.label('count')).filter(
+        DoctorMedicineRollup.doctor_id == doctor_id,
+        DoctorMedicineRollup.day >= start
+    ).group_by(DoctorMedicineRollup.medicine_name).having(medicine_total > 0).order_by(medicine_total.desc()).limit(top_medicines).all()
+
+    reminders = db.session.query(DoctorReminderRollup.patient_id, User.name, DoctorReminderRollup.active_reminders).join(
+        User, User.user_id == DoctorReminderRollup.patient_id
+    ).filter(
+        DoctorReminderRollup.doctor_id == doctor_id,
+        DoctorReminderRollup.active_reminders > 0
+    ).order_by(DoctorReminderRollup.active_reminders.desc()).all()
+
+    return {
+        'since': start.strftime('%Y-%m-%d'),
+        'appointments_per_week': [{'week_start': week_start, 'statuses': statuses} for week_start, statuses in sorted(weekly.items())],
+        'appointment_totals': totals,
+        'cancel_rate': round(totals.get('cancelled', 0) / total, 4) if total else 0.0,
+        'no_show_rate': round(totals.get('no_show', 0) / total, 4) if total else 0.0,
+        'top_medicines': [{'name': row.medicine_name, 'count': row.count} for row in medicines],
+        'active_reminders': [{
+            'patient_id': row.patient_id,
+            'patient_name': row.name,
+            'active_reminders': row.active_reminders
+        } for row in reminders]
+    }
@@ -0,0 +1,229 @@
+from collections import defaultdict
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session as OrmSession
+from models import User, Appointment, DoctorRequest, PatientAccess
+from config import EVENT_BUS_BACKEND, EVENT_BUS_CHANNEL, SQLALCHEMY_DATABASE_URI, SSE_QUEUE_SIZE
+import itertools
+import json
+import logging
+import os
+import queue
+import secrets
+import select
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_event_ids = None
+_event_ids_pid = None
+_event_ids_lock = threading.Lock()
+
+def next_event_id():
+    """An SSE id unique across processes: a per-process prefix and a counter.
+
+    Events from every worker share one stream on the Postgres bus, so a
+    bare counter would repeat. The prefix is drawn again after ``fork``.
+    """
+    global _event_ids, _event_ids_pid
+    with _event_ids_lock:
+        if _event_ids_pid != os.getpid():
+            prefix = f"{os.getpid()}-{secrets.token_hex(4)}"
+            _event_ids = (f"{prefix}-{number}" for number in itertools.count(1))
+            _event_ids_pid = os.getpid()
+        return next(_event_ids)
+
+class LocalEventBus:
+    """In-process pub/sub: one bounded queue per open event stream."""
+
+    def __init__(self, queue_size=SSE_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers[user_id].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, user_id, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def deliver(self, user_ids, payload):
+        with self._lock:
+            targets = [subscriber for user_id in user_ids for subscriber in self._subscribers.get(user_id, ())]
+        for subscriber in targets:
+            try:
+                subscriber.put_nowait(payload)
+            except queue.Full:
+                # A client this far behind is better off refetching once
+                _replace_with_resync(subscriber)
+
+    def publish(self, events, bind=None):
+        for user_ids, payload in events:
+            self.deliver(user_ids, payload)
+
+class PostgresEventBus(LocalEventBus):
+    """Fans events out across processes through Postgres LISTEN/NOTIFY.
+
+    Writers NOTIFY after commit; every process holding open event streams
+    runs one listener thread that hands notifications to its local queues.
+    """
+
+    def __init__(self, dsn=SQLALCHEMY_DATABASE_URI, channel=EVENT_BUS_CHANNEL, queue_size=SSE_QUEUE_SIZE):
+        super().__init__(queue_size)
+        self.dsn = dsn
+        self.channel = channel
+        self._listener = None
+
+    def subscribe(self, user_id):
+        self._ensure_listener()
+        return super().subscribe(user_id)
+
+    def publish(self, events, bind=None):
+        if bind is None:
+            return
+        with bind.begin() as connection:
+            for user_ids, payload in events:
+                connection.execute(
+                    text("SELECT pg_notify(:channel, :payload)"),
+                    {'channel': self.channel, 'payload': json.dumps({'users': list(user_ids), 'event': payload})}
+                )
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name='event-bus-listener', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        import psycopg2
+
+        while True:
+            connection = None
+            try:
+                connection = psycopg2.connect(self.dsn)
+                connection.autocommit = True
+                connection.cursor().execute(f"LISTEN {self.channel}")
+                logger.info(f"Listening for events on channel {self.channel}")
+                while True:
+                    # select() is cooperative under gevent, so idle waiting costs nothing
+                    if select.select([connection], [], [], 30) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        notification = connection.notifies.pop(0)
+                        message = json.loads(notification.payload)
+                        self.deliver(message['users'], message['event'])
+            except Exception as e:
+                logger.error(f"Event listener error, reconnecting: {str(e)}")
+                time.sleep(1)
+            finally:
+                if connection is not None:
+                    connection.close()
+
+class NullEventBus(LocalEventBus):
+    """Drops every event: live updates are off and dashboards rely on delta sync."""
+
+    def publish(self, events, bind=None):
+        pass
+
+def _replace_with_resync(subscriber):
+    try:
+        while True:
+            subscriber.get_nowait()
+    except queue.Empty:
+        pass
+    subscriber.put_nowait({'id': next_event_id(), 'type': 'resync', 'data': {}})
+
+def create_event_bus(backend=EVENT_BUS_BACKEND):
+    if backend == 'postgres':
+        return PostgresEventBus()
+    if backend == 'none':
+        return NullEventBus()
+    return LocalEventBus()
+
+# ------------------- CHANGE CAPTURE -------------------
+def _appointment_data(appointment):
+    return {
+        'appointment_id': appointment.appointment_id,
+        'patient_id': appointment.patient_id,
+        'doctor_id': appointment.doctor_id,
+        'date': appointment.date_time.strftime('%Y-%m-%d') if appointment.date_time else None,
+        'time': appointment.date_time.strftime('%H:%M') if appointment.date_time else None,
+        'status': appointment.status
+    }
+
+def _access_request_data(access_request):
+    return {
+        'request_id': access_request.request_id,
+        'patient_id': access_request.patient_id,
+        'doctor_id': access_request.doctor_id,
+        'status': access_request.status
+    }
+
+def _access_data(access):
+    return {
+        'patient_id': access.patient_id,
+        'doctor_id': access.doctor_id,
+        'access_granted': access.access_granted
+    }
+
+TRACKED_MODELS = {
+    Appointment: ('appointment', _appointment_data),
+    DoctorRequest: ('access_request', _access_request_data),
+    PatientAccess: ('access', _access_data)
+}
+
+def _collect_events(session, flush_context):
+    changes = [(obj, 'created') for obj in session.new] + \
+              [(obj, 'updated') for obj in session.dirty if session.is_modified(obj)]
+    events = []
+    for obj, action in changes:
+        tracked = TRACKED_MODELS.get(type(obj))
+        if tracked is None:
+            continue
+        name, serialize = tracked
+        events.append((f"{name}.{action}", serialize(obj)))
+    if not events:
+        return
+
+    # Resolve display names in one query so clients can render the delta as-is
+    user_ids = {data[key] for _, data in events for key in ('patient_id', 'doctor_id')}
+    names = dict(session.connection().execute(
+        User.__table__.select().with_only_columns([User.user_id, User.name]).where(User.user_id.in_(user_ids))
+    ).fetchall())
+
+    pending = session.info.setdefault('pending_events', [])
+    for event_type, data in events:
+        data['patient_name'] = names.get(data['patient_id'])
+        data['doctor_name'] = names.get(data['doctor_id'])
+        pending.append(((data['patient_id'], data['doctor_id']), {'id': next_event_id(), 'type': event_type, 'data': data}))
+
+def _publish_events(session):
+    events = session.info.pop('pending_events', None)
+    if events:
+        try:
+            event_bus.publish(events, bind=session.get_bind())
+        except Exception as e:
+            # The write already committed; a missed push only delays the client
+            logger.error(f"Failed to publish change events: {str(e)}")
+
+def _discard_events(session, previous_transaction=None):
+    session.info.pop('pending_events', None)
+
+def register_change_events():
+    """Queue change events on flush and publish them only once the transaction commits."""
+    if not event.contains(OrmSession, 'after_flush', _collect_events):
+        event.listen(OrmSession, 'after_flush', _collect_events)
+        event.listen(OrmSession, 'after_commit', _publish_events)
+        event.listen(OrmSession, 'after_rollback', _discard_events)
+
+# Create a singleton instance
+event_bus = create_event_bus()
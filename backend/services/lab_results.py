@@ -0,0 +1,207 @@
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import Integer, cast, func, literal_column
+from models import db, LabObservation
+from utils.counters import insert_new_rows
+import csv
+import re
+
+OBSERVATIONS = LabObservation.__table__
+SERIES_KEYS = ('patient_id', 'analyte', 'observed_at')
+EPOCH = datetime(1970, 1, 1)
+
+# LOINC codes of the common analytes, so HL7 results land on the same series as CSV rows
+LOINC_ANALYTES = {
+    '2345-7': 'glucose',
+    '4548-4': 'hba1c',
+    '2093-3': 'cholesterol',
+    '2085-9': 'hdl',
+    '13457-7': 'ldl',
+    '2089-1': 'ldl',
+    '2571-8': 'triglycerides',
+    '2160-0': 'creatinine',
+    '718-7': 'hemoglobin',
+    '3016-3': 'tsh'
+}
+
+def normalize_analyte(name):
+    """'HbA1c', 'hba1c ' and 'HBA1C' are one series."""
+    return re.sub(r'[^a-z0-9]+', '_', (name or '').strip().lower()).strip('_')[:40]
+
+# ------------------- PARSERS -------------------
+def parse_csv(lines, patient_id=None):
+    """Rows of ``patient_id,analyte,value,unit,observed_at`` with a header line.
+
+    ``patient_id`` may be left out of the file when it is given here.
+    Yields observation dicts; raises ValueError naming the bad line.
+    """
+    for line_number, row in enumerate(csv.DictReader(lines), start=2):
+        try:
+            yield {
+                'patient_id': int(row.get('patient_id') or patient_id),
+                'analyte': normalize_analyte(row['analyte']),
+                'value': float(row['value']),
+                'unit': (row.get('unit') or '').strip() or None,
+                'observed_at': datetime.fromisoformat(row['observed_at'].strip())
+            }
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Line {line_number}: {e}")
+
+def _hl7_datetime(value):
+    digits = re.sub(r'[^0-9]', '', value or '')[:14]
+    if len(digits) < 8:
+        raise ValueError(f"Bad HL7 timestamp: {value!r}")
+    return datetime.strptime(digits.ljust(14, '0'), '%Y%m%d%H%M%S')
+
+def parse_hl7(text, patient_id=None):
+    """Numeric OBX results from HL7 v2-style ORU messages.
+
+    The patient comes from PID-3 (or ``patient_id``), the time from OBX-14,
+    falling back to OBR-7. OBX-3 is mapped through its LOINC code when known
+    and its text otherwise.
+    """
+    current_patient = patient_id
+    observed_default = None
+    for segment in re.split(r'\r\n|\r|\n', text):
+        fields = segment.split('|')
+        kind = fields[0].strip()
+        if kind == 'MSH':
+            current_patient = patient_id
+            observed_default = None
+        elif kind == 'PID' and len(fields) > 3 and fields[3]:
+            current_patient = int(fields[3].split('^')[0])
+        elif kind == 'OBR' and len(fields) > 7 and fields[7]:
+            observed_default = _hl7_datetime(fields[7])
+        elif kind == 'OBX' and len(fields) > 5 and fields[2] in ('NM', 'SN'):
+            code, _, rest = fields[3].partition('^')
+            text_name = rest.split('^')[0]
+            observed_at = _hl7_datetime(fields[14]) if len(fields) > 14 and fields[14] else observed_default
+            if current_patient is None or observed_at is None:
+                raise ValueError(f"OBX without a patient or time: {segment}")
+            yield {
+                'patient_id': current_patient,
+                'analyte': LOINC_ANALYTES.get(code) or normalize_analyte(text_name or code),
+                'value': float(fields[5].split('^')[-1]),
+                'unit': (fields[6].split('^')[0] if len(fields) > 6 else '') or None,
+                'observed_at': observed_at
+            }
+
+def ingest(observations, batch_size=1000):
+    """Insert observations in multi-row batches, skipping ones already stored. Returns (read, inserted)."""
+    read = inserted = 0
+    batch = []
+    for observation in observations:
+        batch.append(observation)
+        read += 1
+        if len(batch) >= batch_size:
+            inserted += len(insert_new_rows(db.session.connection(), OBSERVATIONS, SERIES_KEYS, batch))
+            db.session.commit()
+            batch = []
+    if batch:
+        inserted += len(insert_new_rows(db.session.connection(), OBSERVATIONS, SERIES_KEYS, batch))
+        db.session.commit()
+    return read, inserted
+
+# ------------------- TRENDS -------------------
+def _bucket(column, start, width):
+    """Bucket number of ``column`` for buckets of ``width`` seconds starting at ``start``."""
+    # Inlined rather than bound so PostgreSQL sees the SELECT and GROUP BY expressions as identical
+    offset = literal_column(str(int((start - EPOCH).total_seconds())))
+    width = literal_column(str(int(width)))
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return func.floor((func.extract('epoch', column) - offset) / width)
+    # SQLite: whole seconds, and integer division already floors non-negative values
+    return (cast(func.strftime('%s', column), Integer) - offset) / width
+
+def lab_series(patient_id):
+    """Each analyte recorded for a patient with its reading count and time span."""
+    rows = db.session.query(
+        LabObservation.analyte,
+        func.count().label('count'),
+        func.min(LabObservation.observed_at).label('first'),
+        func.max(LabObservation.observed_at).label('last'),
+        func.max(LabObservation.unit).label('unit')
+    ).filter(LabObservation.patient_id == patient_id).group_by(LabObservation.analyte).order_by(LabObservation.analyte).all()
+    return [{
+        'analyte': row.analyte,
+        'unit': row.unit,
+        'count': row.count,
+        'first': row.first.isoformat(),
+        'last': row.last.isoformat()
+    } for row in rows]
+
+def _parse_bound(value, end_of_day=False):
+    try:
+        day = date.fromisoformat(value)
+    except ValueError:
+        bound = datetime.fromisoformat(value)
+        if bound.tzinfo is not None:
+            # Readings keep the lab's wall-clock time with no zone, so there is nothing to convert an offset against
+            raise ValueError(f"Give times without a UTC offset, in the lab's local time: {value}")
+        return bound
+    if end_of_day:
+        # The last instant timestamps can hold, so the whole day is in and the next one is not
+        return datetime.combine(day + timedelta(days=1), time.min) - timedelta(microseconds=1)
+    return datetime.combine(day, time.min)
+
+def parse_trend_args(args, default_points, max_points):
+    """``from``/``to`` (ISO dates or datetimes) and ``points`` from a query string; raises ValueError.
+
+    A date-only ``to`` covers that whole day. Times with a UTC offset are
+    refused, since readings carry none.
+    """
+    start = _parse_bound(args['from']) if args.get('from') else None
+    end = _parse_bound(args['to'], end_of_day=True) if args.get('to') else None
+    if start and end and end < start:
+        raise ValueError("'to' must not be before 'from'")
+    points = int(args.get('points', default_points))
+    if points < 1 or points > max_points:
+        raise ValueError(f"points must be between 1 and {max_points}")
+    return start, end, points
+
+def lab_trend(patient_id, analyte, start=None, end=None, points=200):
+    """Downsample one analyte series to at most ``points`` min/max/avg buckets, in the database.
+
+    Without ``start``/``end`` the whole series is covered. Buckets with no
+    readings are left out rather than zero-filled.
+    """
+    analyte = normalize_analyte(analyte)
+    series = (LabObservation.patient_id == patient_id, LabObservation.analyte == analyte)
+    if start is None or end is None:
+        first, last = db.session.query(
+            func.min(LabObservation.observed_at), func.max(LabObservation.observed_at)
+        ).filter(*series).one()
+        if first is None:
+            return {'analyte': analyte, 'unit': None, 'bucket_seconds': None, 'points': []}
+        start = start or first
+        end = end or last
+
+    start = start.replace(microsecond=0)
+    # Wide enough that [start, end] splits into at most `points` buckets
+    width = int(max((end - start).total_seconds(), 0) // points) + 1
+    # Bucket numbers are computed per row from the timestamp, so the scan stays on the series index
+    bucket = _bucket(LabObservation.observed_at, start, width).label('bucket')
+    rows = db.session.query(
+        bucket,
+        func.min(LabObservation.value).label('min'),
+        func.max(LabObservation.value).label('max'),
+        func.avg(LabObservation.value).label('avg'),
+        func.count().label('count'),
+        func.max(LabObservation.unit).label('unit')
+    ).filter(
+        *series,
+        LabObservation.observed_at >= start,
+        LabObservation.observed_at <= end
+    ).group_by(bucket).order_by(bucket).all()
+
+    return {
+        'analyte': analyte,
+        'unit': rows[-1].unit if rows else None,
+        'bucket_seconds': width,
+        'points': [{
+            't': (start + timedelta(seconds=int(row.bucket) * width)).isoformat(),
+            'min': row.min,
+            'max': row.max,
+            'avg': round(float(row.avg), 4),
+            'count': row.count
+        } for row in rows]
+    }
@@ -0,0 +1,262 @@
+from datetime import date, datetime
+from sqlalchemy import DateTime, Date, text
+from models import db, ArchivedPartition
+import gzip
+import json
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+class PartitionedTable:
+    """A table range-partitioned by month on ``column`` (PostgreSQL only).
+
+    Partitions are named ``<table>_pYYYY_MM``; rows outside every monthly
+    partition land in ``<table>_default``.
+    """
+
+    def __init__(self, name, column):
+        self.name = name
+        self.column = column
+        self.default_partition = f"{name}_default"
+        self._pattern = re.compile(rf'^{re.escape(name)}_p(\d{{4}})_(\d{{2}})$')
+
+    def partition_name(self, month):
+        return f"{self.name}_p{month.year:04d}_{month.month:02d}"
+
+    def partition_month(self, partition_name):
+        match = self._pattern.match(partition_name)
+        return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+# Serializes partition DDL between processes starting at the same time, the archiver and cron
+PARTITION_LOCK = 'medivault.partitions'
+
+PARTITIONED_TABLES = {table.name: table for table in (
+    PartitionedTable('appointments', 'date_time'),
+    PartitionedTable('adherence_events', 'scheduled_for'),
+)}
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+def add_months(month, count):
+    years, month_index = divmod(month.month - 1 + count, 12)
+    return date(month.year + years, month_index + 1, 1)
+
+# ------------------- PARTITION MAINTENANCE -------------------
+def is_partitioned(connection, table):
+    if connection.dialect.name != 'postgresql':
+        return False
+    return connection.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = :name AND pg_table_is_visible(c.oid)"
+    ), name=table.name).first() is not None
+
+def list_partitions(connection, table):
+    """Monthly partitions attached to ``table`` as (name, month), oldest first."""
+    names = connection.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :name"
+    ), name=table.name).scalars().all()
+    partitions = [(name, table.partition_month(name)) for name in names]
+    return sorted((name, month) for name, month in partitions if month is not None)
+
+def lock_partitions(connection):
+    """Hold the partition DDL lock until the transaction ends."""
+    connection.execute(text("SELECT pg_advisory_xact_lock(hashtext(:name))"), name=PARTITION_LOCK)
+
+def create_partition(connection, table, month):
+    """Create one month's partition, moving over any rows the default partition already holds for it."""
+    name = table.partition_name(month)
+    start, end = month.isoformat(), add_months(month, 1).isoformat()
+    in_range = f"{table.column} >= '{start}' AND {table.column} < '{end}'"
+    create = f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table.name} FOR VALUES FROM ('{start}') TO ('{end}')"
+
+    stranded = connection.execute(text(f"SELECT count(*) FROM {table.default_partition} WHERE {in_range}")).scalar()
+    if not stranded:
+        connection.execute(text(create))
+        return name
+
+    # Postgres refuses a new partition while the default partition holds rows for its range
+    connection.execute(text(f"ALTER TABLE {table.name} DETACH PARTITION {table.default_partition}"))
+    connection.execute(text(create))
+    connection.execute(text(f"INSERT INTO {name} SELECT * FROM {table.default_partition} WHERE {in_range}"))
+    connection.execute(text(f"DELETE FROM {table.default_partition} WHERE {in_range}"))
+    connection.execute(text(f"ALTER TABLE {table.name} ATTACH PARTITION {table.default_partition} DEFAULT"))
+    logger.info(f"Moved {stranded} rows from {table.default_partition} into {name}")
+    return name
+
+def ensure_partitions(months_ahead=3, today=None):
+    """Create any missing monthly partitions from this month through ``months_ahead`` months out.
+
+    Safe to run repeatedly (at startup and from cron); does nothing unless
+    the tables have been partitioned by the Alembic migrations.
+    """
+    current = month_start(today or date.today())
+    created = []
+    with db.engine.begin() as connection:
+        if connection.dialect.name != 'postgresql':
+            return created
+        # Every process runs this at startup; the lock makes the list-then-create below atomic
+        lock_partitions(connection)
+        for table in PARTITIONED_TABLES.values():
+            if not is_partitioned(connection, table):
+                continue
+            existing = {month for _, month in list_partitions(connection, table)}
+            for offset in range(months_ahead + 1):
+                month = add_months(current, offset)
+                if month not in existing:
+                    created.append(create_partition(connection, table, month))
+    if created:
+        logger.info(f"Created partitions: {', '.join(created)}")
+    return created
+
+# ------------------- ARCHIVAL -------------------
+def _encode(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot archive value of type {type(value).__name__}")
+
+def _export_partition(connection, table, name, path):
+    """Stream a partition to gzipped NDJSON through a temporary file; returns the row count."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary_path = path + '.tmp'
+    count = 0
+    result = connection.execution_options(stream_results=True).execute(
+        text(f"SELECT * FROM {name} ORDER BY {table.column}")
+    )
+    with gzip.open(temporary_path, 'wt', encoding='utf-8') as archive:
+        for row in result:
+            archive.write(json.dumps(dict(row._mapping), default=_encode, separators=(',', ':')) + '\n')
+            count += 1
+    os.replace(temporary_path, path)
+    return count
+
+def archive_partitions(table_name, older_than_months, directory, drop=False, today=None):
+    """Export whole monthly partitions older than ``older_than_months`` to ``directory`` and detach them.
+
+    Each partition is written to ``<directory>/<table>/<partition>.ndjson.gz``
+    and checked against its row count before being detached. Detached
+    tables are kept (and still readable through ``iter_archived``) unless
+    ``drop`` is set. Returns the archived partition names.
+    """
+    table = PARTITIONED_TABLES[table_name]
+    cutoff = add_months(month_start(today or date.today()), -older_than_months)
+    archived = []
+
+    with db.engine.connect() as connection:
+        if not is_partitioned(connection, table):
+            raise ValueError(f"{table_name} is not partitioned; run 'alembic upgrade head' on PostgreSQL first")
+        partitions = [(name, month) for name, month in list_partitions(connection, table) if month < cutoff]
+
+    for name, month in partitions:
+        path = os.path.join(directory, table.name, f"{name}.ndjson.gz")
+        with db.engine.connect() as connection:
+            exported = _export_partition(connection, table, name, path)
+        with db.engine.begin() as connection:
+            lock_partitions(connection)
+            # Lock out writers between the check and the detach
+            connection.execute(text(f"LOCK TABLE {name} IN SHARE MODE"))
+            current = connection.execute(text(f"SELECT count(*) FROM {name}")).scalar()
+            if current != exported:
+                raise RuntimeError(f"{name} changed during export ({exported} rows written, {current} now); not detached")
+            connection.execute(text(f"ALTER TABLE {table.name} DETACH PARTITION {name}"))
+            if drop:
+                connection.execute(text(f"DROP TABLE {name}"))
+            connection.execute(ArchivedPartition.__table__.insert().values(
+                table_name=table.name,
+                partition_name=name,
+                range_start=month,
+                range_end=add_months(month, 1),
+                row_count=exported,
+                file_path=os.path.abspath(path),
+                dropped=drop,
+                archived_at=datetime.utcnow()
+            ))
+        logger.info(f"Archived {name}: {exported} rows to {path}")
+        archived.append(name)
+    return archived
+
+# ------------------- HISTORICAL READS -------------------
+def _decoders(table_name):
+    decoders = {}
+    for column in db.metadata.tables[table_name].columns:
+        if isinstance(column.type, DateTime):
+            decoders[column.name] = datetime.fromisoformat
+        elif isinstance(column.type, Date):
+            decoders[column.name] = date.fromisoformat
+    return decoders
+
+def _matches(row, filters):
+    for column, value in filters.items():
+        if isinstance(value, (set, frozenset, list, tuple)):
+            if row.get(column) not in value:
+                return False
+        elif row.get(column) != value:
+            return False
+    return True
+
+def has_archives(table_name):
+    return db.session.query(ArchivedPartition.query.filter(ArchivedPartition.table_name == table_name).exists()).scalar()
+
+def iter_archived(table_name, start=None, end=None, **filters):
+    """Rows of archived partitions, as dicts, matching ``filters`` and datetimes [start, end).
+
+    A filter value is matched for equality, or for membership when it is a
+    set, list or tuple, so many patients can be read in one pass. Reads a
+    detached table when it was kept and the gzipped export otherwise, so
+    each call scans every archive in range once.
+    """
+    table = PARTITIONED_TABLES[table_name]
+    columns = db.metadata.tables[table_name].columns
+    unknown = set(filters) - set(columns.keys())
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(sorted(unknown))}")
+
+    archives = ArchivedPartition.query.filter(ArchivedPartition.table_name == table_name)
+    if start is not None:
+        archives = archives.filter(ArchivedPartition.range_end > start.date())
+    if end is not None:
+        archives = archives.filter(ArchivedPartition.range_start <= end.date())
+    decoders = _decoders(table_name)
+    if any(isinstance(value, (set, frozenset, list, tuple)) for value in filters.values()):
+        # Membership tests against a set stay O(1) per row
+        filters = {column: set(value) if isinstance(value, (list, tuple)) else value for column, value in filters.items()}
+
+    for archive in archives.order_by(ArchivedPartition.range_start).all():
+        if not archive.dropped:
+            conditions = []
+            params = {'range_from': start, 'range_to': end}
+            for column, value in filters.items():
+                if isinstance(value, (set, frozenset)):
+                    conditions.append(f"{column} = ANY(:{column})")
+                    params[column] = list(value)
+                else:
+                    conditions.append(f"{column} = :{column}")
+                    params[column] = value
+            if start is not None:
+                conditions.append(f"{table.column} >= :range_from")
+            if end is not None:
+                conditions.append(f"{table.column} < :range_to")
+            where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+            rows = db.session.execute(
+                text(f"SELECT * FROM {archive.partition_name}{where} ORDER BY {table.column}"),
+                params
+            )
+            for row in rows:
+                yield dict(row._mapping)
+            continue
+
+        with gzip.open(archive.file_path, 'rt', encoding='utf-8') as source:
+            for line in source:
+                row = json.loads(line)
+                if not _matches(row, filters):
+                    continue
+                for column, decode in decoders.items():
+                    if row.get(column) is not None:
+                        row[column] = decode(row[column])
+                if (start is not None and row[table.column] < start) or (end is not None and row[table.column] >= end):
+                    continue
+                yield row
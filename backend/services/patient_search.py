@@ -0,0 +1,387 @@
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from threading import RLock
+from sqlalchemy import and_, case, event, func, literal, literal_column, or_, text, union_all
+from sqlalchemy.orm import Session as OrmSession
+from models import db, User, Appointment, PatientAccess, Prescription, MedicineEntry, MedicalHistory
+from config import SEARCH_BACKEND, SEARCH_FUZZY_THRESHOLD, SQLALCHEMY_DATABASE_URI
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+SEARCH_FIELDS = ('name', 'email', 'diagnosis', 'medicine', 'disease')
+# Clinical fields only match patients who granted the doctor access; names and emails also match patients seen
+CLINICAL_FIELDS = ('diagnosis', 'medicine', 'disease')
+# Shorter terms have no trigram of their own, so a substring index cannot narrow them
+MIN_INDEXED_TERM = 3
+
+def tokenize(text):
+    return re.findall(r'[a-z0-9]+', (text or '').lower())
+
+def trigrams(token):
+    # Padded the way pg_trgm pads words, so both backends agree on similarity
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def panel_scope(doctor_id):
+    """(patients the doctor has seen or may access, patients who granted access)."""
+    granted = {patient_id for patient_id, in db.session.query(PatientAccess.patient_id).filter(
+        PatientAccess.doctor_id == doctor_id,
+        PatientAccess.access_granted.is_(True)
+    )}
+    seen = {patient_id for patient_id, in db.session.query(Appointment.patient_id).filter(
+        Appointment.doctor_id == doctor_id
+    ).distinct()}
+    return seen | granted, granted
+
+def _results(matches, limit):
+    """Group (patient_id, field, value, score) matches by patient, best first, with names and emails."""
+    by_patient = defaultdict(dict)
+    for patient_id, field, value, score in matches:
+        current = by_patient[patient_id].get((field, value))
+        by_patient[patient_id][(field, value)] = max(score, current or 0)
+    ranked = sorted(by_patient.items(), key=lambda item: (-max(item[1].values()), item[0]))[:limit]
+    if not ranked:
+        return []
+
+    users = dict((row.user_id, row) for row in db.session.query(User.user_id, User.name, User.email).filter(
+        User.user_id.in_([patient_id for patient_id, _ in ranked])
+    ))
+    return [{
+        'patient_id': patient_id,
+        'name': users[patient_id].name,
+        'email': users[patient_id].email,
+        'score': round(max(found.values()), 3),
+        'matches': [{'field': field, 'value': value} for (field, value), _ in sorted(found.items(), key=lambda item: -item[1])]
+    } for patient_id, found in ranked if patient_id in users]
+
+# ------------------- POSTGRES -------------------
+class PostgresSearchBackend:
+    """Searches the tables directly through pg_trgm and full-text GIN indexes.
+
+    Every term must start a word of the field (``smi`` finds "John Smith").
+    Fuzzy queries also match values whose words are trigram-similar to the
+    whole query. Needs the Alembic migration that creates the indexes.
+    """
+
+    name = 'postgres'
+
+    def __init__(self, fuzzy_threshold=SEARCH_FUZZY_THRESHOLD):
+        self.fuzzy_threshold = fuzzy_threshold
+
+    def _text_match(self, column, terms):
+        lowered = func.lower(column)
+        conditions = []
+        for term in terms:
+            # LIKE is what the trigram index serves, but only for terms of a whole trigram or more;
+            # the regex then keeps word starts only
+            if len(term) >= MIN_INDEXED_TERM:
+                conditions.append(lowered.like(f"%{term}%"))
+            conditions.append(lowered.op('~')(rf"\m{term}"))
+        return conditions
+
+    def _document_match(self, column, terms):
+        # Same expression as the GIN index, with prefix matching on every term
+        document = func.to_tsvector(literal_column("'simple'"), func.coalesce(column, ''))
+        query = func.to_tsquery(literal_column("'simple'"), literal(' & '.join(f"{term}:*" for term in terms)))
+        return [document.op('@@')(query)]
+
+    def _field_query(self, field, patient_id, column, scope, terms, query, fuzzy, document=False, join=None):
+        conditions = self._document_match(column, terms) if document else self._text_match(column, terms)
+        matched = and_(*conditions)
+        score = literal(1.0)
+        if fuzzy:
+            similar = literal(query).op('<%')(func.lower(column))
+            score = case((matched, 1.0), else_=func.word_similarity(query, func.lower(column)))
+            matched = or_(matched, similar)
+        selected = db.session.query(
+            patient_id.label('patient_id'),
+            literal(field).label('field'),
+            column.label('value'),
+            score.label('score')
+        )
+        if join is not None:
+            selected = selected.select_from(column.class_).join(*join)
+        return selected.filter(matched, scope(patient_id))
+
+    def search(self, doctor_id, query, fields=SEARCH_FIELDS, limit=20, fuzzy=False):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        query = ' '.join(terms)
+
+        # Checked per matching row rather than listing the whole panel first: a doctor can have
+        # hundreds of thousands of patients, while a search term usually matches a few hundred
+        def granted(patient_id):
+            return db.session.query(PatientAccess.patient_id).filter(
+                PatientAccess.patient_id == patient_id,
+                PatientAccess.doctor_id == doctor_id,
+                PatientAccess.access_granted.is_(True)
+            ).exists()
+
+        def panel(patient_id):
+            # The cheap access lookup first; only patients without access probe the appointments
+            return or_(granted(patient_id), db.session.query(Appointment.patient_id).filter(
+                Appointment.patient_id == patient_id,
+                Appointment.doctor_id == doctor_id
+            ).exists())
+        if fuzzy:
+            # Scoped to this transaction, so it never leaks into pooled connections
+            db.session.execute(
+                text("SELECT set_config('pg_trgm.word_similarity_threshold', :threshold, true)"),
+                {'threshold': str(self.fuzzy_threshold)}
+            )
+
+        selects = []
+        if 'name' in fields:
+            selects.append(self._field_query('name', User.user_id, User.name, panel, terms, query, fuzzy).filter(User.role == 'Patient'))
+        if 'email' in fields:
+            selects.append(self._field_query('email', User.user_id, User.email, panel, terms, query, fuzzy).filter(User.role == 'Patient'))
+        if 'diagnosis' in fields:
+            selects.append(self._field_query(
+                'diagnosis', Prescription.patient_id, Prescription.diagnosis, granted, terms, query, fuzzy, document=True
+            ))
+        if 'medicine' in fields:
+            selects.append(self._field_query(
+                'medicine', Prescription.patient_id, MedicineEntry.name, granted, terms, query, fuzzy,
+                join=(Prescription, Prescription.prescription_id == MedicineEntry.prescription_id)
+            ))
+        if 'disease' in fields:
+            selects.append(self._field_query(
+                'disease', MedicalHistory.patient_id, MedicalHistory.disease, granted, terms, query, fuzzy, document=True
+            ))
+        if not selects:
+            return []
+
+        matches = union_all(*[select.statement for select in selects]).subquery()
+        # Rank patients in the database, so one patient with many matching rows cannot crowd out the rest
+        ranked = db.session.query(matches.c.patient_id).group_by(matches.c.patient_id).order_by(
+            func.max(matches.c.score).desc(), matches.c.patient_id
+        ).limit(limit)
+        patient_ids = [patient_id for patient_id, in ranked]
+        if not patient_ids:
+            return []
+        rows = db.session.query(matches).filter(matches.c.patient_id.in_(patient_ids)).all()
+        return _results(rows, limit)
+
+# ------------------- IN-PROCESS -------------------
+class InMemorySearchBackend:
+    """Inverted index over the searchable fields, held in this process.
+
+    Word tokens are kept sorted so a prefix is one ``bisect`` range, and a
+    trigram index over the tokens finds fuzzy candidates without comparing
+    every word. Loaded from the database on the first search and kept
+    current from committed ORM writes in this process, so it suits tests,
+    SQLite and single-process deployments; use the Postgres backend when
+    several workers write.
+    """
+
+    name = 'memory'
+
+    def __init__(self, fuzzy_threshold=SEARCH_FUZZY_THRESHOLD):
+        self.fuzzy_threshold = fuzzy_threshold
+        self._lock = RLock()
+        self._documents = {}  # (field, row key) -> (patient_id, value, tokens)
+        self._postings = defaultdict(set)  # token -> document keys
+        self._tokens = []  # sorted distinct tokens
+        self._trigrams = defaultdict(set)  # trigram -> tokens
+        self._by_patient = defaultdict(set)  # patient_id -> document keys
+        self._loaded = False
+
+    # ------------------- INDEXING -------------------
+    def _add_token(self, token, key):
+        postings = self._postings[token]
+        if not postings and self._loaded:
+            insort(self._tokens, token)
+            for trigram in trigrams(token):
+                self._trigrams[trigram].add(token)
+        postings.add(key)
+
+    def _remove_token(self, token, key):
+        postings = self._postings.get(token)
+        if postings is None:
+            return
+        postings.discard(key)
+        if not postings:
+            del self._postings[token]
+            index = bisect_left(self._tokens, token)
+            if index < len(self._tokens) and self._tokens[index] == token:
+                del self._tokens[index]
+            for trigram in trigrams(token):
+                self._trigrams[trigram].discard(token)
+
+    def put(self, field, key, patient_id, value):
+        with self._lock:
+            self.remove(field, key)
+            tokens = set(tokenize(value))
+            if not tokens:
+                return
+            self._documents[(field, key)] = (patient_id, value, tokens)
+            self._by_patient[patient_id].add((field, key))
+            for token in tokens:
+                self._add_token(token, (field, key))
+
+    def remove(self, field, key):
+        with self._lock:
+            document = self._documents.pop((field, key), None)
+            if document is not None:
+                patient_documents = self._by_patient[document[0]]
+                patient_documents.discard((field, key))
+                if not patient_documents:
+                    del self._by_patient[document[0]]
+                for token in document[2]:
+                    self._remove_token(token, (field, key))
+
+    def _ensure_loaded(self):
+        with self._lock:
+            if not self._loaded:
+                self.rebuild()
+
+    def rebuild(self):
+        """Load every searchable value from the database."""
+        with self._lock:
+            self._documents.clear()
+            self._postings.clear()
+            self._trigrams.clear()
+            self._by_patient.clear()
+            self._tokens = []
+            self._loaded = False
+            for user_id, name, email in db.session.query(User.user_id, User.name, User.email).filter(User.role == 'Patient').yield_per(1000):
+                self.put('name', user_id, user_id, name)
+                self.put('email', user_id, user_id, email)
+            for prescription_id, patient_id, diagnosis in db.session.query(
+                Prescription.prescription_id, Prescription.patient_id, Prescription.diagnosis
+            ).yield_per(1000):
+                self.put('diagnosis', prescription_id, patient_id, diagnosis)
+            for entry_id, patient_id, name in db.session.query(MedicineEntry.id, Prescription.patient_id, MedicineEntry.name).join(
+                Prescription, Prescription.prescription_id == MedicineEntry.prescription_id
+            ).yield_per(1000):
+                self.put('medicine', entry_id, patient_id, name)
+            for record_id, patient_id, disease in db.session.query(
+                MedicalHistory.record_id, MedicalHistory.patient_id, MedicalHistory.disease
+            ).yield_per(1000):
+                self.put('disease', record_id, patient_id, disease)
+
+            # Built in one pass at the end; later tokens are inserted in place
+            self._tokens = sorted(self._postings)
+            for token in self._tokens:
+                for trigram in trigrams(token):
+                    self._trigrams[trigram].add(token)
+            self._loaded = True
+            logger.info(f"Patient search index loaded: {len(self._documents)} values, {len(self._tokens)} words")
+
+    # ------------------- QUERYING -------------------
+    def _matching_tokens(self, term, fuzzy):
+        """Index words matching ``term`` with a score: 1.0 for prefixes, trigram similarity for fuzzy matches."""
+        start = bisect_left(self._tokens, term)
+        end = bisect_left(self._tokens, term + '\uffff', start)
+        matched = {token: 1.0 for token in self._tokens[start:end]}
+        if fuzzy:
+            term_trigrams = trigrams(term)
+            shared = Counter(token for trigram in term_trigrams for token in self._trigrams.get(trigram, ()))
+            for token, count in shared.items():
+                similarity = count / (len(term_trigrams) + len(trigrams(token)) - count)
+                if similarity >= self.fuzzy_threshold and token not in matched:
+                    matched[token] = similarity
+        return matched
+
+    def search(self, doctor_id, query, fields=SEARCH_FIELDS, limit=20, fuzzy=False):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        self._ensure_loaded()
+        panel, granted = panel_scope(doctor_id)
+
+        with self._lock:
+            # Set unions and intersections run in C; only the surviving documents are visited in Python
+            candidates = set().union(*(self._by_patient.get(patient_id, ()) for patient_id in panel))
+            term_tokens = []
+            for term in terms:
+                tokens = self._matching_tokens(term, fuzzy)
+                # Every term has to match the same value
+                candidates &= set().union(*(self._postings[token] for token in tokens))
+                if not candidates:
+                    return []
+                term_tokens.append(tokens)
+
+            matches = []
+            for field, key in candidates:
+                patient_id, value, tokens = self._documents[(field, key)]
+                if field not in fields or (field in CLINICAL_FIELDS and patient_id not in granted):
+                    continue
+                score = sum(max(matched.get(token, 0) for token in tokens) for matched in term_tokens) / len(terms)
+                matches.append((patient_id, field, value, score))
+        return _results(matches, limit)
+
+    # ------------------- CHANGE TRACKING -------------------
+    def _collect_changes(self, session, flush_context):
+        changes = session.info.setdefault('search_changes', [])
+        for obj in session.deleted:
+            for field, key in _index_keys(obj):
+                changes.append((field, key, None, None))
+        entries = []
+        for obj in list(session.new) + [obj for obj in session.dirty if session.is_modified(obj)]:
+            if isinstance(obj, MedicineEntry):
+                entries.append(obj)
+            elif isinstance(obj, User) and obj.role == 'Patient':
+                changes.append(('name', obj.user_id, obj.user_id, obj.name))
+                changes.append(('email', obj.user_id, obj.user_id, obj.email))
+            elif isinstance(obj, Prescription):
+                changes.append(('diagnosis', obj.prescription_id, obj.patient_id, obj.diagnosis))
+            elif isinstance(obj, MedicalHistory):
+                changes.append(('disease', obj.record_id, obj.patient_id, obj.disease))
+        if entries:
+            # The patient is on the prescription; resolve them in one query
+            patients = dict(session.connection().execute(
+                Prescription.__table__.select().with_only_columns([Prescription.prescription_id, Prescription.patient_id]).where(
+                    Prescription.prescription_id.in_({entry.prescription_id for entry in entries})
+                )
+            ).fetchall())
+            for entry in entries:
+                changes.append(('medicine', entry.id, patients.get(entry.prescription_id), entry.name))
+
+    def _apply_changes(self, session):
+        changes = session.info.pop('search_changes', None)
+        if not changes or not self._loaded:
+            return
+        for field, key, patient_id, value in changes:
+            if patient_id is None:
+                self.remove(field, key)
+            else:
+                self.put(field, key, patient_id, value)
+
+    def _discard_changes(self, session, previous_transaction=None):
+        session.info.pop('search_changes', None)
+
+    def register(self):
+        if not event.contains(OrmSession, 'after_flush', self._collect_changes):
+            event.listen(OrmSession, 'after_flush', self._collect_changes)
+            event.listen(OrmSession, 'after_commit', self._apply_changes)
+            event.listen(OrmSession, 'after_rollback', self._discard_changes)
+
+def _index_keys(obj):
+    if isinstance(obj, User):
+        return [('name', obj.user_id), ('email', obj.user_id)]
+    if isinstance(obj, Prescription):
+        return [('diagnosis', obj.prescription_id)]
+    if isinstance(obj, MedicineEntry):
+        return [('medicine', obj.id)]
+    if isinstance(obj, MedicalHistory):
+        return [('disease', obj.record_id)]
+    return []
+
+def create_search_backend(backend=SEARCH_BACKEND):
+    if backend == 'auto':
+        backend = 'postgres' if SQLALCHEMY_DATABASE_URI.startswith('postgresql') else 'memory'
+    if backend == 'postgres':
+        return PostgresSearchBackend()
+    return InMemorySearchBackend()
+
+def register_search_tracking():
+    """Keep the in-process index current after each commit; the Postgres backend needs nothing."""
+    if isinstance(patient_search, InMemorySearchBackend):
+        patient_search.register()
+
+# Create a singleton instance
+patient_search = create_search_backend()
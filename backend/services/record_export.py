@@ -0,0 +1,353 @@
+from flask import Response, stream_with_context
+from collections import defaultdict
+from itertools import groupby, islice
+from models import db, User, PatientAccess, MedicalHistory, Prescription, MedicineEntry, Appointment, MedicationReminder, LabReport
+from config import EXPORT_BATCH_SIZE
+from schemas import user_name
+from services.partitioning import has_archives, iter_archived
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ('ndjson', 'fhir')
+
+EXPORT_MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'fhir': 'application/fhir+json'
+}
+
+EXPORT_EXTENSIONS = {
+    'ndjson': 'ndjson',
+    'fhir': 'json'
+}
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+def _dumps(data):
+    return json.dumps(data, separators=(',', ':'))
+
+class RecordExporter:
+    """Streams complete patient records without materializing them.
+
+    Every query selects plain columns (no ORM entities, so nothing piles up
+    in the session identity map) and is read through ``yield_per``, which
+    uses a server-side cursor on PostgreSQL. Output is produced row by row,
+    so memory stays flat regardless of how much history a patient has.
+    """
+
+    def __init__(self, batch_size=EXPORT_BATCH_SIZE):
+        self.batch_size = batch_size
+
+    # ------------------- PATIENT SELECTION -------------------
+    def iter_panel_patient_ids(self, doctor_id):
+        # Keyset pagination keeps the id list bounded for very large panels
+        last_id = 0
+        while True:
+            rows = db.session.query(PatientAccess.patient_id).filter(
+                PatientAccess.doctor_id == doctor_id,
+                PatientAccess.access_granted.is_(True),
+                PatientAccess.patient_id > last_id
+            ).order_by(PatientAccess.patient_id).limit(self.batch_size).all()
+            if not rows:
+                return
+            for row in rows:
+                yield row.patient_id
+            last_id = rows[-1].patient_id
+
+    def with_archived_appointments(self, patient_ids):
+        """``(patient_id, archived appointment rows)`` pairs, reading the archives once per ``batch_size`` patients.
+
+        Archive files are gzipped and unindexed, so a lookup per patient
+        would rescan all of them for every patient. Only one chunk's
+        archived rows are held at a time, so memory stays bounded however
+        large the panel is.
+        """
+        if not has_archives('appointments'):
+            for patient_id in patient_ids:
+                yield patient_id, ()
+            return
+        patient_ids = iter(patient_ids)
+        while True:
+            chunk = list(islice(patient_ids, self.batch_size))
+            if not chunk:
+                return
+            archived = defaultdict(list)
+            for row in iter_archived('appointments', patient_id=set(chunk)):
+                archived[row['patient_id']].append(row)
+            for patient_id in chunk:
+                yield patient_id, archived.pop(patient_id, ())
+
+    # ------------------- RECORD ITERATION -------------------
+    def iter_records(self, patient_id, archived_appointments=None):
+        """Yield ``(record_type, data)`` pairs for one patient's full record.
+
+        ``archived_appointments`` are the patient's rows from archived
+        partitions; they are looked up when not given.
+        """
+        patient = db.session.query(User.user_id, User.name, User.email, User.phone_number).filter(
+            User.user_id == patient_id
+        ).first()
+        if not patient:
+            return
+
+        yield 'patient', {
+            'patient_id': patient.user_id,
+            'name': patient.name,
+            'email': patient.email,
+            'phone_number': patient.phone_number
+        }
+
+        history = db.session.query(
+            MedicalHistory.record_id,
+            MedicalHistory.disease,
+            MedicalHistory.allergies,
+            MedicalHistory.surgery_history
+        ).filter(MedicalHistory.patient_id == patient_id).order_by(MedicalHistory.record_id).yield_per(self.batch_size)
+        for record in history:
+            yield 'medical_history', {
+                'record_id': record.record_id,
+                'disease': record.disease,
+                'allergies': record.allergies,
+                'surgery_history': record.surgery_history
+            }
+
+        # One ordered join instead of a query per prescription; consecutive
+        # rows are folded back into a prescription with its medicines.
+        prescriptions = db.session.query(
+            Prescription.prescription_id,
+            Prescription.doctor_id,
+            User.name.label('doctor_name'),
+            Prescription.diagnosis,
+            Prescription.date_issued,
+            MedicineEntry.id.label('medicine_id'),
+            MedicineEntry.name.label('medicine_name'),
+            MedicineEntry.dosage,
+            MedicineEntry.frequency,
+            MedicineEntry.timing
+        ).join(User, User.user_id == Prescription.doctor_id).outerjoin(
+            MedicineEntry, MedicineEntry.prescription_id == Prescription.prescription_id
+        ).filter(Prescription.patient_id == patient_id).order_by(
+            Prescription.prescription_id, MedicineEntry.id
+        ).yield_per(self.batch_size)
+        for prescription_id, rows in groupby(prescriptions, key=lambda row: row.prescription_id):
+            rows = list(rows)
+            first = rows[0]
+            yield 'prescription', {
+                'prescription_id': prescription_id,
+                'doctor_id': first.doctor_id,
+                'doctor_name': first.doctor_name,
+                'diagnosis': first.diagnosis,
+                'date_issued': _iso(first.date_issued),
+                'medicines': [{
+                    'medicine_id': row.medicine_id,
+                    'name': row.medicine_name,
+                    'dosage': row.dosage,
+                    'frequency': row.frequency,
+                    'timing': row.timing
+                } for row in rows if row.medicine_id is not None]
+            }
+
+        # Archived months are older than anything left in the table, so they come first
+        if archived_appointments is None:
+            archived_appointments = iter_archived('appointments', patient_id=patient_id)
+        doctor_names = {}
+        for appointment in archived_appointments:
+            doctor_id = appointment['doctor_id']
+            if doctor_id not in doctor_names:
+                doctor_names[doctor_id] = user_name(doctor_id)
+            yield 'appointment', {
+                'appointment_id': appointment['appointment_id'],
+                'doctor_id': doctor_id,
+                'doctor_name': doctor_names[doctor_id],
+                'date_time': _iso(appointment['date_time']),
+                'status': appointment['status']
+            }
+
+        appointments = db.session.query(
+            Appointment.appointment_id,
+            Appointment.doctor_id,
+            User.name.label('doctor_name'),
+            Appointment.date_time,
+            Appointment.status
+        ).join(User, User.user_id == Appointment.doctor_id).filter(
+            Appointment.patient_id == patient_id
+        ).order_by(Appointment.date_time).yield_per(self.batch_size)
+        for appointment in appointments:
+            yield 'appointment', {
+                'appointment_id': appointment.appointment_id,
+                'doctor_id': appointment.doctor_id,
+                'doctor_name': appointment.doctor_name,
+                'date_time': _iso(appointment.date_time),
+                'status': appointment.status
+            }
+
+        reminders = db.session.query(
+            MedicationReminder.reminder_id,
+            MedicationReminder.medicine_entry_id,
+            MedicineEntry.name.label('medicine_name'),
+            MedicineEntry.dosage,
+            MedicationReminder.remind_at,
+            MedicationReminder.start_date,
+            MedicationReminder.end_date,
+            MedicationReminder.is_active
+        ).outerjoin(MedicineEntry, MedicineEntry.id == MedicationReminder.medicine_entry_id).filter(
+            MedicationReminder.patient_id == patient_id
+        ).order_by(MedicationReminder.reminder_id).yield_per(self.batch_size)
+        for reminder in reminders:
+            yield 'reminder', {
+                'reminder_id': reminder.reminder_id,
+                'medicine_entry_id': reminder.medicine_entry_id,
+                'medicine_name': reminder.medicine_name,
+                'dosage': reminder.dosage,
+                'time': reminder.remind_at.strftime('%H:%M'),
+                'start_date': _iso(reminder.start_date),
+                'end_date': _iso(reminder.end_date),
+                'is_active': reminder.is_active
+            }
+
+        lab_reports = db.session.query(
+            LabReport.report_id,
+            LabReport.report_type,
+            LabReport.file_url,
+            LabReport.uploaded_on
+        ).filter(LabReport.patient_id == patient_id).order_by(LabReport.uploaded_on).yield_per(self.batch_size)
+        for report in lab_reports:
+            yield 'lab_report', {
+                'report_id': report.report_id,
+                'report_type': report.report_type,
+                'file_url': report.file_url,
+                'uploaded_on': _iso(report.uploaded_on)
+            }
+
+    # ------------------- OUTPUT FORMATS -------------------
+    def stream_ndjson(self, patient_ids):
+        for patient_id, archived in self.with_archived_appointments(patient_ids):
+            for record_type, data in self.iter_records(patient_id, archived):
+                yield _dumps({'record_type': record_type, 'patient_id': patient_id, **data}) + '\n'
+
+    def stream_fhir_bundle(self, patient_ids):
+        yield '{"resourceType":"Bundle","type":"collection","entry":['
+        separator = ''
+        for patient_id, archived in self.with_archived_appointments(patient_ids):
+            for record_type, data in self.iter_records(patient_id, archived):
+                for resource in _to_fhir(record_type, patient_id, data):
+                    yield separator + _dumps({'fullUrl': f"urn:medivault:{resource['resourceType']}/{resource['id']}", 'resource': resource})
+                    separator = ','
+        yield ']}'
+
+    def stream(self, patient_ids, export_format='ndjson'):
+        if export_format == 'fhir':
+            return self.stream_fhir_bundle(patient_ids)
+        return self.stream_ndjson(patient_ids)
+
+    def response(self, patient_ids, export_format, filename):
+        def generate():
+            try:
+                yield from self.stream(patient_ids, export_format)
+            except Exception as e:
+                # Headers are already sent, so the only option is to cut the stream short
+                logger.error(f"Error while streaming export: {str(e)}", exc_info=True)
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype=EXPORT_MIMETYPES[export_format],
+            headers={
+                'Content-Disposition': f"attachment; filename={filename}.{EXPORT_EXTENSIONS[export_format]}",
+                'X-Accel-Buffering': 'no'
+            }
+        )
+
+# ------------------- FHIR MAPPING -------------------
+def _patient_ref(patient_id):
+    return {'reference': f"Patient/{patient_id}"}
+
+def _doctor_ref(doctor_id, doctor_name):
+    return {'reference': f"Practitioner/{doctor_id}", 'display': doctor_name}
+
+def _to_fhir(record_type, patient_id, data):
+    if record_type == 'patient':
+        telecom = [{'system': 'email', 'value': data['email']}]
+        if data['phone_number']:
+            telecom.append({'system': 'phone', 'value': data['phone_number']})
+        return [{
+            'resourceType': 'Patient',
+            'id': str(patient_id),
+            'name': [{'text': data['name']}],
+            'telecom': telecom
+        }]
+
+    if record_type == 'medical_history':
+        resources = []
+        if data['disease']:
+            resources.append({
+                'resourceType': 'Condition',
+                'id': f"history-{data['record_id']}",
+                'subject': _patient_ref(patient_id),
+                'code': {'text': data['disease']},
+                'note': [{'text': data['surgery_history']}] if data['surgery_history'] else []
+            })
+        if data['allergies']:
+            resources.append({
+                'resourceType': 'AllergyIntolerance',
+                'id': f"history-{data['record_id']}",
+                'patient': _patient_ref(patient_id),
+                'code': {'text': data['allergies']}
+            })
+        return resources
+
+    if record_type == 'prescription':
+        return [{
+            'resourceType': 'MedicationRequest',
+            'id': f"{data['prescription_id']}-{medicine['medicine_id']}",
+            'status': 'active',
+            'intent': 'order',
+            'groupIdentifier': {'value': str(data['prescription_id'])},
+            'subject': _patient_ref(patient_id),
+            'requester': _doctor_ref(data['doctor_id'], data['doctor_name']),
+            'authoredOn': data['date_issued'],
+            'reasonCode': [{'text': data['diagnosis']}] if data['diagnosis'] else [],
+            'medicationCodeableConcept': {'text': medicine['name']},
+            'dosageInstruction': [{
+                'text': ' '.join(part for part in (medicine['dosage'], medicine['frequency'], medicine['timing']) if part)
+            }]
+        } for medicine in data['medicines']]
+
+    if record_type == 'appointment':
+        return [{
+            'resourceType': 'Appointment',
+            'id': str(data['appointment_id']),
+            'status': (data['status'] or '').lower(),
+            'start': data['date_time'],
+            'participant': [
+                {'actor': _patient_ref(patient_id)},
+                {'actor': _doctor_ref(data['doctor_id'], data['doctor_name'])}
+            ]
+        }]
+
+    if record_type == 'reminder':
+        return [{
+            'resourceType': 'CommunicationRequest',
+            'id': f"reminder-{data['reminder_id']}",
+            'status': 'active' if data['is_active'] else 'revoked',
+            'subject': _patient_ref(patient_id),
+            'payload': [{'contentString': f"Take {data['medicine_name']} - {data['dosage']} at {data['time']}"}],
+            'occurrencePeriod': {'start': data['start_date'], 'end': data['end_date']}
+        }]
+
+    if record_type == 'lab_report':
+        return [{
+            'resourceType': 'DiagnosticReport',
+            'id': str(data['report_id']),
+            'status': 'final',
+            'subject': _patient_ref(patient_id),
+            'code': {'text': data['report_type']},
+            'issued': data['uploaded_on'],
+            'presentedForm': [{'url': data['file_url']}] if data['file_url'] else []
+        }]
+
+    return []
+
+# Create a singleton instance
+record_exporter = RecordExporter()
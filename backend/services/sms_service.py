@@ -13,7 +13,7 @@ class SMSService:
 
     def send_reminder(self, phone_number, medicine_name, dosage, timing):
         try:
-            message = f"MediVault Reminder: Time to take {medicine_name} - {dosage} at {timing}"
+            message = f"MediVault Reminder: Time to take {medicine_name} - {dosage} at {timing}. Reply TAKEN or SKIP."
             
             # Format phone number to include country code if not present
             if not phone_number.startswith('+'):
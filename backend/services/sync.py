@@ -0,0 +1,185 @@
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from sqlalchemy.orm import Session as OrmSession
+from models import db, User, PatientAccess, MedicalHistory, Prescription, MedicineEntry, MedicationReminder, Appointment, LabReport, DoctorRequest, SyncTombstone
+from config import SYNC_CURSOR_OVERLAP_SECONDS
+from utils.serializers import Serializer, Field, format_date, format_time
+from schemas import MEDICINE
+import base64
+import itertools
+import json
+
+CURSOR_VERSION = 1
+
+# ------------------- CURSORS -------------------
+def encode_cursor(moment):
+    raw = json.dumps({'v': CURSOR_VERSION, 't': moment.isoformat()}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Return the datetime encoded in ``cursor``, or raise ValueError."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        data = json.loads(raw)
+        if data.get('v') != CURSOR_VERSION:
+            raise ValueError
+        return datetime.fromisoformat(data['t'])
+    except Exception:
+        raise ValueError("Invalid sync cursor")
+
+# ------------------- ENTITIES -------------------
+class SyncEntity:
+    def __init__(self, name, model, key, owners, serialize, query=None, record=None):
+        self.name = name
+        self.model = model
+        self.key = key
+        self.owners = owners
+        self.serialize = serialize
+        self.query = query or (lambda: model.query)
+        self.record = record or (lambda row: row)
+
+    def row_id(self, row):
+        return ':'.join(str(getattr(row, attr)) for attr in self.key)
+
+def _serialize_prescriptions(rows):
+    medicines = {}
+    if rows:
+        entries = MedicineEntry.query.filter(
+            MedicineEntry.prescription_id.in_([row.prescription_id for row in rows])
+        ).order_by(MedicineEntry.id).all()
+        for medicine in entries:
+            medicines.setdefault(medicine.prescription_id, []).append(MEDICINE.dump(medicine))
+    return [{
+        'prescription_id': row.prescription_id,
+        'patient_id': row.patient_id,
+        'doctor_id': row.doctor_id,
+        'diagnosis': row.diagnosis,
+        'date_issued': format_date(row.date_issued),
+        'medicines': medicines.get(row.prescription_id, [])
+    } for row in rows]
+
+MEDICAL_HISTORY_ROWS = Serializer('record_id', 'disease', 'allergies', 'surgery_history')
+
+APPOINTMENT_ROWS = Serializer(
+    'appointment_id',
+    'patient_id',
+    'doctor_id',
+    Field('date', source='date_time', format=format_date),
+    Field('time', source='date_time', format=format_time),
+    'status'
+)
+
+LAB_REPORT_ROWS = Serializer('report_id', 'report_type', 'file_url', Field('uploaded_on', format=format_date))
+
+REMINDER_ROWS = Serializer(
+    Field('reminder_id', source='MedicationReminder.reminder_id'),
+    Field('medicine_name', source=lambda row: row.name or 'Unknown Medicine'),
+    Field('dosage', source=lambda row: row.dosage or 'Unknown Dosage'),
+    Field('time', source='MedicationReminder.remind_at', format=format_time),
+    Field('is_active', source='MedicationReminder.is_active')
+)
+
+ACCESS_REQUEST_ROWS = Serializer('request_id', 'patient_id', 'doctor_id', 'status')
+
+PATIENT_ACCESS_ROWS = Serializer('patient_id', 'doctor_id', 'access_granted', Field('granted_date', source='granted_on', format=format_date))
+
+SYNC_ENTITIES = {entity.name: entity for entity in (
+    SyncEntity('medical_history', MedicalHistory, ('record_id',), ('patient_id',), MEDICAL_HISTORY_ROWS.dump_many),
+    SyncEntity('prescriptions', Prescription, ('prescription_id',), ('patient_id', 'doctor_id'), _serialize_prescriptions),
+    SyncEntity('appointments', Appointment, ('appointment_id',), ('patient_id', 'doctor_id'), APPOINTMENT_ROWS.dump_many),
+    SyncEntity('lab_reports', LabReport, ('report_id',), ('patient_id',), LAB_REPORT_ROWS.dump_many),
+    SyncEntity('reminders', MedicationReminder, ('reminder_id',), ('patient_id',), REMINDER_ROWS.dump_many,
+               query=lambda: db.session.query(
+                   MedicationReminder, MedicineEntry.name, MedicineEntry.dosage
+               ).outerjoin(MedicineEntry, MedicineEntry.id == MedicationReminder.medicine_entry_id),
+               record=lambda row: row.MedicationReminder),
+    SyncEntity('access_requests', DoctorRequest, ('request_id',), ('patient_id', 'doctor_id'), ACCESS_REQUEST_ROWS.dump_many),
+    SyncEntity('patient_access', PatientAccess, ('patient_id', 'doctor_id'), ('patient_id', 'doctor_id'), PATIENT_ACCESS_ROWS.dump_many),
+)}
+
+ENTITIES_BY_MODEL = {entity.model: entity for entity in SYNC_ENTITIES.values()}
+
+def _owned_entities(owner):
+    return [entity for entity in SYNC_ENTITIES.values() if owner in entity.owners]
+
+# ------------------- CHANGE COLLECTION -------------------
+def collect_changes(owner, owner_id, since=None):
+    """Return rows changed for ``owner`` (``'patient_id'`` or ``'doctor_id'``) since a cursor time.
+
+    Every scan is a range over an ``(owner, updated_at)`` index, so the cost
+    follows the number of changes rather than the size of the history.
+    """
+    started = datetime.utcnow()
+    changes = {}
+    user_ids = set()
+
+    for entity in _owned_entities(owner):
+        model = entity.model
+        query = entity.query().filter(getattr(model, owner) == owner_id)
+        if since is not None:
+            query = query.filter(model.updated_at > since)
+        rows = query.order_by(model.updated_at).all()
+
+        inserted, updated = [], []
+        for row, data in zip(rows, entity.serialize(rows)):
+            record = entity.record(row)
+            for column in ('patient_id', 'doctor_id'):
+                if column in data:
+                    user_ids.add(data[column])
+            (inserted if since is None or record.created_at > since else updated).append(data)
+
+        deleted = []
+        if since is not None:
+            tombstones = db.session.query(SyncTombstone.row_id).filter(
+                getattr(SyncTombstone, owner) == owner_id,
+                SyncTombstone.deleted_at > since,
+                SyncTombstone.entity == entity.name
+            ).all()
+            deleted = [tombstone.row_id for tombstone in tombstones]
+
+        changes[entity.name] = {'inserted': inserted, 'updated': updated, 'deleted': deleted}
+
+    # Resolve every referenced name in one query instead of one lookup per row
+    names = dict(db.session.query(User.user_id, User.name).filter(User.user_id.in_(user_ids)).all()) if user_ids else {}
+    for entity_changes in changes.values():
+        for data in itertools.chain(entity_changes['inserted'], entity_changes['updated']):
+            if 'doctor_id' in data:
+                data['doctor_name'] = names.get(data['doctor_id'], 'Unknown Doctor')
+            if 'patient_id' in data:
+                data['patient_name'] = names.get(data['patient_id'])
+
+    # Step back a little so rows committed late by slower transactions are resent, never skipped
+    next_cursor = encode_cursor(started - timedelta(seconds=SYNC_CURSOR_OVERLAP_SECONDS))
+    return {'cursor': next_cursor, 'changes': changes}
+
+# ------------------- CHANGE TRACKING -------------------
+def _record_tombstone(mapper, connection, target):
+    entity = ENTITIES_BY_MODEL[type(target)]
+    connection.execute(SyncTombstone.__table__.insert().values(
+        entity=entity.name,
+        row_id=entity.row_id(target),
+        patient_id=getattr(target, 'patient_id', None),
+        doctor_id=getattr(target, 'doctor_id', None),
+        deleted_at=datetime.utcnow()
+    ))
+
+def _touch_prescriptions(session, flush_context):
+    # Medicines sync nested inside their prescription, so any change to them bumps the parent
+    prescription_ids = {
+        obj.prescription_id for obj in itertools.chain(session.new, session.dirty, session.deleted)
+        if isinstance(obj, MedicineEntry) and obj.prescription_id is not None
+    }
+    if prescription_ids:
+        session.connection().execute(
+            Prescription.__table__.update().where(
+                Prescription.prescription_id.in_(prescription_ids)
+            ).values(updated_at=datetime.utcnow())
+        )
+
+def register_sync_tracking():
+    """Record tombstones for deleted rows and keep parent rows' updated_at current."""
+    if event.contains(OrmSession, 'after_flush', _touch_prescriptions):
+        return
+    for model in ENTITIES_BY_MODEL:
+        event.listen(model, 'after_delete', _record_tombstone)
+    event.listen(OrmSession, 'after_flush', _touch_prescriptions)
@@ -0,0 +1,154 @@
+from datetime import datetime, timedelta
+from hashlib import blake2b
+from threading import Lock
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from models import db, TokenDenylist
+import logging
+import math
+import time
+
+logger = logging.getLogger(__name__)
+
+DENYLIST = TokenDenylist.__table__
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings: no false negatives, ``error_rate`` false positives at ``capacity`` items."""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = max(1, capacity)
+        self.size = max(8, int(math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.hash_count = max(1, int(round(self.size / self.capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # Double hashing: k positions from one 128-bit digest
+        digest = blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+class TokenRevocation:
+    """Denylist of revoked JWTs with an in-process Bloom filter in front of it.
+
+    Every revocation is a row in ``token_denylist``. Each worker keeps a
+    Bloom filter of the revoked jtis and pulls rows added since its last
+    pull at most every ``sync_seconds``, so a token that is not revoked,
+    which is almost every request, is answered from memory. Filter hits are
+    confirmed against the table, which keeps false positives harmless.
+    A revocation is visible at once on the worker that made it and within
+    ``sync_seconds`` everywhere else.
+    """
+
+    def __init__(self, sync_seconds=5, capacity=100000, error_rate=0.001, overlap_seconds=5):
+        self.sync_seconds = sync_seconds
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.overlap_seconds = overlap_seconds
+        self._filter = BloomFilter(capacity, error_rate)
+        self._synced_until = None  # revoked_at of the newest row pulled
+        self._next_sync = 0.0
+        self._lock = Lock()
+
+    def init_app(self, app, jwt):
+        self.sync_seconds = app.config['REVOCATION_SYNC_SECONDS']
+        self.capacity = app.config['REVOCATION_FILTER_CAPACITY']
+        self.error_rate = app.config['REVOCATION_FILTER_ERROR_RATE']
+        self.overlap_seconds = app.config['TOKEN_DENYLIST_OVERLAP_SECONDS']
+        self._filter = BloomFilter(self.capacity, self.error_rate)
+        self._synced_until = None
+        self._next_sync = 0.0
+        jwt.token_in_blocklist_loader(self._blocklist_callback)
+
+    def _blocklist_callback(self, jwt_header, jwt_payload):
+        return self.is_revoked(jwt_payload['jti'])
+
+    def is_revoked(self, jti):
+        if time.monotonic() >= self._next_sync:
+            self.sync()
+        if jti not in self._filter:
+            return False
+        # Possible false positive: the table decides
+        with db.engine.connect() as connection:
+            return connection.execute(select([DENYLIST.c.id]).where(DENYLIST.c.jti == jti)).first() is not None
+
+    # ------------------- SYNC -------------------
+    def sync(self):
+        """Add denylist rows revoked since the last pull to the filter."""
+        loaded = self._synced_until is not None
+        # Until the first load finishes every thread waits for it; afterwards one pull at a time is plenty
+        if not self._lock.acquire(blocking=not loaded):
+            return
+        try:
+            if self._synced_until is None or self._filter.count > self._filter.capacity:
+                self._rebuild()
+            else:
+                self._pull()
+        except Exception as e:
+            # Keep serving from the current filter; revocations from other workers arrive on the next pull
+            logger.error(f"Error syncing token denylist: {str(e)}", exc_info=True)
+        finally:
+            self._next_sync = time.monotonic() + self.sync_seconds
+            self._lock.release()
+
+    def _pull(self):
+        # Re-read a short window so rows from transactions that committed late are not skipped
+        since = self._synced_until - timedelta(seconds=self.overlap_seconds)
+        with db.engine.connect() as connection:
+            rows = connection.execute(
+                select([DENYLIST.c.jti, DENYLIST.c.revoked_at]).where(DENYLIST.c.revoked_at >= since)
+            ).fetchall()
+        for jti, revoked_at in rows:
+            if jti not in self._filter:
+                self._filter.add(jti)
+            self._synced_until = max(self._synced_until, revoked_at)
+
+    def _rebuild(self):
+        """Load every live row into a fresh filter, pruning expired rows first when the old one filled up."""
+        if self._synced_until is not None:
+            self.prune_expired()
+        started = datetime.utcnow()
+        with db.engine.connect() as connection:
+            rows = connection.execute(
+                select([DENYLIST.c.jti, DENYLIST.c.revoked_at]).where(DENYLIST.c.expires_at > started)
+            ).fetchall()
+        bloom = BloomFilter(max(self.capacity, len(rows) * 2), self.error_rate)
+        for jti, _ in rows:
+            bloom.add(jti)
+        self._filter = bloom
+        self._synced_until = max([revoked_at for _, revoked_at in rows] + [started])
+
+    # ------------------- REVOKING -------------------
+    def revoke(self, jwt_payload):
+        """Deny a decoded token from now until it expires."""
+        identity = jwt_payload.get('sub')
+        record = TokenDenylist(
+            jti=jwt_payload['jti'],
+            token_type=jwt_payload.get('type', 'access'),
+            user_id=identity.get('user_id') if isinstance(identity, dict) else None,
+            expires_at=datetime.utcfromtimestamp(jwt_payload['exp'])
+        )
+        db.session.add(record)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()  # already revoked
+        self._filter.add(jwt_payload['jti'])
+
+    def prune_expired(self):
+        """Drop rows for tokens that have expired anyway. Returns how many were removed."""
+        with db.engine.begin() as connection:
+            return connection.execute(DENYLIST.delete().where(DENYLIST.c.expires_at < datetime.utcnow())).rowcount
+
+# Create a singleton instance
+token_revocation = TokenRevocation()
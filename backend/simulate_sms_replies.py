@@ -0,0 +1,62 @@
+"""Local stand-in for Twilio's incoming-message webhook.
+
+Posts form-encoded replies the way Twilio does, signed with TWILIO_AUTH_TOKEN
+when it is set, so the adherence pipeline can be exercised without a phone.
+``--all-patients`` replies for every patient with an active reminder at
+once, the way the burst after an 08:00 or 20:00 reminder wave arrives.
+
+    python simulate_sms_replies.py --from +919876543210 --body TAKEN
+    python simulate_sms_replies.py --all-patients --concurrency 50
+"""
+import argparse
+import os
+import random
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+def patient_phone_numbers():
+    from app import app
+    from models import db, User, MedicationReminder
+    with app.app_context():
+        rows = db.session.query(User.phone_number).join(
+            MedicationReminder, MedicationReminder.patient_id == User.user_id
+        ).filter(
+            MedicationReminder.is_active == True,
+            User.phone_number.isnot(None)
+        ).distinct().all()
+    return [phone_number for phone_number, in rows]
+
+def send_reply(url, phone_number, body, auth_token=None):
+    params = {'From': phone_number, 'To': os.getenv('TWILIO_PHONE_NUMBER', ''), 'Body': body}
+    headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+    if auth_token:
+        from twilio.request_validator import RequestValidator
+        headers['X-Twilio-Signature'] = RequestValidator(auth_token).compute_signature(url, params)
+    request = urllib.request.Request(url, data=urllib.parse.urlencode(params).encode(), headers=headers, method='POST')
+    with urllib.request.urlopen(request) as response:
+        return response.status
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--from', dest='phone_number', help="Reply from this phone number")
+    target.add_argument('--all-patients', action='store_true', help="Reply for every patient with an active reminder")
+    parser.add_argument('--body', default='TAKEN', help="Reply text; with --all-patients, 'mixed' picks TAKEN or SKIP at random")
+    parser.add_argument('--url', default='http://localhost:5000/api/sms/replies')
+    parser.add_argument('--concurrency', type=int, default=20)
+    args = parser.parse_args()
+
+    auth_token = os.getenv('TWILIO_AUTH_TOKEN')
+    phone_numbers = patient_phone_numbers() if args.all_patients else [args.phone_number]
+
+    def reply(phone_number):
+        body = random.choice(['TAKEN', 'TAKEN', 'TAKEN', 'SKIP']) if args.body == 'mixed' else args.body
+        return send_reply(args.url, phone_number, body, auth_token)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        statuses = list(executor.map(reply, phone_numbers))
+    elapsed = time.perf_counter() - started
+    print(f"{len(statuses)} replies in {elapsed:.2f}s ({statuses.count(200)} accepted)")
@@ -0,0 +1,20 @@
+"""Test settings: scratch SQLite databases, set before the app is imported.
+
+The primary and the replica are separate files, so a test can tell which
+one served a read from the rows it gets back.
+"""
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRATCH_DIR = tempfile.mkdtemp(prefix='medivault-tests-')
+PRIMARY_DB = os.path.join(SCRATCH_DIR, 'primary.db')
+REPLICA_DB = os.path.join(SCRATCH_DIR, 'replica.db')
+
+sys.path.insert(0, BACKEND_DIR)
+os.environ['DATABASE_URL'] = f"sqlite:///{PRIMARY_DB}"
+os.environ['DATABASE_REPLICA_URLS'] = f"sqlite:///{REPLICA_DB}"
+os.environ['JWT_SECRET_KEY'] = 'test-secret'
+os.environ['ARCHIVE_DIR'] = os.path.join(SCRATCH_DIR, 'archive')
+os.chdir(SCRATCH_DIR)  # keeps Flask-Session files out of the tree
@@ -0,0 +1,56 @@
+from datetime import date, datetime, time, timezone
+import pytest
+from app import app
+from models import db, User, Doctor, Prescription, MedicineEntry, MedicationReminder, AdherenceEvent, PatientAdherence
+from services.adherence import AdherenceIngestor
+
+def _utc(local):
+    return local.astimezone(timezone.utc).replace(tzinfo=None)
+
+@pytest.fixture
+def reminder():
+    """An 08:00 reminder created at 15:00 on 1 June, starting that day."""
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+        db.create_all()
+        db.session.add_all([
+            User(user_id=1, name='Doctor', email='doctor@test', password_hash='x', role='Doctor'),
+            User(user_id=2, name='Patient', email='patient@test', password_hash='x', role='Patient', phone_number='9800000000'),
+            Doctor(doctor_id=1, specialization='General'),
+            Prescription(prescription_id=1, patient_id=2, doctor_id=1),
+            MedicineEntry(id=1, prescription_id=1, name='metformin'),
+            MedicationReminder(reminder_id=1, patient_id=2, medicine_entry_id=1, remind_at=time(8),
+                               start_date=date(2024, 6, 1), created_at=_utc(datetime(2024, 6, 1, 15)))
+        ])
+        db.session.commit()
+        yield AdherenceIngestor(grace_minutes=120)
+        db.session.remove()
+
+def _statuses():
+    return {row.scheduled_for: row.status for row in AdherenceEvent.query}
+
+def test_sweep_skips_doses_due_before_the_reminder_was_created(reminder):
+    assert reminder.sweep_missed(now=datetime(2024, 6, 1, 23)) == 0
+    assert reminder.sweep_missed(now=datetime(2024, 6, 2, 11)) == 1
+    assert _statuses() == {datetime(2024, 6, 2, 8): 'missed'}
+
+def test_sweep_skips_doses_before_the_start_date(reminder):
+    MedicationReminder.query.get(1).start_date = date(2024, 6, 3)
+    db.session.commit()
+    assert reminder.sweep_missed(now=datetime(2024, 6, 2, 11)) == 0
+    assert reminder.sweep_missed(now=datetime(2024, 6, 3, 11)) == 1
+
+def test_a_late_answer_replaces_a_missed_dose(reminder):
+    reminder.sweep_missed(now=datetime(2024, 6, 2, 11))
+    acknowledged = reminder.acknowledge(2, [{'reminder_id': 1, 'status': 'taken', 'scheduled_for': '2024-06-02T08:00:00'}],
+                                        now=datetime(2024, 6, 2, 12))
+    assert acknowledged == 1
+    assert _statuses() == {datetime(2024, 6, 2, 8): 'taken'}
+    rollup = PatientAdherence.query.get(2)
+    assert (rollup.taken_count, rollup.skipped_count, rollup.missed_count) == (1, 0, 0)
+
+    # An answered dose keeps its first answer
+    assert reminder.acknowledge(2, [{'reminder_id': 1, 'status': 'skipped', 'scheduled_for': '2024-06-02T08:00:00'}],
+                                now=datetime(2024, 6, 2, 12)) == 0
+    assert _statuses() == {datetime(2024, 6, 2, 8): 'taken'}
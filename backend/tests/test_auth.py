@@ -0,0 +1,47 @@
+from datetime import timedelta
+import pytest
+from flask_jwt_extended import create_access_token, create_refresh_token
+from app import app
+from models import db, User
+
+@pytest.fixture
+def tokens():
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+        db.create_all()
+        db.session.add(User(user_id=1, name='Patient', email='patient@test', password_hash='x', role='Patient'))
+        db.session.commit()
+        identity = {'user_id': 1, 'role': 'Patient'}
+        return {
+            'expired_access': create_access_token(identity=identity, expires_delta=timedelta(seconds=-1)),
+            'refresh': create_refresh_token(identity=identity),
+            'other_access': create_access_token(identity={'user_id': 2, 'role': 'Patient'})
+        }
+
+def _refresh(client, refresh_token):
+    return client.post('/api/auth/refresh', headers={'Authorization': f"Bearer {refresh_token}"})
+
+def test_logout_with_an_expired_access_token_revokes_the_refresh_token(tokens):
+    client = app.test_client()
+    response = client.post('/api/auth/logout', json={'refresh_token': tokens['refresh']},
+                           headers={'Authorization': f"Bearer {tokens['expired_access']}"})
+    assert response.status_code == 200
+    assert _refresh(client, tokens['refresh']).status_code == 401
+
+def test_logout_refuses_another_users_refresh_token(tokens):
+    client = app.test_client()
+    response = client.post('/api/auth/logout', json={'refresh_token': tokens['refresh']},
+                           headers={'Authorization': f"Bearer {tokens['other_access']}"})
+    assert response.status_code == 403
+    assert _refresh(client, tokens['refresh']).status_code == 200
+
+def test_refresh_rotates_the_refresh_token(tokens):
+    client = app.test_client()
+    response = _refresh(client, tokens['refresh'])
+    assert response.status_code == 200
+    rotated = response.get_json()['refresh_token']
+    assert rotated != tokens['refresh']
+
+    assert _refresh(client, tokens['refresh']).status_code == 401
+    assert _refresh(client, rotated).status_code == 200
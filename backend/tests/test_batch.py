@@ -0,0 +1,38 @@
+from flask_jwt_extended import create_access_token
+from app import app
+from models import db, User, Doctor
+from services.token_revocation import token_revocation
+
+def _seed():
+    with app.app_context():
+        db.session.remove()
+        for engine in [db.engine] + db.replicas.engines:
+            db.Model.metadata.drop_all(engine)
+            db.Model.metadata.create_all(engine)
+            with engine.begin() as connection:
+                connection.execute(User.__table__.insert(), [
+                    {'user_id': 1, 'name': 'Doctor', 'email': 'doctor@test', 'password_hash': 'x', 'role': 'Doctor'},
+                    {'user_id': 2, 'name': 'Patient', 'email': 'patient@test', 'password_hash': 'x', 'role': 'Patient'}
+                ])
+                connection.execute(Doctor.__table__.insert(), {'doctor_id': 1, 'specialization': 'General'})
+        return create_access_token(identity={'user_id': 2, 'role': 'Patient'})
+
+def test_the_token_is_checked_once_per_batch(monkeypatch):
+    headers = {'Authorization': f"Bearer {_seed()}"}
+    checked = []
+    is_revoked = token_revocation.is_revoked
+    monkeypatch.setattr(token_revocation, 'is_revoked', lambda jti: checked.append(jti) or is_revoked(jti))
+
+    response = app.test_client().post('/api/batch', headers=headers, json={'requests': [
+        {'id': 'dashboard', 'path': '/api/patient/dashboard'},
+        {'id': 'grant', 'method': 'POST', 'path': '/api/patient/grant-access', 'body': {'doctor_id': 1}},
+        {'id': 'appointments', 'path': '/api/patient/appointments'}
+    ]})
+    assert response.status_code == 200
+    assert [item['status'] for item in response.get_json()['responses']] == [200, 201, 200]
+    assert len(checked) == 1
+
+def test_sub_requests_need_the_batch_to_be_authenticated():
+    _seed()
+    response = app.test_client().post('/api/batch', json={'requests': [{'path': '/api/patient/dashboard'}]})
+    assert response.status_code == 401
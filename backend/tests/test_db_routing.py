@@ -0,0 +1,81 @@
+import pytest
+from flask import g
+from flask_jwt_extended import create_access_token
+from app import app
+from models import db, User, Doctor, MedicalHistory, PatientAccess
+from utils.db_routing import LAST_WRITE_COOKIE
+
+def _seed(engine, marker):
+    """The same users in both databases; only the medical history says which one answered."""
+    db.Model.metadata.drop_all(engine)
+    db.Model.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(User.__table__.insert(), [
+            {'user_id': 1, 'name': 'Doctor', 'email': 'doctor@test', 'password_hash': 'x', 'role': 'Doctor'},
+            {'user_id': 2, 'name': 'Patient', 'email': 'patient@test', 'password_hash': 'x', 'role': 'Patient'}
+        ])
+        connection.execute(Doctor.__table__.insert(), {'doctor_id': 1, 'specialization': 'General'})
+        connection.execute(MedicalHistory.__table__.insert(), {'record_id': 1, 'patient_id': 2, 'disease': marker})
+
+@pytest.fixture
+def patient_headers():
+    with app.app_context():
+        db.session.remove()
+        _seed(db.engine, 'primary')
+        _seed(db.replicas.engines[0], 'replica')
+        token = create_access_token(identity={'user_id': 2, 'role': 'Patient'})
+    return {'Authorization': f'Bearer {token}'}
+
+def _served_by(response):
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response.get_json()['medical_history']['disease']
+
+def test_reads_go_to_the_replica(patient_headers):
+    client = app.test_client()
+    assert _served_by(client.get('/api/patient/dashboard', headers=patient_headers)) == 'replica'
+
+def test_a_write_pins_the_rest_of_the_request_to_the_primary(patient_headers):
+    with app.test_request_context('/api/patient/dashboard'):
+        g.db_route = 'replica'
+        assert MedicalHistory.query.get(1).disease == 'replica'
+
+        db.session.add(PatientAccess(patient_id=2, doctor_id=1, access_granted=True))
+        db.session.flush()
+        db.session.expire_all()
+        assert g.db_wrote
+        assert MedicalHistory.query.get(1).disease == 'primary'
+        db.session.rollback()
+        db.session.remove()
+
+def test_last_write_cookie_sends_the_next_request_to_the_primary(patient_headers):
+    client = app.test_client()
+    response = client.post('/api/patient/grant-access', json={'doctor_id': 1}, headers=patient_headers)
+    assert response.status_code == 201
+    assert LAST_WRITE_COOKIE in response.headers.get('Set-Cookie', '')
+
+    assert _served_by(client.get('/api/patient/dashboard', headers=patient_headers)) == 'primary'
+    # Another client that has not written still reads from the replica
+    assert _served_by(app.test_client().get('/api/patient/dashboard', headers=patient_headers)) == 'replica'
+
+def test_batched_reads_after_a_write_go_to_the_primary(patient_headers):
+    response = app.test_client().post('/api/batch', headers=patient_headers, json={'requests': [
+        {'id': 'before', 'path': '/api/patient/dashboard'},
+        {'id': 'grant', 'method': 'POST', 'path': '/api/patient/grant-access', 'body': {'doctor_id': 1}},
+        {'id': 'after', 'path': '/api/patient/dashboard'}
+    ]})
+    assert response.status_code == 200
+    bodies = {item['id']: item for item in response.get_json()['responses']}
+    assert bodies['grant']['status'] == 201
+    assert bodies['before']['body']['medical_history']['disease'] == 'replica'
+    assert bodies['after']['body']['medical_history']['disease'] == 'primary'
+    assert len(bodies['after']['body']['current_access']) == 1
+
+def test_a_core_update_goes_to_the_primary(patient_headers):
+    with app.test_request_context('/api/patient/dashboard'):
+        g.db_route = 'replica'
+        table = MedicalHistory.__table__
+        db.session.execute(table.update().where(table.c.record_id == 1).values(allergies='updated'))
+        assert g.db_wrote
+        assert db.session.execute(table.select().where(table.c.record_id == 1)).first().disease == 'primary'
+        db.session.rollback()
+        db.session.remove()
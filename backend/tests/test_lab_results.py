@@ -0,0 +1,48 @@
+import pytest
+from datetime import datetime
+from flask_jwt_extended import create_access_token
+from app import app
+from models import db, User, LabObservation
+from services.lab_results import lab_trend, parse_trend_args
+
+def test_date_only_to_covers_the_whole_day():
+    start, end, points = parse_trend_args({'from': '2024-01-01', 'to': '2024-12-31'}, 200, 1000)
+    assert start == datetime(2024, 1, 1)
+    assert datetime(2024, 12, 31, 23, 59, 59) < end < datetime(2025, 1, 1)
+    assert points == 200
+
+def test_datetime_to_is_kept_as_given():
+    _, end, _ = parse_trend_args({'to': '2024-12-31T08:30:00'}, 200, 1000)
+    assert end == datetime(2024, 12, 31, 8, 30)
+
+def test_trend_includes_readings_from_the_last_day():
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+        db.create_all()
+        db.session.add(User(user_id=1, name='Patient', email='patient@test', password_hash='x', role='Patient'))
+        db.session.add_all([
+            LabObservation(patient_id=1, analyte='glucose', observed_at=observed_at, value=value, unit='mg/dL')
+            for observed_at, value in (
+                (datetime(2024, 12, 30, 9), 90.0),
+                (datetime(2024, 12, 31, 18), 110.0),
+                (datetime(2025, 1, 1, 0), 500.0)
+            )
+        ])
+        db.session.commit()
+
+        start, end, points = parse_trend_args({'from': '2024-12-30', 'to': '2024-12-31'}, 200, 1000)
+        trend = lab_trend(1, 'glucose', start, end, points)
+        assert sum(point['count'] for point in trend['points']) == 2
+        assert max(point['max'] for point in trend['points']) == 110.0
+        db.session.remove()
+
+def test_bounds_with_an_offset_are_refused():
+    with pytest.raises(ValueError):
+        parse_trend_args({'from': '2024-01-01T00:00:00+05:30'}, 200, 1000)
+
+    with app.app_context():
+        token = create_access_token(identity={'user_id': 1, 'role': 'Patient'})
+    response = app.test_client().get('/api/patient/lab-results/glucose/trend', query_string={'from': '2024-01-01T00:00:00+05:30'},
+                                      headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 400
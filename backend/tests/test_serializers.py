@@ -0,0 +1,42 @@
+from datetime import datetime
+from decimal import Decimal
+import json
+import pytest
+from sqlalchemy import event
+from app import app
+from models import db, User, Doctor, Appointment
+from schemas import PATIENT_APPOINTMENT
+from utils.serializers import dumps
+
+@pytest.fixture
+def appointments():
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+        db.create_all()
+        db.session.add(User(user_id=1, name='Patient', email='patient@test', password_hash='x', role='Patient'))
+        for doctor_id in (2, 3, 4):
+            db.session.add_all([
+                User(user_id=doctor_id, name=f'Doctor {doctor_id}', email=f'doctor{doctor_id}@test', password_hash='x', role='Doctor'),
+                Doctor(doctor_id=doctor_id, specialization='General')
+            ])
+        for index, doctor_id in enumerate((2, 3, 4, 2, 3, 4)):
+            db.session.add(Appointment(patient_id=1, doctor_id=doctor_id, date_time=datetime(2024, 6, 1 + index, 9), status='Scheduled'))
+        db.session.commit()
+        db.session.expunge_all()
+        yield Appointment.query.filter_by(patient_id=1).order_by(Appointment.date_time).all()
+        db.session.remove()
+
+def test_doctor_names_are_loaded_in_one_query(appointments):
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        rows = PATIENT_APPOINTMENT.dump_many(appointments)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert [row['doctor_name'] for row in rows] == ['Doctor 2', 'Doctor 3', 'Doctor 4'] * 2
+    assert len([statement for statement in statements if 'FROM users' in statement]) == 1
+
+def test_dumps_encodes_unknown_types_as_strings():
+    assert json.loads(dumps({'amount': Decimal('1.50')})) == {'amount': '1.50'}
@@ -1,2 +1,29 @@
 -- Add phone number column to users table
-ALTER TABLE users ADD COLUMN phone_number VARCHAR(20); 
\ No newline at end of file
+ALTER TABLE users ADD COLUMN phone_number VARCHAR(20); 
+-- Delta sync: per-row change tracking and (owner, updated_at) range indexes
+ALTER TABLE patient_access ADD COLUMN created_at TIMESTAMP NOT NULL DEFAULT now();
+ALTER TABLE patient_access ADD COLUMN updated_at TIMESTAMP NOT NULL DEFAULT now();
+ALTER TABLE medical_history ADD COLUMN created_at TIMESTAMP NOT NULL DEFAULT now();
+ALTER TABLE medical_history ADD COLUMN updated_at TIMESTAMP NOT NULL DEFAULT now();
+ALTER TABLE prescriptions ADD COLUMN created_at TIMESTAMP NOT NULL DEFAULT now();
+ALTER TABLE prescriptions ADD COLUMN updated_at TIMESTAMP NOT NULL DEFAULT now();
+ALTER TABLE medication_reminders ADD COLUMN created_at TIMESTAMP NOT NULL DEFAULT now();
+ALTER TABLE medication_reminders ADD COLUMN updated_at TIMESTAMP NOT NULL DEFAULT now();
+ALTER TABLE appointments ADD COLUMN created_at TIMESTAMP NOT NULL DEFAULT now();
+ALTER TABLE appointments ADD COLUMN updated_at TIMESTAMP NOT NULL DEFAULT now();
+ALTER TABLE lab_reports ADD COLUMN created_at TIMESTAMP NOT NULL DEFAULT now();
+ALTER TABLE lab_reports ADD COLUMN updated_at TIMESTAMP NOT NULL DEFAULT now();
+ALTER TABLE doctor_requests ADD COLUMN created_at TIMESTAMP NOT NULL DEFAULT now();
+ALTER TABLE doctor_requests ADD COLUMN updated_at TIMESTAMP NOT NULL DEFAULT now();
+
+CREATE INDEX ix_patient_access_patient_updated ON patient_access (patient_id, updated_at);
+CREATE INDEX ix_patient_access_doctor_updated ON patient_access (doctor_id, updated_at);
+CREATE INDEX ix_medical_history_patient_updated ON medical_history (patient_id, updated_at);
+CREATE INDEX ix_prescriptions_patient_updated ON prescriptions (patient_id, updated_at);
+CREATE INDEX ix_prescriptions_doctor_updated ON prescriptions (doctor_id, updated_at);
+CREATE INDEX ix_medication_reminders_patient_updated ON medication_reminders (patient_id, updated_at);
+CREATE INDEX ix_appointments_patient_updated ON appointments (patient_id, updated_at);
+CREATE INDEX ix_appointments_doctor_updated ON appointments (doctor_id, updated_at);
+CREATE INDEX ix_lab_reports_patient_updated ON lab_reports (patient_id, updated_at);
+CREATE INDEX ix_doctor_requests_patient_updated ON doctor_requests (patient_id, updated_at);
+CREATE INDEX ix_doctor_requests_doctor_updated ON doctor_requests (doctor_id, updated_at);
@@ -1,5 +1,14 @@
+from flask import _request_ctx_stack, request
+from flask_jwt_extended import jwt_required as verified_jwt_required
 from werkzeug.security import generate_password_hash, check_password_hash
 from models import User
+import functools
+
+# WSGI environ key carrying a JWT that /api/batch already verified; clients cannot set environ keys
+BATCH_JWT_ENVIRON = 'medivault.batch_jwt'
+
+# Where flask_jwt_extended keeps the verified token on the request context
+JWT_CONTEXT = ('jwt', 'jwt_header', 'jwt_user', 'jwt_location')
 
 def hash_password(password):
     return generate_password_hash(password)
@@ -9,3 +18,27 @@ def verify_password(password, stored_hash):
 
 def find_user_by_email(email):
     return User.query.filter_by(email=email).first()
+
+def verified_jwt():
+    """The current request's verified JWT, to hand to batched sub-requests."""
+    return {name: getattr(_request_ctx_stack.top, name) for name in JWT_CONTEXT}
+
+def jwt_required(optional=False, fresh=False, refresh=False, locations=None):
+    """``flask_jwt_extended.jwt_required`` that accepts the access token a batch already verified.
+
+    Sub-requests of ``/api/batch`` skip decoding and the denylist check and
+    reuse the batch's identity; every other request is checked as usual.
+    """
+    def wrapper(view):
+        protected = verified_jwt_required(optional, fresh, refresh, locations)(view)
+
+        @functools.wraps(view)
+        def decorator(*args, **kwargs):
+            verified = request.environ.get(BATCH_JWT_ENVIRON)
+            if verified is None or fresh or refresh:
+                return protected(*args, **kwargs)
+            for name, value in verified.items():
+                setattr(_request_ctx_stack.top, name, value)
+            return view(*args, **kwargs)
+        return decorator
+    return wrapper
@@ -0,0 +1,45 @@
+from flask import current_app, request
+import gzip
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/fhir+json', 'text/html', 'text/plain', 'text/csv')
+
+def _negotiate():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+def compress_response(response):
+    """Compress buffered responses above COMPRESS_MIN_SIZE with br or gzip, as the client accepts."""
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code >= 300 or response.status_code == 204
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < current_app.config['COMPRESS_MIN_SIZE']:
+        return response
+
+    encoding = _negotiate()
+    if encoding == 'br':
+        data = brotli.compress(data, quality=current_app.config['COMPRESS_BROTLI_QUALITY'])
+    elif encoding == 'gzip':
+        data = gzip.compress(data, compresslevel=current_app.config['COMPRESS_GZIP_LEVEL'])
+    else:
+        return response
+
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+def init_compression(app):
+    app.after_request(compress_response)
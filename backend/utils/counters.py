@@ -0,0 +1,80 @@
+from sqlalchemy import and_, select, tuple_
+
+def _upsert_insert(dialect_name):
+    if dialect_name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    if dialect_name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    return None
+
+def increment_counters(connection, table, key_columns, rows):
+    """Add counter deltas to rows of ``table``, creating missing rows.
+
+    ``rows`` are dicts holding every key column plus the counter deltas.
+    Deltas for the same key are merged first so the whole batch goes out as
+    a single multi-row ``INSERT ... ON CONFLICT DO UPDATE``.
+    """
+    merged = {}
+    for row in rows:
+        key = tuple(row[column] for column in key_columns)
+        target = merged.setdefault(key, {column: row[column] for column in key_columns})
+        for column, value in row.items():
+            if column not in key_columns:
+                target[column] = target.get(column, 0) + value
+    rows = [row for row in merged.values() if any(row[column] for column in row if column not in key_columns)]
+    if not rows:
+        return
+
+    counter_columns = [column for column in rows[0] if column not in key_columns]
+    insert = _upsert_insert(connection.dialect.name)
+    if insert is not None:
+        statement = insert(table).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_={column: table.c[column] + statement.excluded[column] for column in counter_columns}
+        )
+        connection.execute(statement)
+        return
+
+    # Portable fallback: update in place, insert when nothing matched
+    for row in rows:
+        match = and_(*(table.c[column] == row[column] for column in key_columns))
+        result = connection.execute(table.update().where(match).values(
+            {column: table.c[column] + row[column] for column in counter_columns}
+        ))
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(row))
+
+def insert_new_rows(connection, table, key_columns, rows):
+    """Insert ``rows`` in one multi-row statement, skipping keys that already exist.
+
+    Returns the rows that were actually inserted, so callers can count each
+    key exactly once however many times it is submitted.
+    """
+    merged = {}
+    for row in rows:
+        merged.setdefault(tuple(row[column] for column in key_columns), row)  # first submission wins
+    if not merged:
+        return []
+
+    key_expression = tuple_(*(table.c[column] for column in key_columns))
+    insert = _upsert_insert(connection.dialect.name)
+    if connection.dialect.name == 'postgresql':
+        statement = insert(table).values(list(merged.values())).on_conflict_do_nothing(index_elements=list(key_columns))
+        inserted = {tuple(row) for row in connection.execute(statement.returning(*key_expression.clauses))}
+        return [row for key, row in merged.items() if key in inserted]
+
+    # No RETURNING here: look the keys up first (good enough for single-writer development databases)
+    existing = {tuple(row) for row in connection.execute(
+        select(list(key_expression.clauses)).where(key_expression.in_(list(merged)))
+    )}
+    new_rows = [row for key, row in merged.items() if key not in existing]
+    if new_rows:
+        if insert is not None:
+            statement = insert(table).on_conflict_do_nothing(index_elements=list(key_columns))
+        else:
+            statement = table.insert()
+        connection.execute(statement.values(new_rows))
+    return new_rows
@@ -0,0 +1,143 @@
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import create_engine, orm, text
+from sqlalchemy.sql.elements import TextClause
+from sqlalchemy.sql.selectable import SelectBase
+import functools
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+LAST_WRITE_COOKIE = 'mv_last_write'
+
+POSTGRES_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+class ReplicaSet:
+    """Read replica engines plus a cached view of how far behind each one is."""
+
+    def __init__(self, app):
+        engine_options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+        self.engines = [create_engine(uri, **engine_options) for uri in app.config['SQLALCHEMY_REPLICA_URIS']]
+        self.max_lag = app.config['REPLICA_MAX_LAG_SECONDS']
+        self.check_interval = app.config['REPLICA_LAG_CHECK_SECONDS']
+        self._lags = {}
+        self._lock = threading.Lock()
+
+    def lag(self, engine):
+        """Replication lag in seconds, or None when the replica cannot be reached."""
+        now = time.monotonic()
+        with self._lock:
+            checked_at, lag = self._lags.get(engine, (None, None))
+        if checked_at is not None and now - checked_at < self.check_interval:
+            return lag
+
+        try:
+            with engine.connect() as connection:
+                lag = float(connection.execute(POSTGRES_LAG_QUERY).scalar()) if engine.dialect.name == 'postgresql' else 0.0
+        except Exception as e:
+            logger.warning(f"Replica {engine.url.host or engine.url.database} unavailable: {str(e)}")
+            lag = None
+        with self._lock:
+            self._lags[engine] = (now, lag)
+        return lag
+
+    def pick(self, max_staleness=None):
+        """A replica lagging less than both the configured limit and ``max_staleness``, if any."""
+        limit = self.max_lag if max_staleness is None else min(self.max_lag, max_staleness)
+        healthy = []
+        for engine in self.engines:
+            lag = self.lag(engine)
+            if lag is not None and lag <= limit:
+                healthy.append(engine)
+        return random.choice(healthy) if healthy else None
+
+class RoutingSession(SignallingSession):
+    """Sends reads from ``@replica_read`` views to a replica and everything else to the primary."""
+
+    def __init__(self, db, **options):
+        self._routing_db = db
+        super().__init__(db, **options)
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._flushing or _is_write(clause):
+            _mark_write()
+        elif has_request_context() and g.get('db_route') == 'replica' and not g.get('db_wrote'):
+            engine = self._replica_for_request()
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper, clause)
+
+    def _replica_for_request(self):
+        # Pick once per request so every read in it sees the same snapshot
+        if 'db_replica' not in g:
+            since_write = _seconds_since_last_write()
+            if since_write is not None and since_write < current_app.config['READ_YOUR_WRITES_SECONDS']:
+                # Inside the read-your-writes window the primary is the only safe choice
+                g.db_replica = None
+            else:
+                # Otherwise any replica that has replayed past this client's last write will do
+                g.db_replica = self._routing_db.replicas.pick(since_write)
+        return g.db_replica
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def init_app(self, app):
+        app.config.setdefault('SQLALCHEMY_REPLICA_URIS', [])
+        app.config.setdefault('REPLICA_MAX_LAG_SECONDS', 5.0)
+        app.config.setdefault('REPLICA_LAG_CHECK_SECONDS', 2.0)
+        app.config.setdefault('READ_YOUR_WRITES_SECONDS', 10.0)
+        super().init_app(app)
+        app.extensions['db_replicas'] = ReplicaSet(app)
+        app.after_request(_remember_write)
+
+    @property
+    def replicas(self):
+        return current_app.extensions['db_replicas']
+
+def _is_write(clause):
+    """Whether a statement run through ``session.execute`` may write; anything but a SELECT is treated as one."""
+    if clause is None or isinstance(clause, SelectBase):
+        return False
+    if isinstance(clause, TextClause):
+        return not clause.text.lstrip().lower().startswith('select')
+    return True
+
+def _mark_write():
+    if has_request_context():
+        g.db_wrote = True
+
+def _seconds_since_last_write():
+    """Seconds since this client last wrote, or None if it has not written recently."""
+    try:
+        last_write = float(request.cookies.get(LAST_WRITE_COOKIE, 0))
+    except ValueError:
+        return None
+    return time.time() - last_write if last_write else None
+
+def _remember_write(response):
+    if g.get('db_wrote'):
+        response.set_cookie(
+            LAST_WRITE_COOKIE,
+            str(time.time()),
+            max_age=int(current_app.config['READ_YOUR_WRITES_SECONDS']) + int(current_app.config['REPLICA_MAX_LAG_SECONDS']) + 60,
+            httponly=True,
+            samesite='Lax'
+        )
+    return response
+
+def replica_read(view):
+    """Allow a read-only GET view to be served from a read replica."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method in ('GET', 'HEAD'):
+            g.db_route = 'replica'
+        return view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,102 @@
+from flask import Response
+from functools import lru_cache
+from datetime import datetime
+import json
+import keyword
+
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib encoder
+    orjson = None
+
+# ------------------- CACHED FORMATTERS -------------------
+@lru_cache(maxsize=8192)
+def _date_string(value):
+    return value.strftime('%Y-%m-%d')
+
+@lru_cache(maxsize=1440)
+def _hour_minute_string(hour, minute):
+    return f"{hour:02d}:{minute:02d}"
+
+def format_date(value):
+    """'%Y-%m-%d' for dates and datetimes; datetimes share the cache entry of their day."""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        value = value.date()
+    return _date_string(value)
+
+def format_time(value):
+    """'%H:%M' for times and datetimes, served from a 1440-entry cache."""
+    if value is None:
+        return None
+    return _hour_minute_string(value.hour, value.minute)
+
+# ------------------- SERIALIZERS -------------------
+class Field:
+    def __init__(self, name, source=None, format=None, nested=None):
+        self.name = name
+        self.source = source or name
+        self.format = format
+        self.nested = nested
+
+class Serializer:
+    """Declarative object-to-dict serializer, compiled once into a single function.
+
+    Fields are plain attribute names or ``Field`` objects. ``source`` may be
+    an attribute path or a callable taking the object, ``format`` is applied
+    to the value, and ``nested`` serializes a collection with another
+    ``Serializer``. ``preload``, if given, is called once with the whole
+    list in ``dump_many`` to batch-load what the fields look up per row.
+    """
+
+    def __init__(self, *fields, preload=None):
+        self.fields = [field if isinstance(field, Field) else Field(field) for field in fields]
+        self.preload = preload
+        self._serialize = self._compile()
+
+    def _compile(self):
+        namespace = {}
+        items = []
+        for index, field in enumerate(self.fields):
+            if callable(field.source):
+                namespace[f'_source{index}'] = field.source
+                expression = f'_source{index}(obj)'
+            else:
+                parts = field.source.split('.')
+                if not all(part.isidentifier() and not keyword.iskeyword(part) for part in parts):
+                    raise ValueError(f"Invalid field source: {field.source}")
+                expression = 'obj.' + field.source
+            if field.format is not None:
+                namespace[f'_format{index}'] = field.format
+                expression = f'_format{index}({expression})'
+            if field.nested is not None:
+                namespace[f'_nested{index}'] = field.nested.dump_many
+                expression = f'_nested{index}({expression})'
+            items.append(f'{field.name!r}: {expression}')
+
+        source = 'def serialize(obj):\n    return {' + ', '.join(items) + '}\n'
+        exec(compile(source, f'<serializer {id(self)}>', 'exec'), namespace)
+        return namespace['serialize']
+
+    def dump(self, obj):
+        return self._serialize(obj)
+
+    def dump_many(self, objs):
+        serialize = self._serialize
+        if self.preload is None:
+            return [serialize(obj) for obj in objs]
+        objs = list(objs)
+        # Held until the rows are serialized so the loaded objects stay in the identity map
+        preloaded = self.preload(objs)
+        return [serialize(obj) for obj in objs]
+
+# ------------------- JSON RESPONSES -------------------
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data, default=str)
+    return json.dumps(data, separators=(',', ':'), default=str).encode()
+
+def json_response(data, status=200):
+    """Drop-in for ``jsonify`` that encodes with orjson when it is installed."""
+    return Response(dumps(data), status=status, mimetype='application/json')
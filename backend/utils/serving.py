@@ -0,0 +1,105 @@
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.pool import NullPool, QueuePool
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# ------------------- POOL SIZING -------------------
+def server_max_connections(uri):
+    """The database's ``max_connections``, or None when it cannot be read (or is not PostgreSQL)."""
+    if not uri.startswith('postgresql'):
+        return None
+    try:
+        engine = create_engine(uri, poolclass=NullPool)
+        with engine.connect() as connection:
+            return int(connection.execute(text("SHOW max_connections")).scalar())
+    except Exception as e:
+        logger.warning(f"Could not read max_connections: {str(e)}")
+        return None
+
+def pool_budget(max_connections, reserved, workers, threads, background_threads=2):
+    """(pool_size, max_overflow) per worker process.
+
+    Every worker at full overflow has to fit in ``max_connections`` minus
+    the ``reserved`` connections kept for migrations, cron jobs, the event
+    server and psql. Each request thread gets a pooled connection, and the
+    background threads (adherence flushes, revocation syncs, the missed-dose
+    sweep lock) get overflow.
+    """
+    per_worker = max(1, (max_connections - reserved) // workers)
+    if per_worker < threads:
+        logger.warning(
+            f"{per_worker} connections per worker for {threads} threads: requests will queue for connections; "
+            f"lower WEB_WORKERS or WEB_THREADS, or raise max_connections"
+        )
+    pool_size = min(threads, per_worker)
+    max_overflow = max(0, min(per_worker, threads + background_threads) - pool_size)
+    return pool_size, max_overflow
+
+# ------------------- POOL METRICS -------------------
+class PoolMetrics:
+    """Per-process connection pool counters, fed by pool checkout events.
+
+    ``at_capacity`` counts checkouts that left no connection free, so the
+    requests after them waited for a checkin (or timed out). It is the
+    number to watch when sizing workers and pools.
+    """
+
+    def __init__(self):
+        self._engines = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def watch(self, name, engine):
+        if name in self._engines:
+            return
+        stats = {'checkouts': 0, 'at_capacity': 0, 'peak_checked_out': 0}
+        self._engines[name] = (engine, stats)
+
+        # Listeners carry over when dispose() replaces the pool, so look the pool up on each checkout
+        @event.listens_for(engine.pool, 'checkout')
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            pool = engine.pool
+            with self._lock:
+                stats['checkouts'] += 1
+                if isinstance(pool, QueuePool):
+                    checked_out = pool.checkedout()
+                    stats['peak_checked_out'] = max(stats['peak_checked_out'], checked_out)
+                    if checked_out >= pool.size() + max(pool._max_overflow, 0):
+                        stats['at_capacity'] += 1
+
+    def snapshot(self):
+        engines = {}
+        for name, (engine, stats) in self._engines.items():
+            pool = engine.pool
+            with self._lock:
+                data = dict(stats)
+            data['pool'] = type(pool).__name__
+            if isinstance(pool, QueuePool):
+                capacity = pool.size() + max(pool._max_overflow, 0)
+                data.update({
+                    'size': pool.size(),
+                    'max_overflow': pool._max_overflow,
+                    'checked_out': pool.checkedout(),
+                    'checked_in': pool.checkedin(),
+                    'overflow': pool.overflow(),
+                    'saturation': round(pool.checkedout() / capacity, 3) if capacity else None
+                })
+            engines[name] = data
+        return {'pid': os.getpid(), 'uptime_seconds': round(time.time() - self.started_at), 'engines': engines}
+
+# ------------------- DRAINING -------------------
+_draining = threading.Event()
+
+def start_draining():
+    """Fail health checks from now on so the load balancer stops routing here before the worker stops."""
+    _draining.set()
+
+def is_draining():
+    return _draining.is_set()
+
+# Create a singleton instance
+pool_metrics = PoolMetrics()
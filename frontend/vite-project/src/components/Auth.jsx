@@ -35,6 +35,7 @@ export default function AuthPage() {
 
       // Store token and user data
       localStorage.setItem('token', data.access_token)
+      localStorage.setItem('refresh_token', data.refresh_token)
       localStorage.setItem('user', JSON.stringify(data.user))
 
       // Redirect based on role
@@ -1,5 +1,6 @@
 import { useState, useEffect } from 'react';
-import { Users, ClipboardList, Calendar, Shield, Bell, Plus, Check, X, User, ChevronDown, LogOut, FileText } from "lucide-react";
+import { Users, ClipboardList, Calendar, Shield, Bell, Plus, Check, X, User, ChevronDown, LogOut, FileText, Search } from "lucide-react";
+import { fetchBatch, fetchWithToken, logout, searchPatients, subscribeToEvents } from '../utils/api';
 
 export default function DoctorDashboard() {
   const [currentUser, setCurrentUser] = useState({
@@ -22,61 +23,104 @@ export default function DoctorDashboard() {
   });
 
   const [eligiblePatients, setEligiblePatients] = useState([]);
+  const [searchQuery, setSearchQuery] = useState('');
+  const [searchFuzzy, setSearchFuzzy] = useState(false);
+  const [searchResults, setSearchResults] = useState([]);
 
   const API_BASE_URL = 'http://localhost:5000/api';
 
+  // Search as the doctor types, once typing pauses and a word has 3 characters (what the server requires)
   useEffect(() => {
-    const fetchDashboardData = async () => {
+    if (!searchQuery.toLowerCase().split(/[^a-z0-9]+/).some(word => word.length >= 3)) {
+      setSearchResults([]);
+      return;
+    }
+    const timer = setTimeout(async () => {
       try {
-        const token = localStorage.getItem('token');
-        const user = JSON.parse(localStorage.getItem('user'));
-        if (user) {
-          setCurrentUser({
-            username: user.username,
-            name: user.name,
-            role: user.role
-          });
-        }
-
-        const response = await fetch(`${API_BASE_URL}/doctor/dashboard`, {
-          headers: {
-            'Authorization': `Bearer ${token}`
-          }
-        });
-
-        if (!response.ok) {
-          throw new Error('Failed to fetch dashboard data');
-        }
-
-        const data = await response.json();
-        setPatients(data.patients || []);
-        setAppointments(data.appointments || []);
-        setPrescriptions(data.prescriptions || []);
-
-        // Fetch eligible patients for prescriptions
-        const patientsResponse = await fetch(`${API_BASE_URL}/doctor/eligible-patients`, {
-          headers: {
-            'Authorization': `Bearer ${token}`
-          }
-        });
-
-        if (!patientsResponse.ok) {
-          throw new Error('Failed to fetch eligible patients');
-        }
-
-        const patientsData = await patientsResponse.json();
-        setEligiblePatients(patientsData);
+        const data = await searchPatients(searchQuery.trim(), { fuzzy: searchFuzzy });
+        setSearchResults(data.results);
       } catch (error) {
-        console.error('Error fetching data:', error);
+        console.error('Error searching patients:', error);
+      }
+    }, 250);
+    return () => clearTimeout(timer);
+  }, [searchQuery, searchFuzzy]);
+
+  // Dashboard and eligible patients in a single round trip
+  const loadDashboard = async () => {
+    try {
+      const { dashboard, eligible } = await fetchBatch([
+        { id: 'dashboard', method: 'GET', path: '/doctor/dashboard' },
+        { id: 'eligible', method: 'GET', path: '/doctor/eligible-patients' }
+      ]);
+
+      if (dashboard.status !== 200) {
+        throw new Error('Failed to fetch dashboard data');
       }
-    };
 
-    fetchDashboardData();
+      const data = dashboard.body;
+      setPatients(data.patients || []);
+      setAppointments(data.appointments || []);
+      setPrescriptions(data.prescriptions || []);
+
+      if (eligible.status !== 200) {
+        throw new Error('Failed to fetch eligible patients');
+      }
+
+      setEligiblePatients(eligible.body);
+    } catch (error) {
+      console.error('Error fetching data:', error);
+    }
+  };
+
+  useEffect(() => {
+    const user = JSON.parse(localStorage.getItem('user'));
+    if (user) {
+      setCurrentUser({
+        username: user.username,
+        name: user.name,
+        role: user.role
+      });
+    }
+
+    loadDashboard();
+  }, []);
+
+  // Apply pushed changes instead of refetching the whole dashboard
+  useEffect(() => {
+    const toAppointment = (data) => ({
+      id: data.appointment_id,
+      patient_id: data.patient_id,
+      patient_name: data.patient_name,
+      date: data.date,
+      time: data.time,
+      status: data.status
+    });
+
+    return subscribeToEvents({
+      'appointment.created': (data) => {
+        setAppointments(prev => [...prev.filter(appt => appt.id !== data.appointment_id), toAppointment(data)]);
+      },
+      'appointment.updated': (data) => {
+        setAppointments(prev => prev.map(appt =>
+          appt.id === data.appointment_id ? { ...appt, ...toAppointment(data) } : appt
+        ));
+      },
+      // Access changes decide which patients the doctor can work with; they are rare, so reload the lists
+      'access.created': loadDashboard,
+      'access.updated': loadDashboard,
+      'access_request.created': loadDashboard,
+      'access_request.updated': loadDashboard,
+      'resync': loadDashboard
+    });
   }, []);
 
-  const handleLogout = () => {
-    localStorage.removeItem('token');
-    localStorage.removeItem('user');
+  const handleLogout = async () => {
+    try {
+      await logout();
+    } catch (error) {
+      console.error('Error logging out:', error);
+    }
     window.location.href = '/';
   };
 
@@ -106,13 +150,8 @@ export default function DoctorDashboard() {
   const handleSubmitPrescription = async (e) => {
     e.preventDefault();
     try {
-      const token = localStorage.getItem('token');
-      const response = await fetch(`${API_BASE_URL}/doctor/prescriptions`, {
+      const response = await fetchWithToken(`${API_BASE_URL}/doctor/prescriptions`, {
         method: 'POST',
-        headers: {
-          'Authorization': `Bearer ${token}`,
-          'Content-Type': 'application/json'
-        },
         body: JSON.stringify(prescriptionForm)
       });
 
@@ -136,13 +175,8 @@ export default function DoctorDashboard() {
 
   const handleCompleteAppointment = async (appointmentId) => {
     try {
-      const token = localStorage.getItem('token');
-      const response = await fetch(`${API_BASE_URL}/doctor/appointments/${appointmentId}/complete`, {
-        method: 'PUT',
-        headers: {
-          'Authorization': `Bearer ${token}`,
-          'Content-Type': 'application/json'
-        }
+      const response = await fetchWithToken(`${API_BASE_URL}/doctor/appointments/${appointmentId}/complete`, {
+        method: 'PUT'
       });
 
       if (!response.ok) {
@@ -162,13 +196,8 @@ export default function DoctorDashboard() {
 
   const handleCancelAppointment = async (appointmentId) => {
     try {
-      const token = localStorage.getItem('token');
-      const response = await fetch(`${API_BASE_URL}/doctor/appointments/${appointmentId}/cancel`, {
-        method: 'PUT',
-        headers: {
-          'Authorization': `Bearer ${token}`,
-          'Content-Type': 'application/json'
-        }
+      const response = await fetchWithToken(`${API_BASE_URL}/doctor/appointments/${appointmentId}/cancel`, {
+        method: 'PUT'
       });
 
       if (!response.ok) {
@@ -188,13 +217,8 @@ export default function DoctorDashboard() {
 
   const handleRequestAccess = async (patientId) => {
     try {
-      const token = localStorage.getItem('token');
-      const response = await fetch(`${API_BASE_URL}/doctor/request-access`, {
+      const response = await fetchWithToken(`${API_BASE_URL}/doctor/request-access`, {
         method: 'POST',
-        headers: {
-          'Authorization': `Bearer ${token}`,
-          'Content-Type': 'application/json'
-        },
         body: JSON.stringify({
           patient_id: patientId
         })
@@ -204,9 +228,8 @@ export default function DoctorDashboard() {
         throw new Error('Failed to request access');
       }
 
+      // The access_request.created event refreshes the lists
       alert('Access request sent successfully!');
-      // Refresh the patients list to update access status
-      fetchPatients();
     } catch (error) {
       console.error('Error requesting access:', error);
       alert('Failed to request access. Please try again.');
@@ -215,12 +238,7 @@ export default function DoctorDashboard() {
 
   const handleViewPatientData = async (patientId) => {
     try {
-      const token = localStorage.getItem('token');
-      const response = await fetch(`${API_BASE_URL}/doctor/patient/${patientId}/data`, {
-        headers: {
-          'Authorization': `Bearer ${token}`
-        }
-      });
+      const response = await fetchWithToken(`${API_BASE_URL}/doctor/patient/${patientId}/data`);
 
       if (!response.ok) {
         throw new Error('Failed to fetch patient data');
@@ -298,6 +316,54 @@ export default function DoctorDashboard() {
 
         {activeTab === 'prescriptions' ? (
           <div className="space-y-8">
+            {/* Patient Search */}
+            <div className="bg-white border border-teal-200 rounded-lg shadow-sm">
+              <div className="p-6 border-b border-teal-200">
+                <h2 className="text-xl font-semibold text-gray-900">Find Patient</h2>
+                <p className="text-sm text-gray-500 mt-1">Search by name, email, diagnosis, medicine or condition</p>
+              </div>
+              <div className="p-6 space-y-4">
+                <div className="flex items-center space-x-4">
+                  <div className="relative flex-1">
+                    <Search className="h-4 w-4 text-gray-400 absolute left-3 top-3" />
+                    <input
+                      type="search"
+                      value={searchQuery}
+                      onChange={(e) => setSearchQuery(e.target.value)}
+                      placeholder="e.g. sharma, metformin, diabetes"
+                      className="w-full p-2 pl-9 border border-gray-300 rounded-md focus:ring-2 focus:ring-teal-500 focus:border-teal-500"
+                    />
+                  </div>
+                  <label className="flex items-center space-x-2 text-sm text-gray-700">
+                    <input type="checkbox" checked={searchFuzzy} onChange={(e) => setSearchFuzzy(e.target.checked)} />
+                    <span>Allow typos</span>
+                  </label>
+                </div>
+                {searchResults.length > 0 && (
+                  <ul className="divide-y divide-teal-100">
+                    {searchResults.map(result => (
+                      <li key={result.patient_id} className="py-2 flex justify-between items-center">
+                        <div>
+                          <p className="font-medium text-gray-900">{result.name}</p>
+                          <p className="text-sm text-gray-500">
+                            {result.matches.map(match => `${match.field}: ${match.value}`).join(' · ')}
+                          </p>
+                        </div>
+                        {patients.some(patient => String(patient.id) === String(result.patient_id)) && (
+                          <button
+                            onClick={() => setPrescriptionForm(prev => ({ ...prev, patientId: String(result.patient_id) }))}
+                            className="text-sm text-teal-600 hover:text-teal-800"
+                          >
+                            Prescribe
+                          </button>
+                        )}
+                      </li>
+                    ))}
+                  </ul>
+                )}
+              </div>
+            </div>
+
             {/* New Prescription Form */}
             <div className="bg-white border border-teal-200 rounded-lg shadow-sm">
               <div className="p-6 border-b border-teal-200">
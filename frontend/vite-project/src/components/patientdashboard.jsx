@@ -1,6 +1,6 @@
 import { useState, useEffect, useRef } from 'react'
 import { Users, User, Shield, Calendar, Clock, Plus, Upload, Bell, Check, X, ClipboardList, Download, FileText, HeartPulse, Pill, LogOut, ChevronDown } from "lucide-react"
-import { API_BASE_URL, fetchWithAuth } from '../utils/api'
+import { API_BASE_URL, fetchBatch, fetchWithAuth, fetchWithToken, logout, subscribeToEvents } from '../utils/api'
 
 function PatientDashboard() {
   const [currentUser, setCurrentUser] = useState(null)
@@ -98,6 +98,46 @@ function PatientDashboard() {
     fetchDashboardData()
   }, [])
 
+  // Apply pushed changes instead of refetching the whole dashboard
+  useEffect(() => {
+    const toAppointment = (data) => ({
+      appointment_id: data.appointment_id,
+      doctor_name: data.doctor_name,
+      date: data.date,
+      time: data.time,
+      status: data.status
+    })
+
+    return subscribeToEvents({
+      'appointment.created': (data) => {
+        setAppointments(prev => [...prev.filter(appt => appt.appointment_id !== data.appointment_id), toAppointment(data)])
+      },
+      'appointment.updated': (data) => {
+        setAppointments(prev => prev.map(appt =>
+          appt.appointment_id === data.appointment_id ? { ...appt, ...toAppointment(data) } : appt
+        ))
+      },
+      'access_request.created': (data) => {
+        setAccessRequests(prev => [...prev, {
+          request_id: data.request_id,
+          doctor_name: data.doctor_name,
+          status: data.status
+        }])
+      },
+      'access_request.updated': (data) => {
+        setAccessRequests(prev => prev.map(request =>
+          request.request_id === data.request_id ? { ...request, status: data.status } : request
+        ))
+      },
+      'resync': async () => {
+        const dashboardData = await fetchWithAuth('/patient/dashboard')
+        setAppointments(dashboardData.appointments || [])
+        setAccessRequests(dashboardData.access_requests || [])
+        setDoctorAccess(dashboardData.current_access || [])
+      }
+    })
+  }, [])
+
   const handleAuthSubmit = (e) => {
     e.preventDefault()
     if (username && password && (isLoginView || role)) {
@@ -126,12 +166,8 @@ function PatientDashboard() {
         return
       }
 
-      const response = await fetch(`${API_BASE_URL}/patient/appointments`, {
+      const response = await fetchWithToken(`${API_BASE_URL}/patient/appointments`, {
         method: 'POST',
-        headers: {
-          'Authorization': `Bearer ${token}`,
-          'Content-Type': 'application/json'
-        },
         body: JSON.stringify({
           doctor_id: newAppointment.doctorId,
           date_time: `${newAppointment.date}T${newAppointment.time}`,
@@ -212,18 +248,18 @@ function PatientDashboard() {
 
   const handleApproveAccess = async (requestId) => {
     try {
-      await fetchWithAuth(`/patient/access-requests/${requestId}/approve`, {
-        method: 'PUT'
-      })
-      
-      // Refresh access requests and current access
-      const [requests, access] = await Promise.all([
-        fetchWithAuth('/patient/access-requests'),
-        fetchWithAuth('/patient/current-access')
+      // Approve, then refresh access requests and current access, in one round trip
+      const { approve, requests, access } = await fetchBatch([
+        { id: 'approve', method: 'PUT', path: `/patient/access-requests/${requestId}/approve` },
+        { id: 'requests', method: 'GET', path: '/patient/access-requests' },
+        { id: 'access', method: 'GET', path: '/patient/current-access' }
       ])
+      if (approve.status !== 200) {
+        throw new Error(approve.body?.error || 'Failed to approve access request')
+      }
       
-      setAccessRequests(requests)
-      setDoctorAccess(access)
+      setAccessRequests(requests.body)
+      setDoctorAccess(access.body)
     } catch (err) {
       console.error('Error approving access:', err)
       alert(err.message || 'Failed to approve access request')
@@ -292,12 +328,8 @@ function PatientDashboard() {
 
   const handleDeleteReminder = async (reminderId) => {
     try {
-      const token = localStorage.getItem('token')
-      const response = await fetch(`${API_BASE_URL}/patient/reminders/${reminderId}`, {
-        method: 'DELETE',
-        headers: {
-          'Authorization': `Bearer ${token}`
-        }
+      const response = await fetchWithToken(`${API_BASE_URL}/patient/reminders/${reminderId}`, {
+        method: 'DELETE'
       })
 
       if (!response.ok) {
@@ -305,11 +337,7 @@ function PatientDashboard() {
       }
 
       // Refresh reminders list
-      const remindersResponse = await fetch(`${API_BASE_URL}/patient/dashboard`, {
-        headers: {
-          'Authorization': `Bearer ${token}`
-        }
-      })
+      const remindersResponse = await fetchWithToken(`${API_BASE_URL}/patient/dashboard`)
       const data = await remindersResponse.json()
       setReminders(data.reminders)
     } catch (error) {
@@ -325,9 +353,13 @@ function PatientDashboard() {
     )
   }
 
-  const handleLogout = () => {
-    // Clear user session and redirect to welcome page
-    localStorage.removeItem('token')
+  const handleLogout = async () => {
+    // Revoke the tokens, clear the user session and redirect to welcome page
+    try {
+      await logout()
+    } catch (err) {
+      console.error('Error logging out:', err)
+    }
     window.location.href = '/login'
   }
 
@@ -371,12 +403,8 @@ function PatientDashboard() {
         return
       }
 
-      const response = await fetch(`${API_BASE_URL}/patient/medical-history`, {
+      const response = await fetchWithToken(`${API_BASE_URL}/patient/medical-history`, {
         method: 'PUT',
-        headers: {
-          'Authorization': `Bearer ${token}`,
-          'Content-Type': 'application/json'
-        },
         body: JSON.stringify(editableMedicalHistory)
       })
 
@@ -398,13 +426,8 @@ function PatientDashboard() {
 
   const handleAddReminder = async (prescriptionId, medicineName, time, startDate, endDate) => {
     try {
-      const token = localStorage.getItem('token')
-      const response = await fetch(`${API_BASE_URL}/patient/reminders`, {
+      const response = await fetchWithToken(`${API_BASE_URL}/patient/reminders`, {
         method: 'POST',
-        headers: {
-          'Authorization': `Bearer ${token}`,
-          'Content-Type': 'application/json'
-        },
         body: JSON.stringify({
           prescription_id: prescriptionId,
           medicine_name: medicineName,
@@ -419,11 +442,7 @@ function PatientDashboard() {
       }
 
       // Refresh reminders list
-      const remindersResponse = await fetch(`${API_BASE_URL}/patient/dashboard`, {
-        headers: {
-          'Authorization': `Bearer ${token}`
-        }
-      })
+      const remindersResponse = await fetchWithToken(`${API_BASE_URL}/patient/dashboard`)
       const data = await remindersResponse.json()
       setReminders(data.reminders)
     } catch (error) {
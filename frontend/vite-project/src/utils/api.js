@@ -47,33 +47,152 @@ export const register = async (userData) => {
   return data
 }
 
-// Logout function
+// Logout function: revokes the access token and, when stored, the refresh token,
+// even when the access token has already expired
 export const logout = async () => {
-  const response = await fetch(`${API_BASE_URL}/auth/logout`, {
-    method: 'POST',
-    credentials: 'include'  // Important for session cookies
-  })
-  const data = await handleResponse(response)
-  console.log('Logout successful')
-  return data
+  const token = localStorage.getItem('token')
+  const refreshToken = localStorage.getItem('refresh_token')
+  try {
+    const response = await fetch(`${API_BASE_URL}/auth/logout`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        ...(token ? { 'Authorization': `Bearer ${token}` } : {})
+      },
+      body: JSON.stringify(refreshToken ? { refresh_token: refreshToken } : {}),
+      credentials: 'include'  // Important for session cookies
+    })
+    const data = await handleResponse(response)
+    console.log('Logout successful')
+    return data
+  } finally {
+    localStorage.removeItem('token')
+    localStorage.removeItem('refresh_token')
+    localStorage.removeItem('user')
+  }
 }
 
-// Authenticated fetch function
-export const fetchWithAuth = async (endpoint, options = {}) => {
-  console.log('Making authenticated request to:', endpoint)
-  const response = await fetch(`${API_BASE_URL}${endpoint}`, {
+// Trade the refresh token for a new short-lived access token. The server rotates
+// the refresh token on every use, so concurrent callers share one request.
+let pendingRefresh = null
+
+export const refreshAccessToken = () => {
+  if (!pendingRefresh) {
+    pendingRefresh = (async () => {
+      const refreshToken = localStorage.getItem('refresh_token')
+      if (!refreshToken) {
+        throw new Error('Session expired, please log in again')
+      }
+      const response = await fetch(`${API_BASE_URL}/auth/refresh`, {
+        method: 'POST',
+        headers: {
+          'Authorization': `Bearer ${refreshToken}`
+        }
+      })
+      const data = await handleResponse(response)
+      localStorage.setItem('token', data.access_token)
+      localStorage.setItem('refresh_token', data.refresh_token)
+      return data.access_token
+    })().finally(() => { pendingRefresh = null })
+  }
+  return pendingRefresh
+}
+
+// fetch with the stored access token, refreshing it once if it has expired. Sends
+// cookies too, so reads after a write see it (the server's last-write cookie).
+export const fetchWithToken = async (url, options = {}) => {
+  const send = (token) => fetch(url, {
     ...options,
     credentials: 'include',  // Important for session cookies
     headers: {
       'Content-Type': 'application/json',
+      'Authorization': `Bearer ${token}`,
       ...options.headers
     }
   })
+
+  const response = await send(localStorage.getItem('token'))
+  if (response.status !== 401) {
+    return response
+  }
+  return send(await refreshAccessToken())
+}
+
+// Authenticated fetch function
+export const fetchWithAuth = async (endpoint, options = {}) => {
+  console.log('Making authenticated request to:', endpoint)
+  const response = await fetchWithToken(`${API_BASE_URL}${endpoint}`, options)
   
   const data = await handleResponse(response)
   console.log('Request successful, response status:', response.status)
   return data
 }
 
+// Several API calls in one round trip. Takes [{ id, method, path, body }] with
+// paths relative to the API base; reads run in parallel on the server and
+// writes run in order. Resolves to { [id]: { status, body } }.
+export const fetchBatch = async (requests) => {
+  const response = await fetchWithToken(`${API_BASE_URL}/batch`, {
+    method: 'POST',
+    body: JSON.stringify({
+      requests: requests.map(({ path, ...rest }) => ({ ...rest, path: `/api${path}` }))
+    })
+  })
+
+  const data = await handleResponse(response)
+  return Object.fromEntries(data.responses.map(({ id, status, body }) => [id, { status, body }]))
+}
+
+// Search the doctor's patients by name, email, diagnosis, medicine or disease.
+// Words match as prefixes; fuzzy also tolerates typos.
+export const searchPatients = async (query, { fuzzy = false, fields } = {}) => {
+  const params = new URLSearchParams({ q: query, fuzzy: String(fuzzy) })
+  if (fields) params.set('fields', fields.join(','))
+  return fetchWithAuth(`/doctor/search?${params}`)
+}
+
+// Server-Sent Events stream of change events for the logged-in user.
+// The token travels in the URL, so when the server rejects a reconnect
+// (usually because that token has expired) the stream is reopened with a
+// refreshed one. Returns a function that closes the stream.
+export const subscribeToEvents = (handlers) => {
+  const eventsUrl = import.meta.env.VITE_EVENTS_URL || `${API_BASE_URL}/events/stream`
+  let source = null
+  let stopped = false
+  let failures = 0
+
+  const open = (token) => {
+    source = new EventSource(`${eventsUrl}?jwt=${encodeURIComponent(token)}`)
+    Object.entries(handlers).forEach(([type, handler]) => {
+      source.addEventListener(type, (event) => handler(JSON.parse(event.data)))
+    })
+    source.onopen = () => { failures = 0 }
+    source.onerror = async () => {
+      if (source.readyState !== EventSource.CLOSED) {
+        console.warn('Event stream interrupted, reconnecting...')
+        return
+      }
+      // EventSource gives up for good on an error response
+      failures += 1
+      if (stopped || failures > 3) {
+        console.error('Event stream closed, live updates stopped')
+        return
+      }
+      try {
+        const token = await refreshAccessToken()
+        setTimeout(() => { if (!stopped) open(token) }, 1000 * failures)
+      } catch (error) {
+        console.error('Could not refresh the event stream token:', error)
+      }
+    }
+  }
+
+  open(localStorage.getItem('token'))
+  return () => {
+    stopped = true
+    source.close()
+  }
+}
+
 // Export the API base URL for use in components
 export { API_BASE_URL } 
\ No newline at end of file